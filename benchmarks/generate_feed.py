@@ -0,0 +1,99 @@
+"""Генератор синтетического CSV поставщика в формате ExportWebskladCSV"""
+import os
+import csv
+import random
+import argparse
+
+COLUMNS = [
+    'ID',
+    'Название товара',
+    'Артикул',
+    'Описание товара',
+    'Дроп цена для партнера',
+    'Рекомендовання розничная цена',
+    'Наличие',
+    'Изображения',
+    'Категории товара',
+    'Подкатегории',
+    'Бренд',
+    'Вес'
+]
+
+CATEGORIES = {
+    'Дом и сад': ['Освещение', 'Текстиль', 'Хранение', 'Декор'],
+    'Кухня': ['Посуда', 'Ножи', 'Техника', 'Хранение продуктов'],
+    'Красота и здоровье': ['Массажеры', 'Уход за волосами', 'Маникюр'],
+    'Авто': ['Аксессуары', 'Органайзеры', 'Зарядные устройства'],
+    'Спорт и отдых': ['Туризм', 'Фитнес', 'Велоспорт'],
+    'Детские товары': ['Игрушки', 'Развивающие', 'Ночники'],
+    'Товары для электронки': ['Испарители', 'Картриджи']
+}
+NOUNS = ['Лампа', 'Набор', 'Органайзер', 'Массажер', 'Термос', 'Коврик', 'Фонарь', 'Кружка',
+         'Нож', 'Рюкзак', 'Ночник', 'Держатель', 'Увлажнитель', 'Плед', 'Сковорода', 'Игрушка']
+ADJECTIVES = ['светодиодный', 'складной', 'беспроводной', 'портативный', 'универсальный',
+              'керамический', 'водонепроницаемый', 'детский', 'магнитный', 'ультразвуковой']
+FEATURES = ['Материал: пластик ABS', 'Питание: USB Type-C', 'Гарантия 12 месяцев',
+            'Цвет: черный, белый, серый', 'Размер: 25 × 15 × 8 см', 'Вес нетто 450 г',
+            'Время работы до 8 часов', 'Подходит для дома и офиса', 'Комплектация: коробка, инструкция']
+SENTENCES = [
+    'Отличный выбор для повседневного использования и в качестве подарка.',
+    'Товар изготовлен из качественных материалов и прошел проверку перед отправкой.',
+    'Компактные размеры позволяют брать его с собой в поездки!',
+    'Простое управление одной кнопкой, с которым справится даже ребенок.',
+    'Надежная конструкция прослужит долгие годы при правильном уходе.',
+    'Подходит для использования в квартире, на даче и в автомобиле?',
+    'Удобная упаковка &laquo;под подарок&raquo; &mdash; ничего не нужно докупать.'
+]
+STOCK_VALUES = ['instock', 'outstock', '5', '0', '12', 'В наличии', 'нет', '>10', '+', '']
+
+def random_description(rng: random.Random) -> str:
+    """HTML-описание, похожее на описания поставщика"""
+    parts = [f"<p>{' '.join(rng.sample(SENTENCES, rng.randint(2, 4)))}</p>"]
+    parts.append('<ul>' + ''.join(f'<li>{f}</li>' for f in rng.sample(FEATURES, rng.randint(3, 6))) + '</ul>')
+    parts.append(f"<p><strong>Особенности:</strong><br>{' '.join(rng.sample(SENTENCES, rng.randint(1, 3)))}&nbsp;</p>")
+    return '\n'.join(parts)
+
+def random_row(rng: random.Random, index: int) -> list:
+    category = rng.choice(list(CATEGORIES))
+    drop_price = rng.randint(80, 4000)
+    retail_price = drop_price + rng.randint(50, 1500)
+    images = [
+        f"https://websklad.biz.ua/wp-content/uploads/{rng.randint(2021, 2024)}/{rng.randint(1, 12):02d}/img_{index}_{i}.jpg"
+        for i in range(rng.randint(1, 8))
+    ]
+    # Небольшая доля пустых названий, как в реальной выгрузке
+    name = '' if rng.random() < 0.01 else f"{rng.choice(NOUNS)} {rng.choice(ADJECTIVES)} {rng.choice(ADJECTIVES)} {index}"
+    return [
+        index,
+        name,
+        f"WS-{index:07d}",
+        random_description(rng),
+        f"{drop_price},{rng.randint(0, 99):02d}" if rng.random() < 0.3 else str(drop_price),
+        str(retail_price),
+        rng.choice(STOCK_VALUES),
+        rng.choice([',', ';', '|']).join(images),
+        category,
+        rng.choice(CATEGORIES[category]),
+        rng.choice(['NoName', 'Xiaomi', 'Tefal', 'Baseus', '']),
+        f"{rng.uniform(0.1, 5):.2f}"
+    ]
+
+def generate_feed(path: str, rows: int, encoding: str = 'utf-8', seed: int = 42) -> str:
+    """Пишет CSV на rows товаров и возвращает путь"""
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding=encoding, newline='', errors='replace') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        for index in range(1, rows + 1):
+            writer.writerow(random_row(rng, index))
+    return path
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--encoding', default='utf-8', choices=['utf-8', 'windows-1251'])
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    print(generate_feed(args.path, args.rows, args.encoding, args.seed))
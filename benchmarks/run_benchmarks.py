@@ -0,0 +1,181 @@
+"""Бенчмарки горячих путей каталога и постинга
+
+Пример:
+    python benchmarks/run_benchmarks.py --sizes 1000,10000 --output benchmarks/results/latest.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/results/baseline.json
+"""
+import os
+import sys
+import csv
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('ADMIN_IDS', '0')
+
+from generate_feed import generate_feed
+from shared.config import Config
+from shared.utils.csv_handler import read_products, parse_products, clean_html, parse_stock
+from shared.utils.price_tracker import PriceTracker
+from admin_bot.utils.text_utils import format_description
+from admin_bot.utils.posting import build_post_text
+
+DATA_DIR = os.path.join(ROOT, 'benchmarks', '.data')
+DEFAULT_SIZES = '1000,10000,100000'
+ENCODINGS = ['utf-8', 'windows-1251']
+# Для поштучных функций берем выборку, чтобы 1M строк не длились часами
+SAMPLE_SIZE = 20000
+
+def measure(func, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        items = func()
+        timings.append(time.perf_counter() - started)
+    median = statistics.median(timings)
+    return {
+        'median_s': median,
+        'min_s': min(timings),
+        'repeat': repeat,
+        'items': items,
+        'per_item_us': median / items * 1e6 if items else None
+    }
+
+def raw_columns(path: str, encoding: str) -> tuple:
+    """Сырые описания и значения наличия, как они лежат в CSV"""
+    descriptions, stocks = [], []
+    with open(path, 'r', encoding=encoding, newline='') as f:
+        for row in csv.DictReader(f):
+            descriptions.append(row['Описание товара'])
+            stocks.append(row['Наличие'])
+    return descriptions, stocks
+
+def bench_feed(path: str, encoding: str, rows: int, rng: random.Random) -> dict:
+    repeat = 1 if rows >= 1_000_000 else 3
+    results = {}
+
+    def run_read():
+        return len(parse_products(path))
+    results['read_products'] = measure(run_read, repeat)
+
+    descriptions, stocks = raw_columns(path, encoding)
+    html_sample = rng.sample(descriptions, min(SAMPLE_SIZE, len(descriptions)))
+
+    def run_clean():
+        for description in html_sample:
+            clean_html(description)
+        return len(html_sample)
+    results['clean_html'] = measure(run_clean, repeat)
+
+    def run_stock():
+        for value in stocks:
+            parse_stock(value)
+        return len(stocks)
+    results['parse_stock'] = measure(run_stock, repeat)
+
+    products = parse_products(path)
+    text_sample = [clean_html(d) for d in html_sample]
+
+    def run_format():
+        for text in text_sample:
+            format_description(text)
+        return len(text_sample)
+    results['format_description'] = measure(run_format, repeat)
+
+    # Статистика цен работает по закэшированному каталогу, как в боте
+    Config.CSV_PATH = path
+    read_products.cache_clear()
+    read_products()
+    with tempfile.TemporaryDirectory() as tmp:
+        history_file = os.path.join(tmp, 'price_history.json')
+        with open(history_file, 'w') as f:
+            json.dump({p.article: p.retail_price + rng.randint(-300, 300) for p in products}, f)
+        tracker = PriceTracker(history_file)
+
+        def run_stats():
+            tracker.get_price_statistics()
+            return len(products)
+        results['price_statistics'] = measure(run_stats, repeat)
+    read_products.cache_clear()
+
+    post_sample = rng.sample(products, min(SAMPLE_SIZE // 4, len(products)))
+
+    def run_render():
+        for product in post_sample:
+            build_post_text(product, rng.choice([None, 50, 250]))
+        return len(post_sample)
+    results['render_post'] = measure(run_render, repeat)
+
+    return results
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Печатает сравнение с базовой линией и возвращает регрессии"""
+    regressions = []
+    print(f"\n{'бенчмарк':55} {'база, с':>10} {'сейчас, с':>10} {'изм.':>8}")
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        change = current['median_s'] / previous['median_s'] - 1 if previous['median_s'] else 0
+        marker = ' ⚠' if change > threshold else ''
+        print(f"{key:55} {previous['median_s']:10.4f} {current['median_s']:10.4f} {change:+8.1%}{marker}")
+        if change > threshold:
+            regressions.append(key)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='размеры выгрузки через запятую, например 1000,1000000')
+    parser.add_argument('--encodings', default=','.join(ENCODINGS))
+    parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'results', 'latest.json'))
+    parser.add_argument('--baseline', help='JSON прошлого запуска для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.10, help='допустимое замедление, доля')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    results = {}
+    for rows in (int(s) for s in args.sizes.split(',')):
+        for encoding in args.encodings.split(','):
+            path = os.path.join(DATA_DIR, f"feed_{rows}_{encoding}.csv")
+            if not os.path.exists(path):
+                print(f"Генерация {path}...")
+                generate_feed(path, rows, encoding, args.seed)
+            print(f"Бенчмарк {rows} строк, {encoding}...")
+            feed_results = bench_feed(path, encoding, rows, random.Random(args.seed))
+            for name, result in feed_results.items():
+                key = f"{name}[{encoding},{rows}]"
+                results[key] = result
+                per_item = f", {result['per_item_us']:.2f} мкс/шт" if result['per_item_us'] else ''
+                print(f"  {name:20} {result['median_s']:.4f} с{per_item}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'meta': {
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'seed': args.seed
+            },
+            'results': results
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\nЗамедление больше {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""Локальные заглушки Telegram Bot API и LP-CRM для нагрузочных тестов"""
+import re
+import json
+import time
+import random
+import asyncio
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+from aiohttp import web
+
+# Методы Bot API, которые отправляют сообщение в чат
+_MESSAGE_METHODS = {'sendmessage', 'sendphoto', 'senddocument', 'editmessagetext', 'sendmediagroup'}
+
+@dataclass
+class FaultProfile:
+    """Задержка и ошибки, которые заглушка добавляет к ответам"""
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    retry_after_rate: float = 0.0
+    retry_after: int = 1
+
+    async def apply(self) -> Optional[web.Response]:
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        roll = random.random()
+        if roll < self.retry_after_rate:
+            return web.json_response({
+                'ok': False,
+                'error_code': 429,
+                'description': f'Too Many Requests: retry after {self.retry_after}',
+                'parameters': {'retry_after': self.retry_after}
+            }, status=429)
+        if roll < self.retry_after_rate + self.error_rate:
+            return web.json_response({'ok': False, 'error_code': 500, 'description': 'Internal Server Error'}, status=500)
+        return None
+
+@dataclass
+class RecordedCall:
+    method: str
+    params: Dict[str, Any]
+    timestamp: float = field(default_factory=time.monotonic)
+
+class FakeTelegramAPI:
+    """Заглушка Bot API: отдает апдейты через getUpdates и записывает исходящие вызовы"""
+
+    def __init__(self, faults: FaultProfile = None):
+        self.faults = faults or FaultProfile()
+        self.calls: List[RecordedCall] = []
+        self._updates: asyncio.Queue = asyncio.Queue()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1000)
+        self._waiters: Dict[int, asyncio.Future] = {}
+        # Выставляется при первом getUpdates, то есть когда бот начал опрос
+        self.polling = asyncio.Event()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route('*', '/bot{token}/{method}', self.handle)
+        return app
+
+    # Апдейты от имитируемых пользователей
+
+    def push_message(self, user_id: int, text: str):
+        self._push({'message': {
+            'message_id': next(self._message_ids),
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': self._user(user_id),
+            'text': text
+        }})
+
+    def push_callback(self, user_id: int, data: str):
+        self._push({'callback_query': {
+            'id': str(next(self._message_ids)),
+            'from': self._user(user_id),
+            'chat_instance': str(user_id),
+            'data': data,
+            'message': {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': user_id, 'type': 'private'},
+                'text': 'post'
+            }
+        }})
+
+    def expect_reply(self, chat_id: int) -> asyncio.Future:
+        """Future, который завершится следующим сообщением бота в чат"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[chat_id] = future
+        return future
+
+    def _photo(self) -> dict:
+        file_id = f"photo{next(self._message_ids)}"
+        return {'file_id': file_id, 'file_unique_id': file_id, 'width': 800, 'height': 800}
+
+    @staticmethod
+    def _user(user_id: int) -> dict:
+        return {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'}
+
+    def _push(self, update: dict):
+        update['update_id'] = next(self._update_ids)
+        self._updates.put_nowait(update)
+
+    # HTTP
+
+    async def _params(self, request: web.Request) -> Dict[str, Any]:
+        if request.content_type == 'application/json':
+            return await request.json()
+        if request.content_type.startswith('multipart/'):
+            return {k: v for k, v in (await request.post()).items() if isinstance(v, str)}
+        return {k: v[0] for k, v in parse_qs(await request.text()).items()}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method'].lower()
+        params = await self._params(request)
+
+        if method == 'getupdates':
+            self.polling.set()
+            return web.json_response({'ok': True, 'result': await self._get_updates(params)})
+        if method == 'getme':
+            return web.json_response({'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_store_bot'
+            }})
+
+        self.calls.append(RecordedCall(method, params))
+        failure = await self.faults.apply()
+        if failure is not None:
+            return failure
+
+        if method in _MESSAGE_METHODS:
+            chat_id = int(params.get('chat_id', 0))
+            message = {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': params.get('text') or params.get('caption') or ''
+            }
+            waiter = self._waiters.pop(chat_id, None)
+            if waiter and not waiter.done():
+                waiter.set_result(message['text'])
+            if method == 'sendphoto':
+                message['photo'] = [self._photo()]
+            if method == 'sendmediagroup':
+                # По сообщению с фото на каждый элемент группы, как у настоящего API
+                items = params.get('media')
+                count = len(json.loads(items)) if isinstance(items, str) else len(items or [None])
+                return web.json_response({'ok': True, 'result': [
+                    {**message, 'message_id': next(self._message_ids), 'photo': [self._photo()]} for _ in range(count)
+                ]})
+            return web.json_response({'ok': True, 'result': message})
+        return web.json_response({'ok': True, 'result': True})
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[dict]:
+        timeout = float(params.get('timeout') or 0)
+        updates = []
+        try:
+            updates.append(await asyncio.wait_for(self._updates.get(), timeout) if timeout else self._updates.get_nowait())
+        except (asyncio.TimeoutError, asyncio.QueueEmpty):
+            return []
+        while not self._updates.empty() and len(updates) < 100:
+            updates.append(self._updates.get_nowait())
+        return updates
+
+_ITEM_FIELD_RE = re.compile(r'^products\[(\d+)\]\[(\w+)\]$')
+
+def parse_items(form: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Позиции заказа из полей products[i][...]; у заказа из одного товара список пуст"""
+    items: Dict[int, Dict[str, Any]] = {}
+    for key in list(form):
+        match = _ITEM_FIELD_RE.match(key)
+        if match:
+            items.setdefault(int(match.group(1)), {})[match.group(2)] = form.pop(key)
+    return [items[i] for i in sorted(items)]
+
+class FakeCrm:
+    """Заглушка LP-CRM: принимает addNewOrder.html и сохраняет заказы"""
+
+    def __init__(self, faults: FaultProfile = None):
+        self.faults = faults or FaultProfile()
+        self.orders: List[Dict[str, Any]] = []
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/api/addNewOrder.html', self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        failure = await self.faults.apply()
+        if failure is not None:
+            return failure
+        order = dict(await request.post())
+        order['items'] = parse_items(order)
+        self.orders.append(order)
+        return web.Response(
+            text=json.dumps({'status': 'ok', 'data': [{'order_id': len(self.orders)}]}),
+            content_type='application/json'
+        )
+
+async def start_app(app: web.Application, port: int, host: str = '127.0.0.1') -> web.AppRunner:
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+async def serve_crm(port: int, host: str = '127.0.0.1'):
+    """Отдельная заглушка CRM для ручной проверки заказов: печатает каждый принятый заказ"""
+    crm = FakeCrm()
+    handle = crm.handle
+
+    async def handle_and_print(request: web.Request) -> web.Response:
+        response = await handle(request)
+        if crm.orders:
+            print(json.dumps(crm.orders[-1], ensure_ascii=False), flush=True)
+        return response
+
+    crm.handle = handle_and_print
+    runner = await start_app(crm.app(), port, host)
+    print(f"Заглушка LP-CRM: http://{host}:{port}/api/addNewOrder.html (LP_CRM_DOMAIN={host}:{port})", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--crm-port', type=int, default=18082)
+    parser.add_argument('--host', default='127.0.0.1')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve_crm(args.crm_port, args.host))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,178 @@
+"""Нагрузочный тест клиентского бота: order_ -> ПІБ -> телефон -> Нова Пошта
+
+Бот запускается отдельным процессом и работает с локальными заглушками Bot API и LP-CRM.
+Пример:
+    python loadtest/run_loadtest.py --users 500 --concurrency 100 --api-latency 0.05 --crm-latency 0.2
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+sys.path.insert(0, SRC)
+os.environ.setdefault('ADMIN_IDS', '0')
+
+from fake_servers import FakeTelegramAPI, FakeCrm, FaultProfile, start_app
+from generate_feed import generate_feed
+from shared.utils.csv_handler import parse_products
+
+STEPS = ['order', 'name', 'phone', 'np']
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+async def simulate_user(api: FakeTelegramAPI, user_id: int, article: str, args,
+                        latencies: Dict[str, List[float]], errors: Counter) -> bool:
+    """Один покупатель проходит весь сценарий заказа"""
+    actions = [
+        ('order', lambda: api.push_callback(user_id, f"order_{article}")),
+        ('name', lambda: api.push_message(user_id, "Іваненко Іван Петрович")),
+        ('phone', lambda: api.push_message(user_id, f"+38067{random.randint(1000000, 9999999)}")),
+        ('np', lambda: api.push_message(user_id, f"Київ {random.randint(1, 300)}"))
+    ]
+    for step, push in actions:
+        reply = api.expect_reply(user_id)
+        started = time.monotonic()
+        push()
+        try:
+            text = await asyncio.wait_for(reply, args.step_timeout)
+        except asyncio.TimeoutError:
+            errors[f"{step}:timeout"] += 1
+            return False
+        latencies[step].append(time.monotonic() - started)
+        if step == 'np' and not text.startswith('✅'):
+            errors['np:not_confirmed'] += 1
+            return False
+        if args.think_time:
+            await asyncio.sleep(random.uniform(0, args.think_time))
+    return True
+
+async def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix='loadtest_')
+    feed_path = generate_feed(os.path.join(workdir, 'feed.csv'), args.rows)
+    articles = [p.article for p in parse_products(feed_path) if p.stock == 'instock']
+
+    api = FakeTelegramAPI(FaultProfile(args.api_latency, args.api_jitter, args.api_error_rate, args.retry_after_rate))
+    crm = FakeCrm(FaultProfile(args.crm_latency, args.crm_jitter, args.crm_error_rate))
+    runners = [await start_app(api.app(), args.tg_port), await start_app(crm.app(), args.crm_port)]
+
+    env = dict(
+        os.environ,
+        PYTHONPATH=SRC,
+        CLIENT_BOT_TOKEN='123456:LOADTEST',
+        TELEGRAM_API_URL=f'http://127.0.0.1:{args.tg_port}',
+        LP_CRM_API_KEY='loadtest',
+        LP_CRM_DOMAIN=f'127.0.0.1:{args.crm_port}',
+        CSV_PATH=feed_path,
+        # Хранилища бота во временном каталоге: прогон не пишет в src/data и не видит рабочих данных
+        ANALYTICS_PATH=os.path.join(workdir, 'analytics.sqlite3'),
+        CUSTOMERS_PATH=os.path.join(workdir, 'customers.sqlite3'),
+        SETTINGS_PATH=os.path.join(workdir, 'settings.json'),
+        NP_BRANCHES_PATH=os.path.join(workdir, 'np_branches.json'),
+        NP_API_KEY='',
+        TRANSLATION_CACHE_PATH=os.path.join(workdir, 'translations.sqlite3'),
+        FEED_ARCHIVE_PATH=os.path.join(workdir, 'feed_archive.sqlite3'),
+        IMAGE_STORE_DIR=os.path.join(workdir, 'images'),
+        FEEDS_DIR=os.path.join(workdir, 'feeds'),
+        LOGS_DIR=os.path.join(workdir, 'logs'),
+        CLIENT_METRICS_PORT='0',
+        LOG_LEVEL='WARNING'
+    )
+    bot_process = await asyncio.create_subprocess_exec(sys.executable, '-m', 'client_bot.main', cwd=workdir, env=env)
+    try:
+        await asyncio.wait_for(api.polling.wait(), 60)
+
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        errors: Counter = Counter()
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def user_task(user_id: int) -> bool:
+            async with semaphore:
+                return await simulate_user(api, user_id, random.choice(articles), args, latencies, errors)
+
+        started = time.monotonic()
+        completed = await asyncio.gather(*(user_task(100000 + i) for i in range(args.users)))
+        elapsed = time.monotonic() - started
+    finally:
+        # Ждем асинхронно: заглушка должна ответить на последний getUpdates, чтобы бот завершился
+        bot_process.terminate()
+        try:
+            await asyncio.wait_for(bot_process.wait(), 30)
+        except asyncio.TimeoutError:
+            bot_process.kill()
+        for runner in runners:
+            await runner.cleanup()
+
+    succeeded = sum(completed)
+    return {
+        'users': args.users,
+        'concurrency': args.concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'checkouts_per_s': round(succeeded / elapsed, 2) if elapsed else 0,
+        'succeeded': succeeded,
+        'errors': dict(errors),
+        'crm_orders': len(crm.orders),
+        # Повторная отправка одного и того же заказа (телефон у каждого пользователя свой)
+        'crm_duplicates': len(crm.orders) - len({order.get('phone') for order in crm.orders}),
+        'telegram_calls': dict(Counter(call.method for call in api.calls)),
+        'steps': {
+            step: {
+                'count': len(latencies[step]),
+                'p50_ms': round(percentile(latencies[step], 50) * 1000, 1),
+                'p95_ms': round(percentile(latencies[step], 95) * 1000, 1),
+                'p99_ms': round(percentile(latencies[step], 99) * 1000, 1)
+            }
+            for step in STEPS
+        }
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--think-time', type=float, default=0.0, help='максимальная пауза между шагами, с')
+    parser.add_argument('--step-timeout', type=float, default=15.0)
+    parser.add_argument('--rows', type=int, default=1000, help='размер синтетического каталога')
+    parser.add_argument('--api-latency', type=float, default=0.0)
+    parser.add_argument('--api-jitter', type=float, default=0.0)
+    parser.add_argument('--api-error-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after-rate', type=float, default=0.0)
+    parser.add_argument('--crm-latency', type=float, default=0.0)
+    parser.add_argument('--crm-jitter', type=float, default=0.0)
+    parser.add_argument('--crm-error-rate', type=float, default=0.0)
+    parser.add_argument('--tg-port', type=int, default=18081)
+    parser.add_argument('--crm-port', type=int, default=18082)
+    parser.add_argument('--output', help='сохранить отчет в JSON')
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    print(f"\nПользователей: {report['users']}, параллельно: {report['concurrency']}")
+    print(f"Успешных заказов: {report['succeeded']} за {report['elapsed_s']} с ({report['checkouts_per_s']}/с)")
+    print(f"Заказов в CRM: {report['crm_orders']}, дублей: {report['crm_duplicates']}")
+    print(f"\n{'шаг':8} {'кол-во':>7} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}")
+    for step, stats in report['steps'].items():
+        print(f"{step:8} {stats['count']:7d} {stats['p50_ms']:9.1f} {stats['p95_ms']:9.1f} {stats['p99_ms']:9.1f}")
+    if report['errors']:
+        print(f"\nОшибки: {report['errors']}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
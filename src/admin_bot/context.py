@@ -29,7 +29,8 @@ class BotContext:
         import asyncio
         import logging
         
-        logging.info("Завершение работы бота...")
+        logger = logging.getLogger(__name__)
+        logger.info("Завершение работы бота...")
         try:
             for task in asyncio.all_tasks():
                 if task is not asyncio.current_task():
@@ -42,7 +43,7 @@ class BotContext:
             await self.dp.storage.close()
             await self.bot.session.close()
         except Exception as e:
-            logging.error(f"Ошибка при завершении: {str(e)}")
+            logger.error(f"Ошибка при завершении: {str(e)}")
 
 # Создаем глобальный экземпляр контекста
 context = BotContext() 
\ No newline at end of file
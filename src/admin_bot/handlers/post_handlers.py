@@ -3,7 +3,7 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from shared.utils.csv_handler import read_products, Product
-from shared.utils.price_tracker import PriceTracker
+from shared.utils.price_tracker import price_tracker
 import os
 from typing import Optional, List
 import logging
@@ -13,8 +13,20 @@ from shared.utils.crm_handler import LpCrmAPI
 import asyncio
 from shared.config import Config
 from admin_bot.context import context
-from admin_bot.keyboards.admin_kb import get_admin_keyboard, get_settings_keyboard
-from aiogram.types import CallbackQuery
+from admin_bot.keyboards.admin_kb import get_admin_keyboard, get_settings_keyboard, get_profile_keyboard, get_export_keyboard, get_pricing_keyboard
+from admin_bot.utils.export import WRITERS, export_catalog
+from aiogram.types import CallbackQuery, FSInputFile
+from shared.utils.profiler import sample_profile
+from shared.utils.analytics import analytics, FunnelStats, STEP_POSTED, STEP_ORDER_TAP, STEP_ORDERED
+import tempfile
+import time
+from shared.utils.catalog import catalog
+from shared.utils.settings import settings
+from shared.utils.pricing import pricing_engine, parse_rules, rules_to_json, preview
+import json
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
 
 router = Router(name='admin_handlers')
 
@@ -27,10 +39,51 @@ class SettingsStates(StatesGroup):
     waiting_csv_interval = State()
     waiting_post_format = State()
 
+class PricingStates(StatesGroup):
+    waiting_rules = State()
+
 product_state = ProductState()
-price_tracker = PriceTracker()
 crm_api = LpCrmAPI()
 
+def format_funnel_line(title: str, stats: FunnelStats) -> str:
+    conversion = stats.conversion()
+    percent = f" ({conversion:.0%})" if conversion is not None else ""
+    return (
+        f"• {title}: {stats.count(STEP_POSTED)} → {stats.count(STEP_ORDER_TAP)} → "
+        f"{stats.count(STEP_ORDERED)}{percent}\n"
+    )
+
+def format_funnel(by_article: List[FunnelStats], by_category: List[FunnelStats], limit: int = 10) -> str:
+    """Лучшие товары и категории по заказам, затем по нажатиям «Замовити»"""
+    if not by_article:
+        return ""
+    rank = lambda stats: (stats.count(STEP_ORDERED), stats.count(STEP_ORDER_TAP), stats.count(STEP_POSTED))
+    text = f"\n🎯 Воронка за {Config.ANALYTICS_REPORT_DAYS} дней (посты → «Замовити» → заказы):\n"
+    for stats in sorted(by_article, key=rank, reverse=True)[:limit]:
+        product = catalog.get(stats.key)
+        title = f"{product.name[:40]} ({stats.key})" if product else stats.key
+        text += format_funnel_line(title, stats)
+    text += "\n🗂 По категориям:\n"
+    for stats in sorted(by_category, key=rank, reverse=True)[:limit]:
+        text += format_funnel_line(stats.key or "Без категории", stats)
+    return text
+
+def format_price_preview(stats: dict) -> str:
+    """Сводка того, как новые правила изменят цены каталога"""
+    if not stats['total']:
+        return "📭 Каталог порожній, порівняти ціни нема з чим"
+    text = (
+        f"💲 Попередній перегляд нових цін ({stats['total']} товарів):\n\n"
+        f"Зміниться: {stats['changed']} (↑ {stats['increased']}, ↓ {stats['decreased']})\n"
+        f"Середня зміна: {stats['mean_diff']:+.0f} грн ({stats['mean_percent']:+.1f}%)\n"
+        f"Діапазон змін: від {stats['min_diff']:+.0f} до {stats['max_diff']:+.0f} грн\n"
+    )
+    if stats['categories']:
+        text += "\n🗂 Найбільші зміни по категоріях:\n"
+        for category, mean, count in stats['categories']:
+            text += f"• {category or 'Без категорії'}: {mean:+.0f} грн ({count} товарів)\n"
+    return text
+
 @router.message(Command("start"))
 async def cmd_start(message: types.Message):
     """Обработчик команды /start"""
@@ -70,10 +123,13 @@ async def handle_statistics(message: types.Message):
             text += f"📉 Снижение цен: {price_stats['decreased']}\n"
             text += f"📊 Средняя скидка: {price_stats['avg_discount']:.2f} грн\n"
         
+        # Почасовые корзины уже сгруппированы, сырые события не перебираются
+        text += format_funnel(*await analytics.report())
+        
         await message.answer(text)
         
     except Exception as e:
-        logging.error(f"Ошибка при получении статистики: {str(e)}")
+        logger.error(f"Ошибка при получении статистики: {str(e)}")
         await message.answer("❌ Помилка при отриманні статистики")
 
 @router.message(F.text == "⚙️ Налаштування")
@@ -126,7 +182,8 @@ async def process_post_interval(message: types.Message, state: FSMContext):
     try:
         interval = int(message.text)
         if 1 <= interval <= 1440:
-            Config.POST_INTERVAL = interval * 60
+            # Сохраняется в файл настроек: планировщик и клиент-бот подхватят без рестарта
+            settings.set('POST_INTERVAL', interval * 60)
             # Возвращаем клавиатуру настроек
             await message.answer(
                 f"✅ Інтервал між постами встановлено: {interval} хвилин",
@@ -144,7 +201,7 @@ async def process_csv_interval(message: types.Message, state: FSMContext):
     try:
         interval = int(message.text)
         if 1 <= interval <= 24:
-            Config.UPDATE_INTERVAL = interval * 3600
+            settings.set('UPDATE_INTERVAL', interval * 3600)
             # Возвращаем клавиатуру настроек
             await message.answer(
                 f"✅ Інтервал оновлення CSV встановлено: {interval} годин",
@@ -164,7 +221,7 @@ async def handle_restart(message: types.Message):
         
     try:
         await message.answer("♻️ Перезапуск бота...")
-        logging.info(f"Запрошен рестарт админом {message.from_user.id}")
+        logger.info(f"Запрошен рестарт админом {message.from_user.id}")
         
         await context.shutdown()
         
@@ -172,9 +229,105 @@ async def handle_restart(message: types.Message):
         os.execv(python, [python] + sys.argv)
         
     except Exception as e:
-        logging.error(f"Ошибка при перезапуске: {str(e)}")
+        logger.error(f"Ошибка при перезапуске: {str(e)}")
         await message.answer("❌ Помилка при перезапуску бота")
 
+profile_lock = asyncio.Lock()
+
+@router.message(F.text == "🩺 Профілювання")
+async def handle_profile(message: types.Message):
+    """Обработчик кнопки профилирования"""
+    if message.from_user.id not in Config.ADMIN_IDS:
+        return
+        
+    await message.answer(
+        "🩺 Оберіть тривалість запису профілю:",
+        reply_markup=get_profile_keyboard()
+    )
+
+@router.callback_query(lambda c: c.data and c.data.startswith('profile_'))
+async def handle_profile_callback(callback: CallbackQuery):
+    """Запись сэмплирующего профиля и отправка отчета"""
+    if callback.from_user.id not in Config.ADMIN_IDS:
+        await callback.answer("❌ У вас нет доступа", show_alert=True)
+        return
+    if profile_lock.locked():
+        await callback.answer("⏳ Профілювання вже виконується", show_alert=True)
+        return
+
+    duration = min(int(callback.data.split('_')[1]), 120)
+    await callback.answer()
+    await callback.message.edit_text(f"🩺 Записую профіль {duration} с...")
+    
+    async with profile_lock:
+        try:
+            # Сэмплер работает в отдельном потоке, цикл событий продолжает обслуживать апдейты
+            report = await asyncio.get_running_loop().run_in_executor(None, sample_profile, duration)
+            os.makedirs(Config.LOGS_DIR, exist_ok=True)
+            path = os.path.join(Config.LOGS_DIR, f"profile_{datetime.now():%Y%m%d_%H%M%S}.txt")
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(report)
+            await callback.message.answer_document(FSInputFile(path), caption="🩺 Профіль процесу")
+        except Exception as e:
+            logger.error(f"Ошибка при профилировании: {str(e)}")
+            await callback.message.answer("❌ Помилка при профілюванні")
+
+export_lock = asyncio.Lock()
+
+@router.message(F.text == "📤 Експорт")
+async def handle_export(message: types.Message):
+    """Обработчик кнопки экспорта каталога"""
+    if message.from_user.id not in Config.ADMIN_IDS:
+        return
+        
+    await message.answer(
+        "📤 Оберіть формат вивантаження каталогу:",
+        reply_markup=get_export_keyboard()
+    )
+
+@router.callback_query(lambda c: c.data and c.data.startswith('export_'))
+async def handle_export_callback(callback: CallbackQuery):
+    """Выгрузка каталога с ценами, историей цен и заказами в файл"""
+    if callback.from_user.id not in Config.ADMIN_IDS:
+        await callback.answer("❌ У вас нет доступа", show_alert=True)
+        return
+    fmt = callback.data.split('_', 1)[1]
+    if fmt not in WRITERS:
+        await callback.answer()
+        return
+    if export_lock.locked():
+        await callback.answer("⏳ Експорт вже виконується", show_alert=True)
+        return
+
+    await callback.answer()
+    await callback.message.edit_text("📤 Готую файл...")
+    
+    async with export_lock:
+        extension, _ = WRITERS[fmt]
+        fd, path = tempfile.mkstemp(suffix=f".{extension}")
+        os.close(fd)
+        try:
+            # Снимки берем в цикле событий: каталог заменяется целиком, историю цен копируем
+            await asyncio.to_thread(price_tracker.ensure_loaded)
+            products = catalog.products
+            price_history = dict(price_tracker.price_history)
+            await analytics.flush_async()
+            since = int(time.time()) - Config.ANALYTICS_REPORT_DAYS * 86400
+            orders = await asyncio.to_thread(analytics.store.totals, STEP_ORDERED, since)
+            
+            # Строки пишутся в файл в отдельном потоке, бот продолжает отвечать
+            count = await asyncio.to_thread(export_catalog, path, fmt, products, price_history, orders)
+            filename = f"catalog_{datetime.now():%Y%m%d_%H%M}.{extension}"
+            await callback.message.answer_document(
+                FSInputFile(path, filename=filename),
+                caption=f"📤 Каталог: {count} товарів, замовлення за {Config.ANALYTICS_REPORT_DAYS} днів"
+            )
+        except Exception as e:
+            logger.error(f"Ошибка при экспорте каталога: {str(e)}")
+            await callback.message.answer("❌ Помилка при експорті")
+        finally:
+            os.remove(path)
+
 @router.message(F.text == "❌ Відміна")
 async def handle_cancel(message: types.Message, state: FSMContext):
     """Обработчик кнопки отмены"""
@@ -186,3 +339,57 @@ async def handle_cancel(message: types.Message, state: FSMContext):
         "🔄 Дію скасовано. Повернення до головного меню",
         reply_markup=get_admin_keyboard()
     )
+
+@router.message(F.text == "💲 Ціни")
+async def handle_pricing(message: types.Message, state: FSMContext):
+    """Обработчик кнопки правил цен"""
+    if message.from_user.id not in Config.ADMIN_IDS:
+        return
+
+    rules = pricing_engine.rules
+    current = "\n".join(f"• {rule.describe()}" for rule in rules) if rules else "• Типове правило: дроп +500 або РРЦ +200"
+    await message.answer(
+        "💲 Поточні правила цін:\n"
+        f"{current}\n\n"
+        "Надішліть нові правила списком JSON, наприклад:\n"
+        '[{"category": "Взуття", "tiers": [{"from": 0, "percent": 30}, {"from": 1000, "percent": 20}], '
+        '"min_margin": 300, "round": "99"}]\n\n'
+        "Порожній список [] повертає типове правило."
+    )
+    await state.set_state(PricingStates.waiting_rules)
+
+@router.message(PricingStates.waiting_rules)
+async def process_pricing_rules(message: types.Message, state: FSMContext):
+    """Проверка новых правил и предпросмотр изменения цен"""
+    try:
+        raw = json.loads(message.text or '')
+        if not isinstance(raw, list):
+            raise ValueError("Очікується список правил")
+        rules = parse_rules(raw)
+    except (ValueError, TypeError, AttributeError) as e:
+        await message.answer(f"❌ Некоректні правила: {str(e)}")
+        return
+
+    # Пересчет всего каталога идет в отдельном потоке
+    stats = await asyncio.to_thread(preview, catalog.products, rules)
+    await state.update_data(pricing_rules=rules_to_json(rules))
+    await message.answer(format_price_preview(stats), reply_markup=get_pricing_keyboard())
+
+@router.callback_query(lambda c: c.data and c.data.startswith('pricing_'))
+async def handle_pricing_callback(callback: CallbackQuery, state: FSMContext):
+    """Применение или отмена новых правил цен"""
+    if callback.from_user.id not in Config.ADMIN_IDS:
+        await callback.answer("❌ У вас нет доступа", show_alert=True)
+        return
+
+    data = await state.get_data()
+    rules = data.get('pricing_rules')
+    await state.clear()
+    await callback.answer()
+    if callback.data != 'pricing_apply' or rules is None:
+        await callback.message.edit_text("🔄 Правила цін не змінено")
+        return
+
+    # Сохраняется в файл настроек: каталог пересчитает цены в обоих ботах без рестарта
+    settings.set('PRICING_RULES', rules)
+    await callback.message.edit_text(f"✅ Нові правила цін застосовано ({len(rules)} правил)")
@@ -1,3 +1,3 @@
-from .admin_kb import get_admin_keyboard, get_settings_keyboard
+from .admin_kb import get_admin_keyboard, get_settings_keyboard, get_profile_keyboard
 
-__all__ = ['get_admin_keyboard', 'get_settings_keyboard'] 
\ No newline at end of file
+__all__ = ['get_admin_keyboard', 'get_settings_keyboard', 'get_profile_keyboard'] 
\ No newline at end of file
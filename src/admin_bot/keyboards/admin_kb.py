@@ -11,6 +11,13 @@ def get_admin_keyboard() -> types.ReplyKeyboardMarkup:
             [
                 types.KeyboardButton(text="🔄 Рестарт"),
                 types.KeyboardButton(text="❌ Відміна")
+            ],
+            [
+                types.KeyboardButton(text="🩺 Профілювання"),
+                types.KeyboardButton(text="📤 Експорт")
+            ],
+            [
+                types.KeyboardButton(text="💲 Ціни")
             ]
         ],
         resize_keyboard=True
@@ -41,4 +48,41 @@ def get_settings_keyboard() -> types.InlineKeyboardMarkup:
             ]
         ]
     )
-    return keyboard 
\ No newline at end of file
+    return keyboard
+
+def get_profile_keyboard() -> types.InlineKeyboardMarkup:
+    """Клавиатура выбора длительности профилирования"""
+    keyboard = types.InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                types.InlineKeyboardButton(text="10 с", callback_data="profile_10"),
+                types.InlineKeyboardButton(text="30 с", callback_data="profile_30"),
+                types.InlineKeyboardButton(text="60 с", callback_data="profile_60")
+            ]
+        ]
+    )
+    return keyboard
+
+def get_export_keyboard() -> types.InlineKeyboardMarkup:
+    """Клавиатура выбора формата экспорта каталога"""
+    keyboard = types.InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                types.InlineKeyboardButton(text="CSV (.gz)", callback_data="export_csv"),
+                types.InlineKeyboardButton(text="Excel (.xlsx)", callback_data="export_xlsx")
+            ]
+        ]
+    )
+    return keyboard
+
+def get_pricing_keyboard() -> types.InlineKeyboardMarkup:
+    """Клавиатура подтверждения новых правил цен"""
+    keyboard = types.InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                types.InlineKeyboardButton(text="✅ Застосувати", callback_data="pricing_apply"),
+                types.InlineKeyboardButton(text="❌ Скасувати", callback_data="pricing_cancel")
+            ]
+        ]
+    )
+    return keyboard
\ No newline at end of file
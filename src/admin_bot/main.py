@@ -1,19 +1,33 @@
+import time
+STARTED = time.perf_counter()
+
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from shared.config import Config
 from admin_bot.handlers import post_handlers
 from shared.utils.file_updater import FileUpdater
+from shared.utils.suppliers import FeedAggregator, load_feeds
 from shared.utils.price_tracker import PriceTracker
-from admin_bot.utils.posting import auto_posting, check_and_delete_outdated_posts
+from admin_bot.utils.posting import auto_posting, check_and_delete_outdated_posts, image_store
 import asyncio
 import logging
-import signal
 import sys
 import os
+from typing import Optional, Union
 from aiogram.client.session.aiohttp import AiohttpSession
 import random
 from admin_bot.context import context
 from admin_bot.keyboards.admin_kb import get_admin_keyboard
+from shared.utils.throttling import ThrottlingMiddleware
+from shared.utils.metrics import setup_metrics, start_metrics_server, monitor_event_loop_lag
+from shared.utils.profiler import LoopWatchdog
+from shared.utils.settings import settings
+from shared.utils.startup import StartupTimer, warm_up
+from shared.utils.catalog import catalog
+from shared.utils.translation import setup_translation
+from shared.utils.analytics import analytics
+
+logger = logging.getLogger(__name__)
 
 # Проверка на запущенные экземпляры
 PID_FILE = 'admin_bot.pid'
@@ -23,92 +37,138 @@ def check_running():
         with open(PID_FILE, 'r') as f:
             old_pid = int(f.read())
             try:
-                os.kill(old_pid, 0)
-                logging.error(f"Бот уже запущен (PID: {old_pid})")
-                sys.exit(1)
+                # После os.execv при рестарте PID не меняется
+                if old_pid != os.getpid():
+                    os.kill(old_pid, 0)
+                    logger.error(f"Бот уже запущен (PID: {old_pid})")
+                    sys.exit(1)
             except OSError:
                 pass
     with open(PID_FILE, 'w') as f:
         f.write(str(os.getpid()))
 
 def cleanup():
+    # Несброшенные счетчики воронки не должны пропасть при остановке
+    analytics.flush()
+    if image_store is not None:
+        image_store.close()
     if os.path.exists(PID_FILE):
         os.remove(PID_FILE)
 
-async def shutdown():
-    """Корректное завершение бота"""
-    tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
-    [task.cancel() for task in tasks]
-    await asyncio.gather(*tasks, return_exceptions=True)
-    
-def signal_handler(signum, frame):
-    """Обработчик сигналов для корректного завершения"""
-    logging.info("Получен сигнал завершения...")
+def create_bot(session: AiohttpSession = None) -> Bot:
+    """Админ-бот; сессию можно передать общую с клиентским ботом"""
+    return Bot(token=Config.ADMIN_BOT_TOKEN, session=session)
+
+def create_dispatcher() -> Dispatcher:
+    storage = MemoryStorage()
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(ThrottlingMiddleware())
+    dp.include_router(post_handlers.router)
+    return dp
+
+async def notify_admin(bot: Bot, admin_id: int):
     try:
-        loop = asyncio.get_event_loop()
-        loop.create_task(shutdown())
-        loop.stop()
+        await bot.send_message(
+            admin_id,
+            "Бот запущен. Используйте клавиатуру для управления:",
+            reply_markup=get_admin_keyboard()
+        )
     except Exception as e:
-        logging.error(f"Ошибка при завершении: {str(e)}")
-    finally:
-        cleanup()
-        sys.exit(0)
+        logger.error(f"Не удалось отправить клавиатуру админу {admin_id}: {e}")
+
+async def notify_admins(bot: Bot):
+    """Отправляем клавиатуру всем админам параллельно"""
+    await asyncio.gather(*(notify_admin(bot, admin_id) for admin_id in Config.ADMIN_IDS))
+
+async def prepare_catalog() -> Optional[Union[FileUpdater, FeedAggregator]]:
+    """Первичная загрузка выгрузки поставщика или нескольких поставщиков из SUPPLIERS_PATH"""
+    feeds = load_feeds()
+    if feeds:
+        file_updater = FeedAggregator(feeds)
+    else:
+        file_updater = FileUpdater(
+            url=Config.CSV_URL,
+            local_path=Config.CSV_PATH
+        )
+    if not await file_updater.initial_check():
+        logger.error("Не удалось инициализировать файл товаров")
+        return None
+    return file_updater
+
+async def start_up(bot: Bot, timer: StartupTimer) -> Optional[Union[FileUpdater, FeedAggregator]]:
+    """Загрузка выгрузки и прогрев, параллельно с уведомлением админов"""
+    async def prepare() -> Optional[Union[FileUpdater, FeedAggregator]]:
+        file_updater = await timer.run('csv_file', prepare_catalog())
+        if file_updater is not None:
+            await warm_up(timer)
+        return file_updater
+
+    file_updater, _ = await asyncio.gather(prepare(), timer.run('notify_admins', notify_admins(bot)))
+    return file_updater
+
+def background_tasks(bot: Bot, file_updater: Union[FileUpdater, FeedAggregator]) -> list:
+    """Фоновые задачи админ-бота: постинг, чистка канала, обновление выгрузки, аналитика, настройки, перевод"""
+    tasks = [
+        auto_posting(bot),
+        check_and_delete_outdated_posts(bot),
+        file_updater.check_updates(),
+        analytics.run(),
+        settings.watch()
+    ]
+    translation = setup_translation(catalog)
+    if translation is not None:
+        tasks.append(translation.run())
+    return tasks
 
 async def main():
+    timer = StartupTimer('admin', STARTED)
+    timer.since_start('imports')
     Config.setup_logging('admin')
     Config.init_directories()
+    # Сохраненные админом настройки применяем до создания планировщиков
+    settings.load()
     
-    storage = MemoryStorage()
-    bot = Bot(token=Config.ADMIN_BOT_TOKEN)
-    dp = Dispatcher(storage=storage)
-    dp.include_router(post_handlers.router)
-    
-    logging.info("Запуск админ бота...")
+    with timer.phase('setup'):
+        bot = create_bot()
+        dp = create_dispatcher()
+        setup_metrics(dp, bot, 'admin')
     
-    # Регистрируем обработчики сигналов
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    logger.info("Запуск админ бота...")
     
+    check_running()
+    # SIGINT и SIGTERM перехватывает start_polling: опрос завершается, и задачи останавливаются в finally
+    background = []
     try:
-        check_running()
-        
-        # Отправляем клавиатуру админам
-        for admin_id in Config.ADMIN_IDS:
-            try:
-                await bot.send_message(
-                    admin_id,
-                    "Бот запущен. Используйте клавиатуру для управления:",
-                    reply_markup=get_admin_keyboard()
-                )
-            except Exception as e:
-                logging.error(f"Не удалось отправить клавиатуру админу {admin_id}: {e}")
+        LoopWatchdog().start()
+        if Config.ADMIN_METRICS_PORT:
+            await start_metrics_server(Config.ADMIN_METRICS_PORT, Config.METRICS_HOST)
         
-        # Сначала инициализируем и запускаем FileUpdater
-        file_updater = FileUpdater(
-            url=Config.CSV_URL,
-            local_path=Config.CSV_PATH,
-            update_interval=Config.UPDATE_INTERVAL
-        )
+        # Опрос запускаем сразу, выгрузка и прогрев идут параллельно
+        polling = asyncio.create_task(dp.start_polling(bot))
+        timer.since_start('polling')
         
-        # Выполняем первичную проверку
-        if not await file_updater.initial_check():
-            logging.error("Не удалось инициализировать файл товаров")
+        file_updater = await start_up(bot, timer)
+        if file_updater is None:
+            polling.cancel()
             return
+        timer.report()
             
-        # Запускаем все задачи параллельно
-        tasks = [
-            dp.start_polling(bot),
-            auto_posting(bot),
-            check_and_delete_outdated_posts(bot),
-            file_updater.check_updates()
+        # Запускаем фоновые задачи; процесс живет, пока идет опрос
+        background = [
+            asyncio.create_task(coro)
+            for coro in (*background_tasks(bot, file_updater), monitor_event_loop_lag())
         ]
-        
-        await asyncio.gather(*tasks)
+        await polling
             
     except Exception as e:
-        logging.error(f"Критическая ошибка: {str(e)}")
-        cleanup()
+        logger.error(f"Критическая ошибка: {str(e)}")
         raise
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        cleanup()
+        logger.info("Админ бот остановлен")
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,63 @@
+import os
+import json
+import time
+import logging
+from dataclasses import dataclass, field, fields
+from typing import FrozenSet, List, Optional, Union
+from shared.config import Config
+from shared.utils.csv_handler import Product
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class PostChannel:
+    """Канал для автопостинга со своим расписанием и фильтром категорий"""
+    chat_id: Union[int, str]
+    name: str = ''
+    # Категории товаров канала; пусто - все категории
+    categories: FrozenSet[str] = field(default_factory=frozenset)
+    # Интервал ротации в секундах; None - общий Config.POST_INTERVAL, который меняется из настроек
+    post_interval: Optional[int] = None
+    # Время последнего поста ротации; следующий считается от него, чтобы смена интервала действовала сразу
+    last_post_at: float = field(default=0.0, compare=False)
+
+    @property
+    def interval(self) -> int:
+        return self.post_interval or Config.POST_INTERVAL
+
+    @property
+    def next_post_at(self) -> float:
+        return self.last_post_at + self.interval
+
+    def matches(self, product: Product) -> bool:
+        return not self.categories or product.category in self.categories
+
+    def schedule_next(self, now: float = None):
+        self.last_post_at = now or time.monotonic()
+
+def load_channels(path: str = None) -> List[PostChannel]:
+    """Каналы из JSON; без файла - один канал CHANNEL_ID со всеми категориями"""
+    path = path or Config.POST_CHANNELS_PATH
+    if not os.path.exists(path):
+        return [PostChannel(Config.CHANNEL_ID, 'main')] if Config.CHANNEL_ID else []
+    with open(path, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    # last_post_at - состояние планировщика, а не настройка канала
+    known = {f.name for f in fields(PostChannel)} - {'last_post_at'}
+    channels = []
+    for number, item in enumerate(items, 1):
+        if not isinstance(item, dict):
+            logger.error(f"Канал #{number} в {path}: ожидается объект, пропущен")
+            continue
+        name = item.get('name') or item.get('chat_id') or f"#{number}"
+        unknown = sorted(item.keys() - known)
+        if unknown:
+            logger.error(f"Канал {name} в {path}: неизвестные ключи {', '.join(unknown)}, пропущен")
+            continue
+        if not item.get('chat_id'):
+            logger.error(f"Канал {name} в {path}: не задан chat_id, пропущен")
+            continue
+        categories = frozenset(item.pop('categories', []))
+        channels.append(PostChannel(categories=categories, **item))
+    logger.info(f"Каналов для постинга: {len(channels)}")
+    return channels
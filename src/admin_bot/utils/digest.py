@@ -0,0 +1,143 @@
+import re
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from aiogram import types
+from shared.config import Config
+from shared.utils.catalog import CatalogChange, catalog
+from shared.utils.csv_handler import Product
+from admin_bot.utils.channels import PostChannel
+from admin_bot.utils.post_queue import post_queue, hot_events
+
+logger = logging.getLogger(__name__)
+
+KIND_DISCOUNT = 'discount'
+KIND_RESTOCK = 'restock'
+
+# Ограничения Telegram: от 2 до 10 фото в альбоме, подпись до 1024 символов
+MIN_ALBUM_SIZE = 2
+MAX_ALBUM_SIZE = 10
+MAX_CAPTION_LENGTH = 1024
+
+# Параметр /start допускает только латиницу, цифры, _ и -, не длиннее 64 символов
+_START_PARAM_RE = re.compile(r'^[A-Za-z0-9_-]{1,58}$')
+
+@dataclass
+class Digest:
+    """Подборка товаров для одного альбома"""
+    kind: str
+    category: str
+    products: List[Product]
+    price_diffs: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def reason(self) -> str:
+        return f"digest_{self.kind}"
+
+class DigestPlanner:
+    """Корзины событий каталога за последние window секунд: (вид, категория) -> артикул -> (время, скидка)
+
+    Корзины пополняются подписчиком каталога, поэтому выбор подборки не проходит по всему каталогу.
+    Уже опубликованные в канале товары отсеивает пауза очереди постов для этого канала.
+    """
+
+    def __init__(self, window: int = None, size: int = None, min_size: int = None):
+        self.window = window or Config.DIGEST_WINDOW
+        # Альбом Telegram - от 2 до 10 фото, подборку вне этих границ не отправить
+        self.size = max(MIN_ALBUM_SIZE, min(size or Config.DIGEST_SIZE, MAX_ALBUM_SIZE))
+        self.min_size = max(MIN_ALBUM_SIZE, min(min_size or Config.DIGEST_MIN_SIZE, self.size))
+        self._buckets: Dict[Tuple[str, str], Dict[str, Tuple[float, float]]] = {}
+
+    def _add(self, kind: str, product: Product, now: float, price_diff: float = 0.0):
+        self._buckets.setdefault((kind, product.category), {})[product.article] = (now, price_diff)
+
+    def on_change(self, change: CatalogChange):
+        """Подписчик каталога: те же события, что у очереди горячих постов"""
+        now = time.monotonic()
+        for article, kind, price_diff in hot_events(change):
+            self._add(kind, catalog.get(article), now, price_diff or 0.0)
+
+    def _prune(self, now: float):
+        for key in list(self._buckets):
+            bucket = self._buckets[key]
+            for article in [a for a, (at, _) in bucket.items() if now - at > self.window]:
+                del bucket[article]
+            if not bucket:
+                del self._buckets[key]
+
+    def plan(self, channel: PostChannel, now: float = None) -> Optional[Digest]:
+        """Самая полная подборка для канала: скидки по размеру, возвраты в наличие по свежести"""
+        now = now or time.monotonic()
+        self._prune(now)
+        best: Optional[Digest] = None
+        for (kind, category), bucket in self._buckets.items():
+            if channel.categories and category not in channel.categories:
+                continue
+            entries = []
+            for article, (at, price_diff) in bucket.items():
+                product = catalog.get(article)
+                if product is None or product.stock != 'instock':
+                    continue
+                if post_queue.on_cooldown(article, now, channel.chat_id):
+                    continue
+                entries.append((price_diff if kind == KIND_DISCOUNT else at, product, price_diff))
+            if len(entries) < self.min_size or (best and len(entries) <= len(best.products)):
+                continue
+            entries.sort(key=lambda entry: entry[0], reverse=True)
+            entries = entries[:self.size]
+            best = Digest(
+                kind, category,
+                [product for _, product, _ in entries],
+                {product.article: diff for _, product, diff in entries if diff}
+            )
+            if len(best.products) >= self.size:
+                break
+        return best
+
+def client_deep_link(action: str, article: str) -> Optional[str]:
+    """Ссылка на клиент-бот с /start <action>_<артикул>; None, если ее не построить
+
+    Кнопки постов отправляет админ-бот, и callback от них приходит ему, а не клиент-боту.
+    """
+    if not Config.CLIENT_BOT_USERNAME or not _START_PARAM_RE.match(article):
+        return None
+    return f"https://t.me/{Config.CLIENT_BOT_USERNAME}?start={action}_{article}"
+
+def order_deep_link(article: str) -> Optional[str]:
+    """Ссылка на клиент-бот, которая сразу начинает заказ товара"""
+    return client_deep_link('order', article)
+
+def build_digest_caption(digest: Digest) -> str:
+    """Общая подпись альбома с номерами товаров, как на кнопках заказа"""
+    title = "🔥 Знижки дня" if digest.kind == KIND_DISCOUNT else "✅ Знову в наявності"
+    header = f"{title}: {digest.category}\n\n" if digest.category else f"{title}\n\n"
+    footer = "\n🛍 Замовити - кнопками під альбомом"
+    lines = []
+    for number, product in enumerate(digest.products, 1):
+        price_diff = digest.price_diffs.get(product.article)
+        price = f"{product.get_calculated_price()} грн"
+        if price_diff:
+            price += f" (-{price_diff:g} грн)"
+        lines.append(f"{number}. {product.name[:80]} — {price}\n")
+    caption = header + ''.join(lines) + footer
+    if len(caption) > MAX_CAPTION_LENGTH:
+        # Длинные названия обрезаем сильнее, чтобы цены остались в подписи
+        lines = [line if len(line) < 60 else line[:40] + '…' + line[line.rfind(' — '):] for line in lines]
+        caption = (header + ''.join(lines) + footer)[:MAX_CAPTION_LENGTH]
+    return caption
+
+def build_digest_keyboard(digest: Digest) -> types.InlineKeyboardMarkup:
+    """Кнопка заказа на каждый товар: ссылка в клиент-бот или, без его имени, callback как у поста"""
+    rows = []
+    for number, product in enumerate(digest.products, 1):
+        text = f"🛍 {number}. {product.name[:40]}"
+        url = order_deep_link(product.article)
+        if url:
+            rows.append([types.InlineKeyboardButton(text=text, url=url)])
+        else:
+            rows.append([types.InlineKeyboardButton(text=text, callback_data=f"order_{product.article}")])
+    return types.InlineKeyboardMarkup(inline_keyboard=rows)
+
+# Планировщик подборок процесса
+digest_planner = DigestPlanner()
@@ -0,0 +1,139 @@
+import re
+import csv
+import gzip
+import time
+import zipfile
+import logging
+from typing import Dict, Iterable, Iterator, List, Sequence
+from xml.sax.saxutils import escape
+from shared.utils.csv_handler import Product
+
+logger = logging.getLogger(__name__)
+
+EXPORT_COLUMNS = [
+    'Артикул',
+    'Название',
+    'Категория',
+    'Подкатегория',
+    'Наличие',
+    'Дроп цена',
+    'Цена поставщика',
+    'Наша цена',
+    'Последняя цена в истории',
+    'Заказы'
+]
+
+# Символы, недопустимые в XML 1.0; в описаниях поставщика встречаются
+_XML_ILLEGAL = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def iter_rows(products: Iterable[Product], price_history: Dict[str, float],
+              orders: Dict[str, int]) -> Iterator[list]:
+    """Строки выгрузки по одной, без сборки таблицы в памяти"""
+    for product in products:
+        yield [
+            product.article,
+            product.name,
+            product.category,
+            product.subcategory,
+            'В наличии' if product.stock == 'instock' else 'Нет в наличии',
+            product.drop_price,
+            product.retail_price,
+            product.get_calculated_price(),
+            price_history.get(product.article, ''),
+            orders.get(product.article, 0)
+        ]
+
+def write_csv_gz(path: str, rows: Iterable[Sequence], columns: List[str] = EXPORT_COLUMNS) -> int:
+    """Пишет CSV, сжатый gzip, построчно. Возвращает число строк"""
+    count = 0
+    # utf-8-sig, чтобы Excel сразу открыл кириллицу
+    with gzip.open(path, 'wt', encoding='utf-8-sig', newline='', compresslevel=6) as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+def _xlsx_cell(value) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_XML_ILLEGAL.sub('', str(value)))
+    # Строки inline, без таблицы общих строк: ее пришлось бы держать в памяти целиком
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+def write_xlsx(path: str, rows: Iterable[Sequence], columns: List[str] = EXPORT_COLUMNS,
+               sheet_name: str = 'Каталог') -> int:
+    """Пишет XLSX построчно прямо в сжатый архив. Возвращает число строк"""
+    count = 0
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=6) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(name=escape(sheet_name)))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(('<row>' + ''.join(_xlsx_cell(c) for c in columns) + '</row>').encode('utf-8'))
+            # Пишем пачками: каждая запись в поток архива проходит через сжатие
+            chunk = []
+            for row in rows:
+                chunk.append('<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>')
+                count += 1
+                if len(chunk) >= 1000:
+                    sheet.write(''.join(chunk).encode('utf-8'))
+                    chunk = []
+            sheet.write(''.join(chunk).encode('utf-8'))
+            sheet.write(b'</sheetData></worksheet>')
+    return count
+
+WRITERS = {
+    'csv': ('csv.gz', write_csv_gz),
+    'xlsx': ('xlsx', write_xlsx)
+}
+
+def export_catalog(path: str, fmt: str, products: Iterable[Product],
+                   price_history: Dict[str, float], orders: Dict[str, int]) -> int:
+    """Выгрузка каталога в файл. Блокирующий вызов, выполняется в отдельном потоке"""
+    started = time.perf_counter()
+    _, writer = WRITERS[fmt]
+    count = writer(path, iter_rows(products, price_history, orders))
+    logger.info(f"Экспорт каталога ({fmt}): {count} строк за {time.perf_counter() - started:.2f} с")
+    return count
@@ -0,0 +1,237 @@
+import io
+import os
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import aiohttp
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Union
+from aiogram.types import FSInputFile
+from shared.config import Config
+from shared.utils.http import get_session
+from shared.utils.processes import process_pool
+from shared.utils.metrics import IMAGE_STORE_REQUESTS, IMAGE_STORE_BYTES
+
+logger = logging.getLogger(__name__)
+
+def process_image(content: bytes, max_dimension: int, quality: int) -> bytes:
+    """Уменьшает фото до max_dimension по большей стороне и пересжимает в JPEG. Выполняется в процессе-обработчике"""
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        # Без Pillow храним оригинал: загрузка все равно идет с диска, а не с сайта поставщика
+        return content
+    with Image.open(io.BytesIO(content)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return output.getvalue()
+
+class ImageStore:
+    """Локальные копии фото поставщиков для постов
+
+    Фото скачивается один раз с ограничением параллельности, одинаковые по содержимому
+    файлы хранятся один раз, при превышении квоты удаляются давно не использованные.
+    Файлы, которые сейчас отправляются в Telegram, не удаляются до конца отправки.
+    """
+
+    def __init__(self, root: str = None, max_bytes: int = None, max_dimension: int = None,
+                 quality: int = None, concurrency: int = None, workers: int = None):
+        self.root = root or Config.IMAGE_STORE_DIR
+        self.max_bytes = max_bytes or Config.IMAGE_STORE_MAX_BYTES
+        self.max_dimension = max_dimension or Config.IMAGE_MAX_DIMENSION
+        self.quality = quality or Config.IMAGE_QUALITY
+        self.concurrency = concurrency or Config.IMAGE_DOWNLOAD_CONCURRENCY
+        self.workers = workers or Config.IMAGE_WORKERS
+        # Хэш содержимого -> размер файла; порядок = давность использования
+        self._files: 'OrderedDict[str, int]' = OrderedDict()
+        self._total = 0
+        # Хэш -> число отправок, которые сейчас читают файл
+        self._pins: Dict[str, int] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._loaded: Optional[asyncio.Task] = None
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], f"{digest}.jpg")
+
+    def _load(self):
+        """Индекс URL и учет занятого места по файлам на диске. Блокирующий вызов"""
+        os.makedirs(self.root, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(self.root, 'index.sqlite3'), check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS images (url TEXT PRIMARY KEY, digest TEXT NOT NULL)")
+        self._db.commit()
+        files = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if name.endswith('.jpg'):
+                    stat = os.stat(os.path.join(directory, name))
+                    files.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, digest, size in sorted(files):
+            self._files[digest] = size
+            self._total += size
+        IMAGE_STORE_BYTES.set(self._total)
+        logger.info(f"Хранилище фото: {len(self._files)} файлов, {self._total // (1024 * 1024)} МБ")
+
+    async def _ensure_loaded(self):
+        if self._loaded is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._loaded = asyncio.ensure_future(asyncio.to_thread(self._load))
+        await self._loaded
+
+    def _lookup(self, url: str) -> Optional[str]:
+        with self._db_lock:
+            row = self._db.execute("SELECT digest FROM images WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def _remember(self, url: str, digest: str):
+        with self._db_lock:
+            self._db.execute("INSERT OR REPLACE INTO images (url, digest) VALUES (?, ?)", (url, digest))
+            self._db.commit()
+
+    def _touch(self, digest: str):
+        self._files.move_to_end(digest)
+        try:
+            os.utime(self.path(digest))
+        except OSError:
+            pass
+
+    def _evict(self, keep: str = None):
+        # Самые давние сначала; занятые отправкой файлы и только что записанный keep пропускаем,
+        # их место освободится позже
+        for digest in list(self._files):
+            if self._total <= self.max_bytes or len(self._files) <= 1:
+                break
+            if digest in self._pins or digest == keep:
+                continue
+            size = self._files.pop(digest)
+            self._total -= size
+            try:
+                os.remove(self.path(digest))
+            except OSError:
+                pass
+            # Записи индекса на удаленный файл остаются: при следующем запросе фото скачается заново
+        IMAGE_STORE_BYTES.set(self._total)
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = process_pool(self.workers)
+        return self._pool
+
+    async def _download(self, url: str) -> Optional[bytes]:
+        async with self._semaphore:
+            try:
+                async with get_session().get(url, timeout=aiohttp.ClientTimeout(total=60)) as response:
+                    if response.status != 200:
+                        logger.warning(f"Фото {url}: ошибка загрузки {response.status}")
+                        return None
+                    return await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"Фото {url}: не удалось скачать: {type(e).__name__} {str(e)}")
+                return None
+
+    def _write(self, digest: str, content: bytes):
+        path = self.path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    async def _fetch(self, url: str) -> Optional[str]:
+        """Хэш локальной копии фото по URL; None, если скачать или обработать не удалось"""
+        digest = await asyncio.to_thread(self._lookup, url)
+        if digest in self._files:
+            self._touch(digest)
+            IMAGE_STORE_REQUESTS.inc(result='hit')
+            return digest
+
+        content = await self._download(url)
+        if not content:
+            IMAGE_STORE_REQUESTS.inc(result='error')
+            return None
+        # Ключ - хэш оригинала: одно фото под разными URL обрабатывается один раз
+        digest = hashlib.sha256(content).hexdigest()
+        if digest in self._files:
+            self._touch(digest)
+            IMAGE_STORE_REQUESTS.inc(result='dedup')
+        else:
+            try:
+                processed = await asyncio.get_running_loop().run_in_executor(
+                    self._executor(), process_image, content, self.max_dimension, self.quality
+                )
+            except Exception as e:
+                logger.warning(f"Фото {url}: не удалось обработать: {str(e)}")
+                IMAGE_STORE_REQUESTS.inc(result='error')
+                return None
+            await asyncio.to_thread(self._write, digest, processed)
+            self._files[digest] = len(processed)
+            self._total += len(processed)
+            self._evict(keep=digest)
+            IMAGE_STORE_REQUESTS.inc(result='download')
+        await asyncio.to_thread(self._remember, url, digest)
+        return digest
+
+    async def _get_digest(self, url: str) -> Optional[str]:
+        await self._ensure_loaded()
+        # Один и тот же URL из параллельных постов скачивается один раз
+        future = self._inflight.get(url)
+        if future is None:
+            future = self._inflight[url] = asyncio.ensure_future(self._fetch(url))
+            future.add_done_callback(lambda _: self._inflight.pop(url, None))
+        digest = await asyncio.shield(future)
+        # Файл могли вытеснить, пока ждали чужую загрузку
+        return digest if digest in self._files else None
+
+    async def get(self, url: str) -> Optional[str]:
+        """Путь к локальной копии фото; None, если скачать или обработать не удалось"""
+        digest = await self._get_digest(url)
+        return self.path(digest) if digest else None
+
+    def _pin(self, digest: str):
+        self._pins[digest] = self._pins.get(digest, 0) + 1
+
+    def _unpin(self, digest: str):
+        self._pins[digest] -= 1
+        if not self._pins[digest]:
+            del self._pins[digest]
+            if self._total > self.max_bytes:
+                self._evict()
+
+    @asynccontextmanager
+    async def localized(self, photos: List[str]) -> AsyncIterator[List[Union[str, FSInputFile]]]:
+        """Заменяет URL поставщика локальными файлами на время блока; file_id и недоступные фото
+        остаются как есть. Пока блок не завершен, файлы не вытесняются из хранилища"""
+        pinned: List[str] = []
+
+        async def resolve(photo: str) -> Union[str, FSInputFile]:
+            if not photo.startswith(('http://', 'https://')):
+                return photo
+            digest = await self._get_digest(photo)
+            if not digest:
+                return photo
+            # Между проверкой в _get_digest и этой строкой нет await, вытеснение не вклинится
+            self._pin(digest)
+            pinned.append(digest)
+            return FSInputFile(self.path(digest))
+
+        try:
+            yield list(await asyncio.gather(*(resolve(photo) for photo in photos)))
+        finally:
+            for digest in pinned:
+                self._unpin(digest)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,133 @@
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+from shared.config import Config
+from shared.utils.catalog import CatalogChange, catalog
+from shared.utils.metrics import POST_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты: меньше - раньше
+PRIORITY_DISCOUNT = 0
+PRIORITY_RESTOCK = 1
+
+# Скидка, которую показываем в посте (см. build_post_text)
+DISCOUNT_THRESHOLD = 100
+
+def hot_events(change: CatalogChange) -> Iterator[Tuple[str, str, Optional[float]]]:
+    """Горячие события изменения каталога: (артикул, 'discount' или 'restock', снижение цены)
+
+    Товар, который вернулся в выгрузку после того, как выпал из нее, приходит в added
+    с прошлой версией в previous и считается вернувшимся в наличие.
+    """
+    returned = {article for article in change.added if article in change.previous}
+    for article in change.changed | returned:
+        old = change.previous.get(article)
+        new = catalog.get(article)
+        if old is None or new is None or new.stock != 'instock':
+            continue
+        price_diff = old.get_calculated_price() - new.get_calculated_price()
+        if price_diff >= DISCOUNT_THRESHOLD:
+            yield article, 'discount', price_diff
+        elif old.stock != 'instock' or article in returned:
+            yield article, 'restock', None
+
+@dataclass(order=True)
+class PostEvent:
+    priority: int
+    seq: int
+    article: str = field(compare=False)
+    reason: str = field(compare=False)
+    price_diff: Optional[float] = field(default=None, compare=False)
+
+class PostQueue:
+    """Очередь горячих постов (вернулся в наличие, снизилась цена) с паузой между постами одного товара"""
+
+    def __init__(self, cooldown: int = None, max_size: int = 1000):
+        self._cooldown = cooldown
+        self.max_size = max_size
+        self._heap: List[PostEvent] = []
+        # Актуальное событие по артикулу; остальные записи в куче устарели
+        self._queued: Dict[str, PostEvent] = {}
+        # (канал, артикул) -> время поста; канал None - последний пост товара в любом канале
+        self._last_posted: Dict[Tuple[Optional[Hashable], str], float] = {}
+        self._seq = itertools.count()
+        self._event = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    @property
+    def cooldown(self) -> int:
+        # Без явного значения - текущая настройка POST_COOLDOWN
+        return self._cooldown if self._cooldown is not None else Config.POST_COOLDOWN
+
+    def wake(self):
+        """Прерывает ожидание в wait, чтобы планировщик пересчитал расписание"""
+        self._event.set()
+
+    def on_cooldown(self, article: str, now: float = None, chat_id: Hashable = None) -> bool:
+        last = self._last_posted.get((chat_id, article))
+        return last is not None and (now or time.monotonic()) - last < self.cooldown
+
+    def mark_posted(self, article: str, chat_ids: Iterable[Hashable] = ()):
+        now = time.monotonic()
+        for chat_id in (None, *chat_ids):
+            self._last_posted[(chat_id, article)] = now
+
+    def push(self, article: str, priority: int, reason: str, price_diff: float = None) -> bool:
+        current = self._queued.get(article)
+        if current is not None and current.priority <= priority:
+            return False
+        if current is None and len(self._queued) >= self.max_size:
+            return False
+        if self.on_cooldown(article):
+            return False
+        event = PostEvent(priority, next(self._seq), article, reason, price_diff)
+        self._queued[article] = event
+        heapq.heappush(self._heap, event)
+        POST_QUEUE_SIZE.set(len(self._queued))
+        self._event.set()
+        return True
+
+    def pop(self) -> Optional[PostEvent]:
+        """Следующее событие, товар которого все еще в наличии"""
+        while self._heap:
+            event = heapq.heappop(self._heap)
+            if self._queued.get(event.article) is not event:
+                continue
+            del self._queued[event.article]
+            POST_QUEUE_SIZE.set(len(self._queued))
+            product = catalog.get(event.article)
+            if product is None or product.stock != 'instock' or self.on_cooldown(event.article):
+                continue
+            return event
+        self._event.clear()
+        return None
+
+    async def wait(self, timeout: float) -> bool:
+        """Ждет новое событие не дольше timeout. True, если очередь не пуста"""
+        if not self._queued:
+            try:
+                await asyncio.wait_for(self._event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return bool(self._queued)
+
+    def on_change(self, change: CatalogChange):
+        """Подписчик каталога: возвраты в наличие и снижения цены"""
+        restocks = discounts = 0
+        for article, reason, price_diff in hot_events(change):
+            if reason == 'discount':
+                discounts += self.push(article, PRIORITY_DISCOUNT, reason, price_diff)
+            else:
+                restocks += self.push(article, PRIORITY_RESTOCK, reason)
+        if restocks or discounts:
+            logger.info(f"В очередь постов: снижений цены {discounts}, возвратов в наличие {restocks}")
+
+# Общая очередь постов процесса
+post_queue = PostQueue()
@@ -1,102 +1,386 @@
 from aiogram import Bot, types
 from shared.config import Config
 from shared.utils.csv_handler import read_products, Product
-from shared.utils.price_tracker import PriceTracker
+from shared.utils.price_tracker import price_tracker
 from admin_bot.utils.text_utils import format_description
+from shared.utils.translation import translated
 import asyncio
 import logging
 import random
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Tuple, Union
+from shared.utils.metrics import POSTING_LAG, POSTS_PUBLISHED
+from shared.utils.catalog import catalog
+from shared.utils.throttling import SendRateLimiter
+from shared.utils.analytics import analytics, STEP_POSTED
+from shared.utils.settings import settings
+from admin_bot.utils.post_queue import post_queue
+from admin_bot.utils.channels import PostChannel, load_channels
+from admin_bot.utils.image_store import ImageStore
+from admin_bot.utils.digest import Digest, digest_planner, build_digest_caption, build_digest_keyboard, client_deep_link, order_deep_link
 
-async def auto_posting(bot: Bot):
-    """Автоматическая публикация товаров"""
+logger = logging.getLogger(__name__)
+
+# Общий лимит исходящих сообщений админ-бота на все каналы
+send_limiter = SendRateLimiter()
+
+class PhotoIds:
+    """URL фото поставщика -> file_id в Telegram; вытесняются давно не использованные"""
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._ids: 'OrderedDict[str, str]' = OrderedDict()
+
+    def resolve(self, urls: List[str]) -> List[str]:
+        """file_id для уже загруженных фото, URL для остальных"""
+        photos = []
+        for url in urls:
+            file_id = self._ids.get(url)
+            if file_id is not None:
+                self._ids.move_to_end(url)
+            photos.append(file_id or url)
+        return photos
+
+    def remember(self, urls: List[str], file_ids: List[str]):
+        for url, file_id in zip(urls, file_ids):
+            self._ids[url] = file_id
+            self._ids.move_to_end(url)
+        while len(self._ids) > self.max_size:
+            self._ids.popitem(last=False)
+
+photo_ids = PhotoIds()
+
+# Локальные копии фото поставщика; None - Telegram скачивает фото по URL сам
+image_store = ImageStore() if Config.IMAGE_STORE_ENABLED else None
+
+@asynccontextmanager
+async def local_photos(photos: List[str]) -> AsyncIterator[List[Union[str, types.InputFile]]]:
+    """Фото для отправки: локальные копии, которые не вытесняются до конца блока, или как есть без хранилища"""
+    if image_store is None:
+        yield photos
+        return
+    async with image_store.localized(photos) as local:
+        yield local
+
+def build_post_text(product: Product, price_diff: float = None) -> str:
+    """Формирует текст поста о товаре"""
+    text = f"📦 {product.name}\n\n"
+    
+    # Показываем скидку только если разница больше 100 грн
+    calculated_price = product.get_calculated_price()
+    if price_diff and price_diff >= 100:
+        text += f"🔥 ЗНИЖКА! Стара ціна: {calculated_price + price_diff} грн\n"
+        text += f"💰 Нова ціна: {calculated_price} грн\n"
+        text += f"📉 Економія: {price_diff} грн!\n\n"
+    else:
+        text += f"💰 Ціна: {calculated_price} грн\n\n"
+    
+    # Перевод из кэша этапа перевода, пока его нет - исходное описание
+    description = format_description(translated(product.description))
+    text += f"📝 Опис:\n{description}\n\n"
+    text += f"📦 Наявність: {'В наявності' if product.stock == 'instock' else 'Немає в наявності'}"
+    return text
+
+def get_valid_images(product: Product) -> List[str]:
+    """Проверяет и фильтрует URL изображений"""
+    valid_images = []
+    if product.images:
+        for url in product.images[:10]:
+            if url.startswith(('http://', 'https://')):
+                clean_url = url.strip(' "\'\t\n\r')
+                valid_images.append(clean_url)
+    return valid_images
+
+def build_order_keyboard(article: str) -> types.InlineKeyboardMarkup:
+    """Кнопки заказа и добавления в корзину с артикулом товара
+
+    Заказ и корзина живут в клиент-боте, поэтому кнопки ведут туда ссылками. Без имени
+    клиент-бота заказ остается callback, как раньше, а кнопки корзины нет.
+    """
+    order_url = order_deep_link(article)
+    if order_url:
+        buttons = [types.InlineKeyboardButton(text="🛍 Замовити", url=order_url)]
+    else:
+        buttons = [types.InlineKeyboardButton(text="🛍 Замовити", callback_data=f"order_{article}")]
+    cart_url = client_deep_link('cart', article)
+    if cart_url:
+        buttons.append(types.InlineKeyboardButton(text="🛒 В кошик", url=cart_url))
+    return types.InlineKeyboardMarkup(inline_keyboard=[buttons])
+
+async def send_post(bot: Bot, chat_id, text: str, photos: List[Union[str, types.InputFile]],
+                    keyboard: types.InlineKeyboardMarkup) -> List[str]:
+    """Отправляет пост в один канал: фото с текстом и кнопкой, остальные фото группой.
+
+    Возвращает file_id отправленных фото, чтобы другие каналы не скачивали их у поставщика заново.
+    Если часть фото не дошла, список короче photos.
+    """
+    if photos:
+        try:
+            # Отправляем первое фото с текстом и кнопкой
+            message = await send_limiter.call(chat_id, lambda: bot.send_photo(
+                chat_id=chat_id,
+                photo=photos[0],
+                caption=text,
+                reply_markup=keyboard,
+                parse_mode='HTML'
+            ))
+        except Exception as img_error:
+            logger.error(f"Ошибка при отправке изображений в {chat_id}: {str(img_error)}")
+        else:
+            file_ids = [message.photo[-1].file_id]
+
+            # Если есть дополнительные фото, отправляем их группой
+            if len(photos) > 1:
+                media = [types.InputMediaPhoto(media=photo) for photo in photos[1:]]
+                try:
+                    messages = await send_limiter.call(
+                        chat_id,
+                        lambda: bot.send_media_group(chat_id=chat_id, media=media),
+                        cost=len(media)
+                    )
+                    file_ids.extend(m.photo[-1].file_id for m in messages if m.photo)
+                except Exception as img_error:
+                    # Пост с текстом и кнопкой уже в канале, второй текстовый не нужен
+                    logger.error(f"Ошибка при отправке дополнительных фото в {chat_id}: {str(img_error)}")
+            return file_ids
+
+    await send_limiter.call(chat_id, lambda: bot.send_message(
+        chat_id=chat_id,
+        text=text,
+        reply_markup=keyboard
+    ))
+    return []
+
+async def publish_product(bot: Bot, product: Product, price_diff: float = None,
+                          chat_ids: List = None) -> List:
+    """Публикует товар в каналы. Возвращает каналы, куда пост дошел
+
+    Фото по URL поставщика загружает только первый успешный канал, остальные
+    получают его file_id и отправляются параллельно в пределах общего лимита.
+    """
+    text = build_post_text(product, price_diff)
+    keyboard = build_order_keyboard(product.article)
+    images = get_valid_images(product)
+    pending = list(chat_ids or [Config.CHANNEL_ID])
+    published = []
+    
+    # Фото, уже загруженные в Telegram раньше, отправляем по file_id, остальные - с диска
+    async with local_photos(photo_ids.resolve(images)) as photos:
+        while pending and not published:
+            chat_id = pending.pop(0)
+            try:
+                file_ids = await send_post(bot, chat_id, text, photos, keyboard)
+                published.append(chat_id)
+            except Exception as e:
+                logger.error(f"Не удалось опубликовать товар {product.article} в {chat_id}: {str(e)}")
+                continue
+            # Остальные каналы получают file_id, только если дошли все фото; иначе - прежние фото
+            if photos and len(file_ids) == len(photos):
+                photos = file_ids
+                photo_ids.remember(images, file_ids)
+        
+        results = await asyncio.gather(
+            *(send_post(bot, chat_id, text, photos, keyboard) for chat_id in pending),
+            return_exceptions=True
+        )
+    for chat_id, result in zip(pending, results):
+        if isinstance(result, Exception):
+            logger.error(f"Не удалось опубликовать товар {product.article} в {chat_id}: {str(result)}")
+        else:
+            published.append(chat_id)
+    return published
+
+def pick_rotation_products(channels: List[PostChannel]) -> Dict[str, Tuple[Product, List[PostChannel]]]:
+    """Товары ротации для каналов за один проход по каталогу: артикул -> (товар, каналы)
+
+    Каждому каналу - случайный товар его категорий в наличии, которого не было
+    в этом канале последние POST_COOLDOWN секунд.
+    """
+    now = time.monotonic()
+    fresh: List[List[Product]] = [[] for _ in channels]
+    posted: List[List[Product]] = [[] for _ in channels]
+    for product in catalog.products:
+        if product.stock != 'instock':
+            continue
+        for i, channel in enumerate(channels):
+            if channel.matches(product):
+                on_cooldown = post_queue.on_cooldown(product.article, now, channel.chat_id)
+                (posted if on_cooldown else fresh)[i].append(product)
+    
+    picks: Dict[str, Tuple[Product, List[PostChannel]]] = {}
+    for channel, fresh_products, posted_products in zip(channels, fresh, posted):
+        available = fresh_products or posted_products
+        logger.info(f"Канал {channel.name or channel.chat_id}: доступно {len(available)} товаров для постинга")
+        if not available:
+            continue
+        product = random.choice(available)
+        # Каналы, которым выпал один товар, получат один пост с общей загрузкой фото
+        picks.setdefault(product.article, (product, []))[1].append(channel)
+    return picks
+
+async def post_product(bot: Bot, product: Product, channels: List[PostChannel],
+                       reason: str, price_diff: float = None) -> bool:
+    """Публикует товар в каналы и отмечает пост в очереди"""
+    logger.info(
+        f"Выбран товар для поста ({reason}): {product.name} (Артикул: {product.article}), "
+        f"каналов: {len(channels)}"
+    )
+    
+    # Проверяем изменение цены; для события снижения берем разницу из каталога
+    tracked_diff = price_tracker.check_price_change(product.article, product.retail_price)
+    if price_diff:
+        tracked_diff = max(tracked_diff or 0, price_diff)
+    
+    published = await publish_product(bot, product, tracked_diff, [c.chat_id for c in channels])
+    if not published:
+        return False
+    post_queue.mark_posted(product.article, published)
+    POSTS_PUBLISHED.inc(len(published), reason=reason)
+    analytics.record(product.article, STEP_POSTED, product.category, len(published))
+    logger.info(f"Автопостинг: опубликован товар {product.name} в {len(published)} из {len(channels)} каналов")
+    return True
+
+async def send_digest(bot: Bot, chat_id, caption: str, photos: List[Union[str, types.InputFile]],
+                      keyboard: types.InlineKeyboardMarkup) -> List[str]:
+    """Отправляет подборку в один канал: альбом с общей подписью и сообщение с кнопками заказа.
+
+    У альбома не бывает кнопок, поэтому на всю подборку уходит два запроса вместо двух на товар.
+    Возвращает file_id фото альбома. Исключение - только если не дошел сам альбом.
+    """
+    # Общая подпись - у первого фото, так Telegram показывает ее под всем альбомом
+    media = [
+        types.InputMediaPhoto(media=photo, caption=caption if i == 0 else None)
+        for i, photo in enumerate(photos)
+    ]
+    messages = await send_limiter.call(
+        chat_id,
+        lambda: bot.send_media_group(chat_id=chat_id, media=media),
+        cost=len(media)
+    )
+    try:
+        await send_limiter.call(chat_id, lambda: bot.send_message(
+            chat_id=chat_id,
+            text="🛍 Замовити з добірки:",
+            reply_markup=keyboard
+        ))
+    except Exception as e:
+        # Альбом уже в канале: подборка считается опубликованной, иначе следующий слот повторит ее
+        logger.error(f"Не удалось отправить кнопки подборки в {chat_id}: {str(e)}")
+    return [m.photo[-1].file_id for m in messages if m.photo]
+
+async def post_digest(bot: Bot, digest: Digest, channel: PostChannel) -> bool:
+    """Публикует подборку в канал: по первому фото каждого товара"""
+    products = [product for product in digest.products if get_valid_images(product)]
+    if len(products) < digest_planner.min_size:
+        return False
+    digest.products = products
+    images = [get_valid_images(product)[0] for product in products]
+    try:
+        async with local_photos(photo_ids.resolve(images)) as photos:
+            photos = await send_digest(bot, channel.chat_id, build_digest_caption(digest), photos,
+                                       build_digest_keyboard(digest))
+    except Exception as e:
+        logger.error(f"Не удалось опубликовать подборку в {channel.chat_id}: {str(e)}")
+        return False
+    if len(photos) == len(images):
+        photo_ids.remember(images, photos)
+
+    for product in products:
+        post_queue.mark_posted(product.article, [channel.chat_id])
+        analytics.record(product.article, STEP_POSTED, product.category, 1)
+    POSTS_PUBLISHED.inc(len(products), reason=digest.reason)
+    logger.info(
+        f"Автопостинг: подборка ({digest.kind}, {digest.category}) из {len(products)} товаров "
+        f"в канал {channel.name or channel.chat_id}"
+    )
+    return True
+
+async def post_digests(bot: Bot, channels: List[PostChannel]) -> Tuple[bool, List[PostChannel]]:
+    """Подборки для каналов по очереди, чтобы следующие каналы брали фото по file_id.
+
+    Возвращает, был ли пост, и каналы без подборки - им достается обычная ротация.
+    """
+    posted, remaining = False, []
+    for channel in channels:
+        digest = digest_planner.plan(channel)
+        if digest is not None and await post_digest(bot, digest, channel):
+            posted = True
+        else:
+            remaining.append(channel)
+    return posted, remaining
+
+async def auto_posting(bot: Bot, channels: List[PostChannel] = None):
+    """Автоматическая публикация: сначала горячие события каталога во все подходящие каналы,
+    затем обычная ротация по расписанию каждого канала"""
+    channels = load_channels() if channels is None else channels
+    if not channels:
+        logger.warning("Автопостинг выключен: не задан ни один канал")
+        return
+    digest_mode = Config.POST_MODE == 'digest'
+    # В режиме подборок события каталога копятся в корзинах планировщика, а не идут отдельными постами
+    catalog.subscribe(digest_planner.on_change if digest_mode else post_queue.on_change)
+    
+    def on_settings(changes: dict):
+        # Новый интервал из настроек применяется к уже запланированным постам без перезапуска
+        if {'POST_INTERVAL', 'HOT_POST_INTERVAL'} & changes.keys():
+            post_queue.wake()
+    settings.subscribe(on_settings)
+    for channel in channels:
+        # Первый пост ротации в каждом канале - сразу после запуска
+        channel.schedule_next(time.monotonic() - channel.interval)
+    
     while True:
+        now = time.monotonic()
+        posted = False
         try:
-            products = read_products()
-            available_products = [p for p in products if p.stock == 'instock']
-            logging.info(f"Доступно {len(available_products)} товаров для постинга")
-            
-            if available_products:
-                product = random.choice(available_products)
-                logging.info(f"Выбран товар для поста: {product.name} (Артикул: {product.article})")
-                
-                # Проверяем изменение цены
-                price_tracker = PriceTracker()
-                price_diff = price_tracker.check_price_change(product.article, product.retail_price)
-                
-                # Формируем текст поста
-                text = f"📦 {product.name}\n\n"
-                
-                # Показываем скидку только если разница больше 100 грн
-                calculated_price = product.get_calculated_price()
-                if price_diff and price_diff >= 100:
-                    text += f"🔥 ЗНИЖКА! Стара ціна: {calculated_price + price_diff} грн\n"
-                    text += f"💰 Нова ціна: {calculated_price} грн\n"
-                    text += f"📉 Економія: {price_diff} грн!\n\n"
-                else:
-                    text += f"💰 Ціна: {calculated_price} грн\n\n"
-                
-                description = format_description(product.description)
-                text += f"📝 Опис:\n{description}\n\n"
-                text += f"📦 Наявність: {'В наявності' if product.stock == 'instock' else 'Немає в наявності'}"
-                
-                # Проверяем и фильтруем URL изображений
-                valid_images = []
-                if product.images:
-                    for url in product.images[:10]:
-                        if url.startswith(('http://', 'https://')):
-                            clean_url = url.strip(' "\'\t\n\r')
-                            valid_images.append(clean_url)
-                
-                # Создаем кнопку с ID товара
-                keyboard = types.InlineKeyboardMarkup(
-                    inline_keyboard=[
-                        [types.InlineKeyboardButton(
-                            text="🛍 Замовити", 
-                            callback_data=f"order_{product.article}"  # Передаем артикул товара
-                        )]
-                    ]
-                )
-                
-                # Отправляем в канал
-                if valid_images:
+            events = []
+            while len(events) < max(1, Config.HOT_POST_BATCH):
+                event = post_queue.pop()
+                if event is None:
+                    break
+                events.append(event)
+            if events:
+                # Пачка горячих постов подряд: по одному на слот очередь не успевала бы за выгрузкой
+                for event in events:
+                    product = catalog.get(event.article)
+                    targets = [c for c in channels if c.matches(product)]
+                    if not targets:
+                        continue
                     try:
-                        # Отправляем первое фото с текстом и кнопкой
-                        await bot.send_photo(
-                            chat_id=Config.CHANNEL_ID,
-                            photo=valid_images[0],
-                            caption=text,
-                            reply_markup=keyboard,
-                            parse_mode='HTML'
-                        )
-                        
-                        # Если есть дополнительные фото, отправляем их группой
-                        if len(valid_images) > 1:
-                            media = [types.InputMediaPhoto(media=url) for url in valid_images[1:]]
-                            await bot.send_media_group(
-                                chat_id=Config.CHANNEL_ID,
-                                media=media
-                            )
-                            
-                    except Exception as img_error:
-                        logging.error(f"Ошибка при отправке изображений: {str(img_error)}")
-                        await bot.send_message(
-                            chat_id=Config.CHANNEL_ID,
-                            text=text,
-                            reply_markup=keyboard
-                        )
-                else:
-                    await bot.send_message(
-                        chat_id=Config.CHANNEL_ID,
-                        text=text,
-                        reply_markup=keyboard
+                        posted = await post_product(bot, product, targets, event.reason, event.price_diff) or posted
+                    except Exception as e:
+                        logger.error(f"Ошибка горячего поста {event.article}: {str(e)}")
+                    # После горячего поста ротация в этих каналах ждет полный интервал
+                    for channel in targets:
+                        channel.schedule_next(now)
+            else:
+                due = [c for c in channels if c.next_post_at <= now]
+                if due:
+                    POSTING_LAG.set(now - min(c.next_post_at for c in due))
+                    remaining = due
+                    if digest_mode:
+                        posted, remaining = await post_digests(bot, due)
+                    picks = pick_rotation_products(remaining) if remaining else {}
+                    results = await asyncio.gather(
+                        *(post_product(bot, product, targets, 'rotation') for product, targets in picks.values()),
+                        return_exceptions=True
                     )
-                
-                logging.info(f"Автопостинг: опубликован товар {product.name}")
+                    for result in results:
+                        if isinstance(result, Exception):
+                            logger.error(f"Ошибка автопостинга: {str(result)}")
+                    posted = posted or any(result is True for result in results)
+                    for channel in due:
+                        channel.schedule_next(now)
                 
         except Exception as e:
-            logging.error(f"Ошибка автопостинга: {str(e)}")
-        #ставим время( частоту ) постов  - 10 минут
-        await asyncio.sleep(Config.POST_INTERVAL)
+            logger.error(f"Ошибка автопостинга: {str(e)}")
+        
+        # Пачки горячих событий идут с коротким интервалом, ротация - по интервалу канала
+        if posted:
+            await asyncio.sleep(min(Config.HOT_POST_INTERVAL, *(c.interval for c in channels)))
+        await post_queue.wait(min(c.next_post_at for c in channels) - time.monotonic())
 
 async def check_and_delete_outdated_posts(bot: Bot):
     """Проверка и удаление устаревших постов"""
@@ -121,15 +405,15 @@ async def check_and_delete_outdated_posts(bot: Bot):
                                 if article in text and article not in available_products:
                                     try:
                                         await bot.delete_message(
-                                            chat_id=Config.CHANNEL_ID,
+                                            chat_id=message.chat.id,
                                             message_id=message.message_id
                                         )
-                                        logging.info(f"Удален пост с товаром {article}")
+                                        logger.info(f"Удален пост с товаром {article}")
                                     except Exception as del_error:
-                                        logging.error(f"Ошибка удаления: {str(del_error)}")
+                                        logger.error(f"Ошибка удаления: {str(del_error)}")
                     except Exception as e:
-                        logging.error(f"Ошибка обработки сообщения: {str(e)}")
+                        logger.error(f"Ошибка обработки сообщения: {str(e)}")
                     
         except Exception as e:
-            logging.error(f"Ошибка проверки постов: {str(e)}")
-        await asyncio.sleep(Config.UPDATE_INTERVAL)
\ No newline at end of file
+            logger.error(f"Ошибка проверки постов: {str(e)}")
+        await settings.sleep(Config.UPDATE_INTERVAL, 'UPDATE_INTERVAL')
\ No newline at end of file
@@ -0,0 +1,111 @@
+from aiogram import Router, types, F
+from aiogram.filters import Command, CommandStart, CommandObject
+from typing import Optional, Tuple
+from aiogram.fsm.context import FSMContext
+from shared.utils.cart import carts, Cart
+from shared.utils.catalog import catalog
+from shared.utils.analytics import analytics, STEP_ORDER_TAP
+from shared.config import Config
+from client_bot.handlers.order_handlers import answer_user, begin_checkout, CATALOG_LOADING
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = Router(name='cart_handlers')
+
+def render_cart(cart: Cart) -> str:
+    text = "🛒 Ваш кошик:\n\n"
+    for number, (product, count) in enumerate(cart.lines(), 1):
+        price = int(product.get_calculated_price())
+        stock = '' if product.stock == 'instock' else ' ❌ немає в наявності'
+        text += f"{number}. {product.name} — {price} грн × {count}{stock}\n"
+    text += f"\n💰 Разом: {cart.total()} грн"
+    return text
+
+def cart_keyboard(cart: Cart) -> types.InlineKeyboardMarkup:
+    rows = [
+        [types.InlineKeyboardButton(
+            text=f"➖ {product.name[:40]}",
+            callback_data=f"cart_rm_{product.article}"
+        )]
+        for product, _ in cart.lines()
+    ]
+    rows.append([
+        types.InlineKeyboardButton(text="✅ Оформити", callback_data="cart_checkout"),
+        types.InlineKeyboardButton(text="🗑 Очистити", callback_data="cart_clear")
+    ])
+    return types.InlineKeyboardMarkup(inline_keyboard=rows)
+
+@router.message(Command("cart"))
+async def cmd_cart(message: types.Message):
+    """Обработчик команды /cart"""
+    cart = carts.get(message.from_user.id)
+    if not cart:
+        await message.answer("🛒 Кошик порожній. Додайте товари кнопкою «🛒 В кошик»")
+        return
+    await message.answer(render_cart(cart), reply_markup=cart_keyboard(cart))
+
+async def add_to_cart(user_id: int, article: str) -> Tuple[Optional[Cart], str]:
+    """Добавляет товар в корзину. Возвращает корзину (None при ошибке) и ответ покупателю"""
+    if not await catalog.wait_loaded():
+        return None, CATALOG_LOADING
+    product = catalog.get(article)
+    if not product:
+        return None, "❌ Товар не знайдено"
+    if product.stock != 'instock':
+        return None, "❌ Товару немає в наявності"
+
+    cart = carts.add(user_id, article)
+    if cart is None:
+        return None, f"❌ У кошику вже максимум товарів ({Config.CART_MAX_ITEMS})"
+    return cart, f"✅ Додано до кошика. Товарів: {len(cart)}. Оформити: /cart"
+
+@router.callback_query(lambda c: c.data and c.data.startswith('cart_add_'))
+async def process_cart_add(callback: types.CallbackQuery):
+    cart, text = await add_to_cart(callback.from_user.id, callback.data[len('cart_add_'):])
+    await callback.answer(text, show_alert=cart is None)
+
+@router.message(CommandStart(deep_link=True, magic=F.args.startswith('cart_')))
+async def process_cart_link(message: types.Message, command: CommandObject):
+    """Кнопка «В кошик» под постом в канале: /start cart_<артикул>"""
+    cart, text = await add_to_cart(message.from_user.id, command.args.split('_', 1)[1])
+    if cart is None:
+        await message.answer(text)
+        return
+    await message.answer(render_cart(cart), reply_markup=cart_keyboard(cart))
+
+@router.callback_query(lambda c: c.data and c.data.startswith('cart_rm_'))
+async def process_cart_remove(callback: types.CallbackQuery):
+    cart = carts.remove(callback.from_user.id, callback.data[len('cart_rm_'):])
+    await callback.answer()
+    if cart is None:
+        await callback.message.edit_text("🛒 Кошик порожній")
+        return
+    await callback.message.edit_text(render_cart(cart), reply_markup=cart_keyboard(cart))
+
+@router.callback_query(lambda c: c.data == 'cart_clear')
+async def process_cart_clear(callback: types.CallbackQuery):
+    carts.clear(callback.from_user.id)
+    await callback.answer()
+    await callback.message.edit_text("🛒 Кошик очищено")
+
+@router.callback_query(lambda c: c.data == 'cart_checkout')
+async def process_cart_checkout(callback: types.CallbackQuery, state: FSMContext):
+    """Оформление всей корзины одним заказом через те же шаги, что и заказ одного товара"""
+    if not await catalog.wait_loaded():
+        await callback.answer(CATALOG_LOADING, show_alert=True)
+        return
+    items, unavailable = carts.checkout_items(callback.from_user.id)
+    if not items:
+        await callback.answer("❌ У кошику немає товарів у наявності", show_alert=True)
+        return
+
+    await callback.answer()
+    if unavailable:
+        names = ', '.join(product.name for product in unavailable)
+        await answer_user(callback, f"⚠️ Немає в наявності, не увійдуть до замовлення: {names}")
+
+    for item in items:
+        analytics.record(item['article'], STEP_ORDER_TAP)
+    await state.set_data({'items': items, 'user_id': callback.from_user.id})
+    await begin_checkout(callback, state)
@@ -0,0 +1,170 @@
+from aiogram import Router, types
+from aiogram.filters import Command
+from typing import List, Optional
+from shared.utils.catalog import catalog
+from shared.utils.catalog_index import CatalogIndex, PRICE_RANGES
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = Router(name='catalog_handlers')
+catalog_index = CatalogIndex()
+
+def _swap_index(index: CatalogIndex):
+    global catalog_index
+    catalog_index = index
+
+# Новый индекс собирается в отдельном потоке, хендлеры видят только готовый
+catalog.subscribe_rebuild(lambda change: catalog_index.updated(change), _swap_index)
+
+CATEGORIES_PAGE_SIZE = 20
+PRODUCTS_PAGE_SIZE = 8
+# Ограничение Telegram на callback_data в байтах
+CALLBACK_DATA_LIMIT = 64
+
+def _range_label(price_range: int) -> str:
+    low, high = PRICE_RANGES[price_range]
+    if price_range == 0:
+        return "Будь-яка ціна"
+    if high is None:
+        return f"від {low} грн"
+    return f"{low}–{high} грн"
+
+def _fits(data: str) -> bool:
+    if len(data.encode()) <= CALLBACK_DATA_LIMIT:
+        return True
+    logger.warning(f"callback_data длиннее {CALLBACK_DATA_LIMIT} байт, кнопка пропущена: {data}")
+    return False
+
+def _callback(*parts) -> Optional[str]:
+    """callback_data из частей; None, если не помещается в ограничение Telegram"""
+    data = ':'.join(str(p) for p in parts)
+    return data if _fits(data) else None
+
+def _button(text: str, data: Optional[str]) -> Optional[types.InlineKeyboardButton]:
+    return types.InlineKeyboardButton(text=text, callback_data=data) if data else None
+
+def _row(*buttons: Optional[types.InlineKeyboardButton]) -> List[types.InlineKeyboardButton]:
+    return [button for button in buttons if button is not None]
+
+def _keyboard(rows: List[List[types.InlineKeyboardButton]]) -> types.InlineKeyboardMarkup:
+    return types.InlineKeyboardMarkup(inline_keyboard=[row for row in rows if row])
+
+def _page_callback(category_id: int, subcategory_id: int, descending: bool, instock: bool,
+                   price_range: int, after=None) -> Optional[str]:
+    price, item_id = after if after else ('', '')
+    return _callback('catp', category_id, subcategory_id, 'd' if descending else 'a',
+                     int(instock), price_range, price, item_id)
+
+def categories_keyboard(offset: int = 0) -> types.InlineKeyboardMarkup:
+    category_ids = catalog_index.sorted_categories()
+    rows = [
+        _row(_button(catalog_index.categories[c], _callback('catc', c)))
+        for c in category_ids[offset:offset + CATEGORIES_PAGE_SIZE]
+    ]
+    navigation = []
+    if offset > 0:
+        navigation.append(_button("⬅️", _callback('catl', max(offset - CATEGORIES_PAGE_SIZE, 0))))
+    if offset + CATEGORIES_PAGE_SIZE < len(category_ids):
+        navigation.append(_button("➡️", _callback('catl', offset + CATEGORIES_PAGE_SIZE)))
+    rows.append(_row(*navigation))
+    return _keyboard(rows)
+
+def subcategories_keyboard(category_id: int) -> types.InlineKeyboardMarkup:
+    rows = [_row(_button("📦 Усі товари категорії", _page_callback(category_id, 0, False, True, 0)))]
+    for subcategory_id in catalog_index.tree.get(category_id, []):
+        rows.append(_row(_button(
+            catalog_index.subcategories[subcategory_id],
+            _page_callback(category_id, subcategory_id, False, True, 0)
+        )))
+    rows.append(_row(_button("↩️ Категорії", _callback('catl', 0))))
+    return _keyboard(rows)
+
+@router.message(Command("catalog"))
+async def cmd_catalog(message: types.Message):
+    """Обработчик команды /catalog"""
+    if not catalog_index.tree:
+        await message.answer("❌ Каталог тимчасово недоступний")
+        return
+    await message.answer("🗂 Оберіть категорію:", reply_markup=categories_keyboard())
+
+@router.callback_query(lambda c: c.data and c.data.startswith('catl:'))
+async def process_categories(callback: types.CallbackQuery):
+    offset = int(callback.data.split(':')[1])
+    await callback.message.edit_text("🗂 Оберіть категорію:", reply_markup=categories_keyboard(offset))
+    await callback.answer()
+
+@router.callback_query(lambda c: c.data and c.data.startswith('catc:'))
+async def process_category(callback: types.CallbackQuery):
+    category_id = int(callback.data.split(':')[1])
+    if category_id not in catalog_index.tree:
+        await callback.answer("❌ Категорію не знайдено", show_alert=True)
+        return
+    await callback.message.edit_text(
+        f"🗂 {catalog_index.categories[category_id]}\n\nОберіть підкатегорію:",
+        reply_markup=subcategories_keyboard(category_id)
+    )
+    await callback.answer()
+
+@router.callback_query(lambda c: c.data and c.data.startswith('catp:'))
+async def process_catalog_page(callback: types.CallbackQuery):
+    """Страница товаров с фильтрами и курсорной пагинацией"""
+    try:
+        _, category_id, subcategory_id, order, instock, price_range, price, item_id = callback.data.split(':')
+        category_id, subcategory_id, price_range = int(category_id), int(subcategory_id), int(price_range)
+        descending = order == 'd'
+        instock = instock == '1'
+        after = (int(price), int(item_id)) if price else None
+
+        page = catalog_index.page(
+            category_id, subcategory_id, instock, price_range, descending, after, PRODUCTS_PAGE_SIZE
+        )
+
+        title = catalog_index.subcategories.get(subcategory_id) or catalog_index.categories.get(category_id, '')
+        text = f"🗂 {title}\n💰 {_range_label(price_range)} · знайдено: {page.total}\n\n"
+        rows = []
+        for number, article in enumerate(page.articles, 1):
+            product = catalog.get(article)
+            if not product:
+                continue
+            stock = '✅' if product.stock == 'instock' else '❌'
+            text += f"{number}. {product.name} — {product.get_calculated_price()} грн {stock}\n"
+            order_data = f"order_{article}"
+            # Товар с длинным артикулом остается в списке, но без кнопки заказа
+            rows.append(_row(_button(f"🛍 {number}. {product.name[:40]}", order_data if _fits(order_data) else None)))
+        if not page.articles:
+            text += "Нічого не знайдено"
+
+        rows.append(_row(
+            _button(
+                "⬇️ Ціна" if descending else "⬆️ Ціна",
+                _page_callback(category_id, subcategory_id, not descending, instock, price_range)
+            ),
+            _button(
+                "✅ В наявності" if instock else "📦 Усі",
+                _page_callback(category_id, subcategory_id, descending, not instock, price_range)
+            ),
+            _button(
+                f"💰 {_range_label((price_range + 1) % len(PRICE_RANGES))}",
+                _page_callback(category_id, subcategory_id, descending, instock, (price_range + 1) % len(PRICE_RANGES))
+            )
+        ))
+        navigation = []
+        if after:
+            navigation.append(_button(
+                "⏮ На початок",
+                _page_callback(category_id, subcategory_id, descending, instock, price_range)
+            ))
+        if page.next_key:
+            navigation.append(_button(
+                "➡️ Далі",
+                _page_callback(category_id, subcategory_id, descending, instock, price_range, page.next_key)
+            ))
+        rows.append(_row(*navigation))
+        rows.append(_row(_button("↩️ Підкатегорії", _callback('catc', category_id))))
+
+        await callback.message.edit_text(text, reply_markup=_keyboard(rows))
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Ошибка при просмотре каталога: {str(e)}")
+        await callback.answer("❌ Помилка при завантаженні каталогу", show_alert=True)
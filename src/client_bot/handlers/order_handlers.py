@@ -1,51 +1,169 @@
 from aiogram import Router, types, F
+from aiogram.filters import CommandStart, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from shared.utils.crm_handler import LpCrmAPI
-from shared.utils.csv_handler import read_products
+from shared.utils.catalog import catalog
+from shared.utils.np_branches import BranchIndex
+from shared.utils.analytics import analytics, STEP_ORDER_TAP, STEP_NAME, STEP_PHONE, STEP_ADDRESS, STEP_ORDERED
+from shared.utils.recommendations import recommendations
+from shared.utils.csv_handler import Product
+from shared.utils.customers import customers
+from shared.utils.cart import carts
+from typing import List, Union
 import logging
 import asyncio
 from shared.config import Config
 
+logger = logging.getLogger(__name__)
+
 router = Router()
 crm_api = LpCrmAPI()
+branch_index = BranchIndex()
+catalog.subscribe(recommendations.on_change)
 
 class OrderStates(StatesGroup):
     waiting_for_name = State()
     waiting_for_phone = State()
     waiting_for_np = State()
+    confirm_profile = State()
+
+NAME_PROMPT = "Для оформлення замовлення, будь ласка, введіть ваше ПІБ:"
+CATALOG_LOADING = "⏳ Каталог ще завантажується, спробуйте за хвилину"
+
+def is_valid_phone(phone: str) -> bool:
+    """Номер в формате +380XXXXXXXXX или 380XXXXXXXXX"""
+    return phone.replace('+', '').isdigit() and (phone.startswith('+380') or phone.startswith('380'))
+
+async def answer_user(event: Union[types.Message, types.CallbackQuery], text: str, reply_markup=None):
+    if isinstance(event, types.Message):
+        await event.answer(text, reply_markup=reply_markup)
+    elif event.message:
+        await event.message.answer(text, reply_markup=reply_markup)
+    else:
+        # У сообщений из inline-режима нет callback.message, пишем пользователю напрямую
+        await event.bot.send_message(event.from_user.id, text, reply_markup=reply_markup)
+
+async def alert_user(event: Union[types.Message, types.CallbackQuery], text: str = None):
+    """Всплывающее уведомление на нажатие кнопки; на команду - обычный ответ"""
+    if isinstance(event, types.CallbackQuery):
+        await event.answer(text, show_alert=bool(text))
+    elif text:
+        await event.answer(text)
+
+def order_articles(data: dict) -> List[str]:
+    """Артикулы оформляемого заказа: все позиции корзины или один товар"""
+    if data.get('items'):
+        return [item['article'] for item in data['items']]
+    return [data.get('product_id')]
+
+def record_step(data: dict, step: str):
+    for article in order_articles(data):
+        analytics.record(article, step)
 
 async def create_order_keyboard(product_id: str) -> types.InlineKeyboardMarkup:
+    return types.InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                types.InlineKeyboardButton(
+                    text="🛍 Замовити", 
+                    callback_data=f"order_{product_id}"
+                ),
+                types.InlineKeyboardButton(
+                    text="🛒 В кошик",
+                    callback_data=f"cart_add_{product_id}"
+                )
+            ]
+        ]
+    )
+
+def similar_keyboard(products: List[Product]) -> types.InlineKeyboardMarkup:
     return types.InlineKeyboardMarkup(
         inline_keyboard=[
             [types.InlineKeyboardButton(
-                text="🛍 Замовити", 
-                callback_data=f"order_{product_id}"
+                text=f"🛍 {product.name[:40]} — {product.get_calculated_price()} грн",
+                callback_data=f"order_{product.article}"
             )]
+            for product in products
         ]
     )
 
 @router.callback_query(lambda c: c.data.startswith('order_'))
 async def process_order(callback: types.CallbackQuery, state: FSMContext):
-    product_id = callback.data.split('_')[1]
-    
-    # Получаем информацию о товаре
-    products = read_products()
-    product = next((p for p in products if p.article == product_id), None)
+    await start_order(callback, state, callback.data.split('_', 1)[1])
+
+@router.message(CommandStart(deep_link=True, magic=F.args.startswith('order_')))
+async def process_order_link(message: types.Message, state: FSMContext, command: CommandObject):
+    """Заказ по ссылке из альбома-подборки в канале: /start order_<артикул>"""
+    await start_order(message, state, command.args.split('_', 1)[1])
+
+async def start_order(event: Union[types.Message, types.CallbackQuery], state: FSMContext, product_id: str):
+    # Сразу после запуска каталог еще разбирается: ждем его, а не отвечаем «не найден»
+    if not await catalog.wait_loaded():
+        await alert_user(event, CATALOG_LOADING)
+        return
+    product = catalog.get(product_id)
     
     if not product:
-        await callback.answer("❌ Товар не найден", show_alert=True)
+        await alert_user(event, "❌ Товар не найден")
         return
-        
-    await state.update_data(
-        product_id=product_id,
-        product_name=product.name,
-        product_price=product.retail_price
-    )
     
-    await callback.message.answer(
-        "Для оформлення замовлення, будь ласка, введіть ваше ПІБ:"
-    )
+    if product.stock != 'instock':
+        similar = recommendations.similar(product_id)
+        if not similar:
+            await alert_user(event, "❌ Товару немає в наявності")
+            return
+        await alert_user(event)
+        await answer_user(
+            event, f"❌ {product.name} зараз немає в наявності. Схожі товари:", similar_keyboard(similar)
+        )
+        return
+    
+    analytics.record(product_id, STEP_ORDER_TAP, product.category)
+    # Данные прошлого оформления, в том числе корзины, не должны попасть в этот заказ
+    await state.set_data({
+        'product_id': product_id,
+        'product_name': product.name,
+        'product_price': int(product.get_calculated_price()),
+        'user_id': event.from_user.id
+    })
+    await begin_checkout(event, state)
+
+async def begin_checkout(event: Union[types.Message, types.CallbackQuery], state: FSMContext):
+    """Первый шаг оформления: прошлые данные покупателя или вопрос о ПІБ"""
+    # Постоянному покупателю предлагаем прошлые данные вместо трех вопросов
+    profile = await asyncio.to_thread(customers.get, event.from_user.id)
+    if profile and is_valid_phone(profile.phone):
+        await answer_user(
+            event,
+            f"Оформити замовлення на дані з попереднього замовлення?\n\n{profile.describe()}",
+            types.InlineKeyboardMarkup(inline_keyboard=[[
+                types.InlineKeyboardButton(text="✅ Так, оформити", callback_data="reuse_yes"),
+                types.InlineKeyboardButton(text="✏️ Ввести нові", callback_data="reuse_no")
+            ]])
+        )
+        await state.set_state(OrderStates.confirm_profile)
+        return
+    
+    await answer_user(event, NAME_PROMPT)
+    await state.set_state(OrderStates.waiting_for_name)
+
+@router.callback_query(OrderStates.confirm_profile, lambda c: c.data in ('reuse_yes', 'reuse_no'))
+async def process_profile_choice(callback: types.CallbackQuery, state: FSMContext):
+    # Выходим из confirm_profile до первого ожидания: повторное нажатие уже не пройдет фильтр
+    await state.set_state(None)
+    await callback.answer()
+    if callback.data == 'reuse_yes':
+        profile = await asyncio.to_thread(customers.get, callback.from_user.id)
+        if profile and is_valid_phone(profile.phone):
+            data = await state.update_data(name=profile.name, phone=profile.phone)
+            record_step(data, STEP_NAME)
+            record_step(data, STEP_PHONE)
+            await callback.message.edit_text(f"📦 Оформлюємо на ваші дані:\n\n{profile.describe()}")
+            await submit_order(callback.message, state, profile.np_office)
+            return
+    
+    await callback.message.edit_text(NAME_PROMPT)
     await state.set_state(OrderStates.waiting_for_name)
 
 @router.message(OrderStates.waiting_for_name)
@@ -55,7 +173,8 @@ async def process_name(message: types.Message, state: FSMContext):
         await message.answer("❌ Будь ласка, введіть повне ПІБ (Прізвище та Ім'я обов'язково)")
         return
         
-    await state.update_data(name=name)
+    data = await state.update_data(name=name)
+    record_step(data, STEP_NAME)
     await message.answer("Введіть ваш номер телефону у форматі +380XXXXXXXXX:")
     await state.set_state(OrderStates.waiting_for_phone)
 
@@ -63,43 +182,101 @@ async def process_name(message: types.Message, state: FSMContext):
 async def process_phone(message: types.Message, state: FSMContext):
     phone = message.text
     # Проверяем формат телефона
-    if not phone.replace('+', '').isdigit() or not (phone.startswith('+380') or phone.startswith('380')):
+    if not is_valid_phone(phone):
         await message.answer("❌ Некоректний формат номера.\nБудь ласка, введіть номер у форматі +380XXXXXXXXX")
         return
         
-    await state.update_data(phone=phone)
-    await message.answer("Введіть номер відділення або поштомату Нової Пошти:")
+    data = await state.update_data(phone=phone)
+    record_step(data, STEP_PHONE)
+    await message.answer("Введіть місто та номер відділення або поштомату Нової Пошти (наприклад: Київ 25):")
     await state.set_state(OrderStates.waiting_for_np)
 
 @router.message(OrderStates.waiting_for_np)
 async def process_np(message: types.Message, state: FSMContext):
     np_number = message.text
+    
+    # Справочник загружается в фоне; пока его нет, принимаем адрес как есть
+    if not branch_index.loaded:
+        await submit_order(message, state, np_number)
+        return
+    
+    branch, suggestions = branch_index.match(np_number)
+    if branch:
+        await submit_order(message, state, branch.label())
+        return
+    
+    if suggestions:
+        await message.answer(
+            "🔎 Оберіть відділення зі списку або введіть місто та номер ще раз:",
+            reply_markup=types.InlineKeyboardMarkup(
+                inline_keyboard=[
+                    [types.InlineKeyboardButton(text=b.label()[:64], callback_data=f"npb_{b.ref}")]
+                    for b in suggestions
+                ]
+            )
+        )
+        return
+    
+    await message.answer("❌ Відділення не знайдено. Вкажіть місто та номер, наприклад: Київ 25")
+
+@router.callback_query(OrderStates.waiting_for_np, lambda c: c.data and c.data.startswith('npb_'))
+async def process_np_suggestion(callback: types.CallbackQuery, state: FSMContext):
+    branch = branch_index.get(callback.data.split('_', 1)[1])
+    if not branch:
+        await callback.answer("❌ Відділення не знайдено, введіть його ще раз", show_alert=True)
+        return
+    
+    await callback.answer()
+    await callback.message.edit_text(f"📮 {branch.label()}")
+    await submit_order(callback.message, state, branch.label())
+
+async def submit_order(message: types.Message, state: FSMContext, np_office: str):
+    """Отправка заказа в CRM"""
     data = await state.get_data()
+    record_step(data, STEP_ADDRESS)
     
     order_data = {
         'product_name': data.get('product_name'),
         'product_price': data.get('product_price'),
         'client_name': data['name'],
         'phone': data['phone'],
-        'nova_poshta_office': np_number,
+        'nova_poshta_office': np_office,
         'source': 'TG'
     }
+    if data.get('items'):
+        # Вся корзина уходит в CRM одним заказом
+        order_data.update(crm_api.cart_order(data['items']))
     
     max_retries = 3
     retry_delay = 1
     
+    # Повторяем только запрос к CRM: ошибка ответа в Telegram после принятого заказа не должна создавать его второй раз
+    result = None
     for attempt in range(max_retries):
         try:
             result = await crm_api.create_order(order_data)
-            if result:
-                await message.answer("✅ Дякуємо за замовлення! Наш менеджер зв'яжеться з вами найближчим часом.")
-                break
         except Exception as e:
-            if attempt == max_retries - 1:
-                logging.error(f"Ошибка при создании заказа (попытка {attempt + 1}): {str(e)}")
-                await message.answer("❌ Вибачте, сталася помилка. Спробуйте пізніше або зв'яжіться з нами.")
-            else:
-                await asyncio.sleep(retry_delay * (attempt + 1))
-                continue
+            logger.error(f"Ошибка при создании заказа (попытка {attempt + 1}): {str(e)}")
+        if result:
+            break
+        if attempt < max_retries - 1:
+            await asyncio.sleep(retry_delay * (attempt + 1))
+    
+    await state.clear()
+    if not result:
+        logger.error(f"Заказ не создан в CRM после {max_retries} попыток")
+        await message.answer("❌ Вибачте, сталася помилка. Спробуйте пізніше або зв'яжіться з нами.")
+        return
     
-    await state.clear() 
\ No newline at end of file
+    record_step(data, STEP_ORDERED)
+    if data.get('items'):
+        carts.remove_ordered(data['user_id'], data['items'])
+    if data.get('user_id'):
+        try:
+            await asyncio.to_thread(customers.save, data['user_id'], data['name'], data['phone'], np_office)
+        except Exception as e:
+            logger.error(f"Не удалось сохранить профиль покупателя: {str(e)}")
+    await message.answer("✅ Дякуємо за замовлення! Наш менеджер зв'яжеться з вами найближчим часом.")
+    similar = recommendations.similar(order_articles(data)[0])
+    if similar:
+        await message.answer("👀 Вам також може сподобатися:", reply_markup=similar_keyboard(similar))
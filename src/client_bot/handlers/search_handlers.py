@@ -0,0 +1,65 @@
+from aiogram import Router, types
+from shared.config import Config
+from shared.utils.catalog import catalog
+from shared.utils.csv_handler import Product
+from shared.utils.search_index import SearchIndex
+from client_bot.handlers.order_handlers import create_order_keyboard
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+router = Router(name='search_handlers')
+search_index = SearchIndex()
+
+def _swap_index(index: SearchIndex):
+    global search_index
+    search_index = index
+
+# Новый индекс собирается в отдельном потоке, хендлеры видят только готовый
+catalog.subscribe_rebuild(lambda change: search_index.updated(change), _swap_index)
+
+# Telegram принимает не более 50 результатов за ответ
+SEARCH_PAGE_SIZE = 20
+
+def _result_id(article: str) -> str:
+    """ID результата не длиннее 64 байт"""
+    if len(article.encode()) <= 64:
+        return article
+    return hashlib.md5(article.encode()).hexdigest()
+
+async def build_inline_result(product: Product) -> types.InlineQueryResultArticle:
+    price = product.get_calculated_price()
+    stock = 'В наявності' if product.stock == 'instock' else 'Немає в наявності'
+    return types.InlineQueryResultArticle(
+        id=_result_id(product.article),
+        title=product.name,
+        description=f"💰 {price} грн · {stock} · Артикул: {product.article}",
+        thumbnail_url=product.images[0] if product.images else None,
+        input_message_content=types.InputTextMessageContent(
+            message_text=f"📦 {product.name}\n\n💰 Ціна: {price} грн\n📦 Наявність: {stock}"
+        ),
+        reply_markup=await create_order_keyboard(product.article)
+    )
+
+@router.inline_query()
+async def process_inline_search(inline_query: types.InlineQuery):
+    """Поиск товаров в inline-режиме"""
+    try:
+        offset = int(inline_query.offset or 0)
+        articles, total = search_index.search(inline_query.query, offset, SEARCH_PAGE_SIZE)
+
+        results = []
+        for article in articles:
+            product = catalog.get(article)
+            if product:
+                results.append(await build_inline_result(product))
+
+        next_offset = offset + len(articles)
+        await inline_query.answer(
+            results,
+            cache_time=Config.SEARCH_CACHE_TIME,
+            next_offset=str(next_offset) if next_offset < total else ''
+        )
+    except Exception as e:
+        logger.error(f"Ошибка inline-поиска: {str(e)}")
@@ -1,14 +1,29 @@
-from aiogram import Bot, Dispatcher, types
+import time
+STARTED = time.perf_counter()
+
+from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from shared.config import Config
-from client_bot.handlers import order_handlers
+from client_bot.handlers import order_handlers, search_handlers, catalog_handlers, cart_handlers
+from shared.utils.np_branches import refresh_branches
+from shared.utils.throttling import ThrottlingMiddleware
+from shared.utils.metrics import setup_metrics, start_metrics_server, monitor_event_loop_lag
+from shared.utils.profiler import LoopWatchdog
+from shared.utils.settings import settings
+from shared.utils.startup import StartupTimer, warm_up
+from shared.utils.analytics import analytics
+from shared.utils.recommendations import recommendations
+from shared.utils.catalog import catalog
+from shared.utils.customers import customers
 import asyncio
 import logging
-import signal
 import sys
 import os
 
+logger = logging.getLogger(__name__)
+
 # Проверка на запущенные экземпляры
 PID_FILE = 'client_bot.pid'
 
@@ -17,70 +32,92 @@ def check_running():
         with open(PID_FILE, 'r') as f:
             old_pid = int(f.read())
             try:
-                os.kill(old_pid, 0)
-                logging.error(f"Бот уже запущен (PID: {old_pid})")
-                sys.exit(1)
+                # После os.execv при рестарте PID не меняется
+                if old_pid != os.getpid():
+                    os.kill(old_pid, 0)
+                    logger.error(f"Бот уже запущен (PID: {old_pid})")
+                    sys.exit(1)
             except OSError:
                 pass
     with open(PID_FILE, 'w') as f:
         f.write(str(os.getpid()))
 
 def cleanup():
+    # Несброшенные счетчики воронки не должны пропасть при остановке
+    analytics.flush()
     if os.path.exists(PID_FILE):
         os.remove(PID_FILE)
 
-# Инициализация
-bot = Bot(token=Config.CLIENT_BOT_TOKEN)
-bot.session = AiohttpSession()
-storage = MemoryStorage()
-dp = Dispatcher(storage=storage)
+def create_session() -> AiohttpSession:
+    """HTTP-сессия Bot API, при необходимости через собственный сервер Bot API"""
+    if Config.TELEGRAM_API_URL:
+        return AiohttpSession(api=TelegramAPIServer.from_base(Config.TELEGRAM_API_URL))
+    return AiohttpSession()
 
-# Регистрация хендлеров
-dp.include_router(order_handlers.router)
+def create_bot(session: AiohttpSession = None) -> Bot:
+    """Клиентский бот; сессию можно передать общую с админ-ботом"""
+    return Bot(token=Config.CLIENT_BOT_TOKEN, session=session or create_session())
 
-def signal_handler(signum, frame):
-    """Обработчик сигналов для корректного завершения"""
-    logging.info("Получен сигнал завершения...")
-    try:
-        asyncio.get_event_loop().run_until_complete(shutdown(dp))
-    except Exception as e:
-        logging.error(f"Ошибка при завершении: {str(e)}")
-    finally:
-        cleanup()
-        sys.exit(0)
+def create_dispatcher() -> Dispatcher:
+    storage = MemoryStorage()
+    dp = Dispatcher(storage=storage)
+    dp.update.outer_middleware(ThrottlingMiddleware())
+
+    # Регистрация хендлеров
+    dp.include_router(order_handlers.router)
+    dp.include_router(cart_handlers.router)
+    dp.include_router(search_handlers.router)
+    dp.include_router(catalog_handlers.router)
+    return dp
+
+def background_tasks() -> list:
+    """Фоновые задачи клиентского бота"""
+    return [
+        catalog.watch(), analytics.run(), settings.watch(), recommendations.run(), customers.run(),
+        refresh_branches(order_handlers.branch_index)
+    ]
+
+# Инициализация
+bot: Bot = None
+dp: Dispatcher = None
 
 async def main():
+    timer = StartupTimer('client', STARTED)
+    timer.since_start('imports')
     Config.setup_logging('client')
-    logging.info("Запуск клиентского бота...")
+    # Сохраненные админом настройки применяем до создания планировщиков
+    settings.load()
+    logger.info("Запуск клиентского бота...")
+    
+    global bot, dp
+    with timer.phase('setup'):
+        bot = create_bot()
+        dp = create_dispatcher()
+        setup_metrics(dp, bot, 'client')
     
+    check_running()
+    # SIGINT и SIGTERM перехватывает start_polling: опрос завершается, и задачи останавливаются в finally
+    background = []
     try:
-        check_running()
-        await dp.start_polling(bot)
+        LoopWatchdog().start()
+        if Config.CLIENT_METRICS_PORT:
+            await start_metrics_server(Config.CLIENT_METRICS_PORT, Config.METRICS_HOST)
+        # Опрос запускаем сразу, каталог разбирается в фоне
+        polling = asyncio.create_task(dp.start_polling(bot))
+        timer.since_start('polling')
+        await warm_up(timer, prices=False)
+        timer.report()
+        background = [asyncio.create_task(coro) for coro in (monitor_event_loop_lag(), *background_tasks())]
+        await polling
     except Exception as e:
-        logging.error(f"Критическая ошибка: {str(e)}")
-        cleanup()
+        logger.error(f"Критическая ошибка: {str(e)}")
         raise
-
-async def shutdown(dispatcher: Dispatcher):
-    """Корректное завершение работы бота"""
-    logging.info("Завершение работы бота...")
-    try:
-        # Отменяем все задачи
-        for task in asyncio.all_tasks():
-            if task is not asyncio.current_task():
-                task.cancel()
-                try:
-                    await task
-                except asyncio.CancelledError:
-                    pass
-        
-        # Закрываем соединения
-        await dispatcher.storage.close()
-        await bot.session.close()
     finally:
-        cleanup()    
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        cleanup()
+        logger.info("Клиентский бот остановлен")
 
 if __name__ == "__main__":
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
     asyncio.run(main()) 
\ No newline at end of file
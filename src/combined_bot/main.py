@@ -0,0 +1,109 @@
+"""Админ- и клиентский бот в одном процессе
+
+Оба диспетчера работают в одном цикле событий и делят снимок каталога,
+сессию Bot API, HTTP-пул и историю цен. Запуск: python -m combined_bot.main
+"""
+import time
+STARTED = time.perf_counter()
+
+from aiogram import Dispatcher
+from shared.config import Config
+from shared.utils.http import close_session
+from shared.utils.metrics import setup_metrics, start_metrics_server, monitor_event_loop_lag
+from shared.utils.profiler import LoopWatchdog
+from shared.utils.settings import settings
+from shared.utils.startup import StartupTimer
+from admin_bot import main as admin_main
+from client_bot import main as client_main
+from contextlib import suppress
+import asyncio
+import logging
+import signal
+
+logger = logging.getLogger(__name__)
+
+async def stop_polling(dispatcher: Dispatcher):
+    with suppress(RuntimeError):
+        await dispatcher.stop_polling()
+
+async def main():
+    timer = StartupTimer('combined', STARTED)
+    timer.since_start('imports')
+    Config.setup_logging('combined')
+    Config.init_directories()
+    # Сохраненные админом настройки применяем до создания планировщиков
+    settings.load()
+
+    # PID-файлы обоих ботов: отдельный запуск любого из них увидит этот процесс
+    admin_main.check_running()
+    client_main.check_running()
+
+    with timer.phase('setup'):
+        session = client_main.create_session()
+        admin_bot = admin_main.create_bot(session)
+        client_bot = client_main.create_bot(session)
+        admin_dp = admin_main.create_dispatcher()
+        client_dp = client_main.create_dispatcher()
+        setup_metrics(admin_dp, admin_bot, 'admin')
+        setup_metrics(client_dp, client_bot, 'client')
+
+    logger.info("Запуск админ и клиентского бота в одном процессе...")
+    background = []
+    try:
+        LoopWatchdog().start()
+        if Config.COMBINED_METRICS_PORT:
+            await start_metrics_server(Config.COMBINED_METRICS_PORT, Config.METRICS_HOST)
+
+        # Сигналы обрабатываем сами: aiogram регистрирует их на диспетчер, а их здесь два
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(
+                sig, lambda: [asyncio.ensure_future(stop_polling(dp)) for dp in (admin_dp, client_dp)]
+            )
+
+        # Опрос запускаем сразу, выгрузка и прогрев идут параллельно
+        polling = asyncio.gather(
+            admin_dp.start_polling(admin_bot, handle_signals=False, close_bot_session=False),
+            client_dp.start_polling(client_bot, handle_signals=False, close_bot_session=False)
+        )
+        timer.since_start('polling')
+
+        file_updater = await admin_main.start_up(admin_bot, timer)
+        if file_updater is None:
+            polling.cancel()
+            return
+        timer.report()
+
+        background = [
+            asyncio.create_task(coro)
+            for coro in (
+                *admin_main.background_tasks(admin_bot, file_updater),
+                *client_main.background_tasks(),
+                monitor_event_loop_lag()
+            )
+        ]
+        await polling
+    except Exception as e:
+        logger.error(f"Критическая ошибка: {str(e)}")
+        raise
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        await session.close()
+        await close_session()
+        admin_main.cleanup()
+        client_main.cleanup()
+        logger.info("Боты остановлены")
+
+def run():
+    if Config.USE_UVLOOP:
+        try:
+            import uvloop
+            uvloop.install()
+        except ImportError:
+            pass
+    asyncio.run(main())
+
+if __name__ == "__main__":
+    run()
@@ -12,6 +12,9 @@ class Config:
     # Администраторы
     ADMIN_IDS = list(map(int, os.getenv('ADMIN_IDS', '').split(',')))
     
+    # Адрес Bot API (локальный сервер или заглушка для нагрузочных тестов)
+    TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
+    
     # Канал
     CHANNEL_ID = os.getenv('CHANNEL_ID')
     
@@ -21,7 +24,7 @@ class Config:
     
     # CSV
     CSV_URL = "https://websklad.biz.ua/wp-content/uploads/ExportWebskladCSV.csv"
-    CSV_PATH = os.path.join(
+    CSV_PATH = os.getenv('CSV_PATH') or os.path.join(
         os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
         "src",
         "data",
@@ -29,8 +32,180 @@ class Config:
     )
     UPDATE_INTERVAL = 3600  # 1 час
     
+    # Несколько поставщиков: список выгрузок в JSON (name, url, prefix, encoding, delimiter,
+    # update_interval, timeout, columns). Без файла работает одна выгрузка CSV_URL
+    SUPPLIERS_PATH = os.getenv('SUPPLIERS_PATH') or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        "src",
+        "data",
+        "suppliers.json"
+    )
+    FEEDS_DIR = os.getenv('FEEDS_DIR') or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        "src",
+        "data",
+        "feeds"
+    )
+    # Какой поставщик побеждает при одинаковом артикуле: 'stock' - в наличии, затем дешевле; 'price' - дешевле
+    SUPPLIER_CONFLICT_POLICY = os.getenv('SUPPLIER_CONFLICT_POLICY', 'stock')
+    SUPPLIER_PARSE_WORKERS = int(os.getenv('SUPPLIER_PARSE_WORKERS', str(min(4, os.cpu_count() or 1))))
+    
+    LOGS_DIR = os.getenv('LOGS_DIR') or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        "src",
+        "logs"
+    )
+    
     # Интервалы постинг
     POST_INTERVAL = 600  # 10 минут между постами
+    # Горячие посты (снижение цены, возврат в наличие) идут не чаще этого интервала
+    HOT_POST_INTERVAL = int(os.getenv('HOT_POST_INTERVAL', '120'))
+    # Сколько горячих событий публикуется подряд за один такой интервал. Пропускная способность -
+    # HOT_POST_BATCH постов за HOT_POST_INTERVAL (по умолчанию 300 в час); сверх 1000 ожидающих
+    # событий очередь новые не принимает, пока не разберет накопленные
+    HOT_POST_BATCH = int(os.getenv('HOT_POST_BATCH', '10'))
+    # Повторный пост одного товара не раньше чем через сутки
+    POST_COOLDOWN = int(os.getenv('POST_COOLDOWN', '86400'))
+    # Каналы для постинга в JSON (chat_id, name, categories, post_interval).
+    # Без файла посты идут в один канал CHANNEL_ID
+    POST_CHANNELS_PATH = os.getenv('POST_CHANNELS_PATH') or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        "src",
+        "data",
+        "channels.json"
+    )
+    # Режим ротации: single - пост на товар, digest - альбом из подборки скидок или возвратов в наличие
+    POST_MODE = os.getenv('POST_MODE', 'single')
+    # Подборка: до DIGEST_SIZE товаров (не больше 10 в альбоме), не меньше DIGEST_MIN_SIZE,
+    # события каталога за последние DIGEST_WINDOW секунд
+    DIGEST_SIZE = int(os.getenv('DIGEST_SIZE', '6'))
+    DIGEST_MIN_SIZE = int(os.getenv('DIGEST_MIN_SIZE', '3'))
+    DIGEST_WINDOW = int(os.getenv('DIGEST_WINDOW', '86400'))
+    # Имя клиент-бота без @ для ссылок заказа из альбомов
+    CLIENT_BOT_USERNAME = os.getenv('CLIENT_BOT_USERNAME', '').lstrip('@')
+    # Локальное хранилище фото для постов: скачиваются один раз, уменьшаются и грузятся в Telegram с диска
+    IMAGE_STORE_ENABLED = os.getenv('IMAGE_STORE_ENABLED', '1') == '1'
+    IMAGE_STORE_DIR = os.getenv('IMAGE_STORE_DIR') or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        "src",
+        "data",
+        "images"
+    )
+    IMAGE_STORE_MAX_BYTES = int(os.getenv('IMAGE_STORE_MAX_BYTES', str(2 * 1024 ** 3)))
+    IMAGE_MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', '1280'))
+    IMAGE_QUALITY = int(os.getenv('IMAGE_QUALITY', '85'))
+    IMAGE_DOWNLOAD_CONCURRENCY = int(os.getenv('IMAGE_DOWNLOAD_CONCURRENCY', '4'))
+    IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', '2'))
+    # Исходящие сообщения: всего в секунду, в один канал в секунду и размер всплеска
+    SEND_RATE = float(os.getenv('SEND_RATE', '25'))
+    SEND_CHAT_RATE = float(os.getenv('SEND_CHAT_RATE', str(20 / 60)))
+    SEND_CHAT_BURST = int(os.getenv('SEND_CHAT_BURST', '20'))
+    
+    # Правила цен по категориям (см. shared/utils/pricing.py); задаются из админ-бота и хранятся в настройках.
+    # Пустой список - прежнее правило: дроп +500 или РРЦ +200
+    PRICING_RULES = []
+    
+    # Справочник отделений Новой Почты
+    NP_API_KEY = os.getenv('NP_API_KEY')
+    NP_BRANCHES_PATH = os.getenv('NP_BRANCHES_PATH') or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        "src",
+        "data",
+        "np_branches.json"
+    )
+    NP_REFRESH_INTERVAL = 86400  # 1 сутки
+    
+    # Ограничение частоты апдейтов: токенов в секунду и размер всплеска
+    THROTTLE_USER_RATE = float(os.getenv('THROTTLE_USER_RATE', '1'))
+    THROTTLE_USER_BURST = int(os.getenv('THROTTLE_USER_BURST', '5'))
+    THROTTLE_CHAT_RATE = float(os.getenv('THROTTLE_CHAT_RATE', '5'))
+    THROTTLE_CHAT_BURST = int(os.getenv('THROTTLE_CHAT_BURST', '20'))
+    # Inline-запросы не тратят токены пользователя: отвечаем на последний после паузы в наборе, секунд
+    INLINE_DEBOUNCE = float(os.getenv('INLINE_DEBOUNCE', '0.3'))
+    
+    # Метрики: порт HTTP-сервера /metrics, 0 - отключено
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    ADMIN_METRICS_PORT = int(os.getenv('ADMIN_METRICS_PORT', '9101'))
+    CLIENT_METRICS_PORT = int(os.getenv('CLIENT_METRICS_PORT', '9102'))
+    # Оба бота в одном процессе (combined_bot) отдают метрики на одном порту
+    COMBINED_METRICS_PORT = int(os.getenv('COMBINED_METRICS_PORT', '9100'))
+    # uvloop для combined_bot, если установлен
+    USE_UVLOOP = os.getenv('USE_UVLOOP', '1') == '1'
+    
+    # Сторож цикла событий: порог блокировки в секундах
+    LOOP_STALL_THRESHOLD = float(os.getenv('LOOP_STALL_THRESHOLD', '0.5'))
+    
+    # Логирование: общий уровень и уровни подсистем ('aiogram=WARNING,shared.utils.csv_handler=DEBUG')
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.getenv('LOG_LEVELS', 'aiogram.event=WARNING')
+    LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+    
+    # Перевод описаний поставщика: бэкенд 'google', 'stub' или пусто - выключено
+    TRANSLATION_BACKEND = os.getenv('TRANSLATION_BACKEND', '')
+    TRANSLATION_SOURCE = os.getenv('TRANSLATION_SOURCE', 'ru')
+    TRANSLATION_TARGET = os.getenv('TRANSLATION_TARGET', 'uk')
+    TRANSLATION_BATCH_SIZE = int(os.getenv('TRANSLATION_BATCH_SIZE', '50'))
+    TRANSLATION_CACHE_PATH = os.getenv('TRANSLATION_CACHE_PATH') or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        "src",
+        "data",
+        "translations.sqlite3"
+    )
+    
+    # Архив принятых версий выгрузки: разницы с предыдущей версией и полный снимок каждые N версий
+    FEED_ARCHIVE_PATH = os.getenv('FEED_ARCHIVE_PATH') or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        "src",
+        "data",
+        "feed_archive.sqlite3"
+    )
+    FEED_ARCHIVE_KEYFRAME_EVERY = int(os.getenv('FEED_ARCHIVE_KEYFRAME_EVERY', '24'))
+    FEED_ARCHIVE_RETENTION_DAYS = int(os.getenv('FEED_ARCHIVE_RETENTION_DAYS', '90'))
+    
+    # Воронка пост -> заказ: почасовые счетчики в SQLite, общие для обоих ботов
+    ANALYTICS_PATH = os.getenv('ANALYTICS_PATH') or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        "src",
+        "data",
+        "analytics.sqlite3"
+    )
+    ANALYTICS_FLUSH_INTERVAL = int(os.getenv('ANALYTICS_FLUSH_INTERVAL', '60'))
+    ANALYTICS_REPORT_DAYS = int(os.getenv('ANALYTICS_REPORT_DAYS', '7'))
+    ANALYTICS_RETENTION_DAYS = int(os.getenv('ANALYTICS_RETENTION_DAYS', '180'))
+    
+    # Настройки, измененные из админ-бота; оба бота перечитывают файл при изменении
+    SETTINGS_PATH = os.getenv('SETTINGS_PATH') or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        "src",
+        "data",
+        "settings.json"
+    )
+    SETTINGS_WATCH_INTERVAL = int(os.getenv('SETTINGS_WATCH_INTERVAL', '5'))
+    # Как часто клиент-бот проверяет, не перезаписал ли админ-бот файл каталога
+    CATALOG_WATCH_INTERVAL = int(os.getenv('CATALOG_WATCH_INTERVAL', '5'))
+    # Сколько секунд нажатие ждет первую загрузку каталога после старта
+    CATALOG_LOAD_WAIT = float(os.getenv('CATALOG_LOAD_WAIT', '5'))
+    
+    # Профили постоянных покупателей для оформления заказа в одно нажатие
+    CUSTOMERS_PATH = os.getenv('CUSTOMERS_PATH') or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+        "src",
+        "data",
+        "customers.sqlite3"
+    )
+    CUSTOMERS_RETENTION_DAYS = int(os.getenv('CUSTOMERS_RETENTION_DAYS', '365'))
+    
+    # Корзина: сколько хранится без изменений, сколько разных товаров и покупателей держим в памяти
+    CART_TTL = int(os.getenv('CART_TTL', '86400'))
+    CART_MAX_ITEMS = int(os.getenv('CART_MAX_ITEMS', '20'))
+    CART_MAX_USERS = int(os.getenv('CART_MAX_USERS', '10000'))
+    
+    # Похожие товары: сколько соседей по TF-IDF хранить на товар
+    RECOMMEND_TOP_K = int(os.getenv('RECOMMEND_TOP_K', '10'))
+    
+    # Inline-поиск: сколько секунд Telegram кэширует ответ на запрос
+    SEARCH_CACHE_TIME = int(os.getenv('SEARCH_CACHE_TIME', '300'))
     
     @classmethod
     def init_directories(cls):
@@ -52,14 +227,16 @@ class Config:
             logging.info(f"Создана директория: {logs_dir}")
         
 
+    @classmethod
     def setup_logging(cls, bot_type: str = 'main'):
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(f'{bot_type}_bot.log'),
-                logging.StreamHandler()
-            ]
+        """Логирование через очередь с JSON-файлом и ротацией"""
+        from shared.utils.logging_setup import configure_logging, parse_levels
+        configure_logging(
+            f'{bot_type}_bot.log',
+            level=cls.LOG_LEVEL,
+            levels=parse_levels(cls.LOG_LEVELS),
+            max_bytes=cls.LOG_MAX_BYTES,
+            backup_count=cls.LOG_BACKUP_COUNT
         ) 
 
     def __init__(self):
@@ -0,0 +1,193 @@
+import os
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from shared.config import Config
+from shared.utils.catalog import catalog
+
+logger = logging.getLogger(__name__)
+
+# Шаги воронки от поста до заказа, по порядку
+STEP_POSTED = 'posted'
+STEP_ORDER_TAP = 'order_tap'
+STEP_NAME = 'name'
+STEP_PHONE = 'phone'
+STEP_ADDRESS = 'address'
+STEP_ORDERED = 'ordered'
+FUNNEL_STEPS = (STEP_POSTED, STEP_ORDER_TAP, STEP_NAME, STEP_PHONE, STEP_ADDRESS, STEP_ORDERED)
+
+# (начало часа, артикул, категория, шаг)
+CounterKey = Tuple[int, str, str, str]
+
+@dataclass
+class FunnelStats:
+    """Сумма шагов воронки товара или категории за период"""
+    key: str
+    steps: Dict[str, int] = field(default_factory=dict)
+
+    def count(self, step: str) -> int:
+        return self.steps.get(step, 0)
+
+    def conversion(self, step: str = STEP_ORDERED, base: str = STEP_ORDER_TAP) -> Optional[float]:
+        """Доля дошедших до step от начавших с base; None, если base не было"""
+        total = self.count(base)
+        return self.count(step) / total if total else None
+
+class FunnelStore:
+    """Почасовые счетчики воронки в SQLite; файл общий для процессов админ- и клиент-бота"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # WAL: запись одного бота не блокирует чтение статистики другим
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS funnel_hourly ("
+            "hour INTEGER NOT NULL, article TEXT NOT NULL, category TEXT NOT NULL, "
+            "step TEXT NOT NULL, count INTEGER NOT NULL, "
+            "PRIMARY KEY (hour, article, step))"
+        )
+        self._db.commit()
+
+    def add_many(self, counters: Dict[CounterKey, int]):
+        """Прибавляет счетчики к почасовым корзинам одной транзакцией"""
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO funnel_hourly (hour, article, category, step, count) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (hour, article, step) DO UPDATE SET "
+                "count = count + excluded.count, category = excluded.category",
+                [(*key, count) for key, count in counters.items()]
+            )
+            self._db.commit()
+
+    def _grouped(self, column: str, since: int) -> List[FunnelStats]:
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {column}, step, SUM(count) FROM funnel_hourly "
+                f"WHERE hour >= ? GROUP BY {column}, step",
+                (since,)
+            ).fetchall()
+        stats: Dict[str, FunnelStats] = {}
+        for key, step, count in rows:
+            stats.setdefault(key, FunnelStats(key)).steps[step] = count
+        return list(stats.values())
+
+    def by_article(self, since: int) -> List[FunnelStats]:
+        return self._grouped('article', since)
+
+    def by_category(self, since: int) -> List[FunnelStats]:
+        return self._grouped('category', since)
+
+    def totals(self, step: str, since: int) -> Dict[str, int]:
+        """Артикул -> сумма шага за период"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT article, SUM(count) FROM funnel_hourly WHERE hour >= ? AND step = ? GROUP BY article",
+                (since, step)
+            ).fetchall()
+        return dict(rows)
+
+    def prune(self, before: int) -> int:
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM funnel_hourly WHERE hour < ?", (before,)).rowcount
+            self._db.commit()
+        return deleted
+
+class FunnelAnalytics:
+    """Счетчики воронки в памяти с периодическим сбросом в хранилище
+
+    record() только увеличивает число в словаре и не трогает диск, поэтому
+    его можно вызывать из хендлеров на каждое нажатие.
+    """
+
+    def __init__(self, path: str = None, flush_interval: int = None, retention_days: int = None):
+        self.path = path or Config.ANALYTICS_PATH
+        self.flush_interval = flush_interval or Config.ANALYTICS_FLUSH_INTERVAL
+        self.retention_days = retention_days or Config.ANALYTICS_RETENTION_DAYS
+        self._counters: Dict[CounterKey, int] = {}
+        self._store: Optional[FunnelStore] = None
+        self._running = False
+
+    @property
+    def store(self) -> FunnelStore:
+        # Файл открывается при первом обращении, а не при импорте модуля
+        if self._store is None:
+            self._store = FunnelStore(self.path)
+        return self._store
+
+    def record(self, article: str, step: str, category: str = None, count: int = 1):
+        if not article:
+            return
+        if category is None:
+            product = catalog.get(article)
+            category = product.category if product else ''
+        hour = int(time.time()) // 3600 * 3600
+        key = (hour, article, category, step)
+        self._counters[key] = self._counters.get(key, 0) + count
+
+    def _take(self) -> Dict[CounterKey, int]:
+        # Подмена словаря идет в цикле событий, чтобы record не писал в уже сохраняемый
+        counters, self._counters = self._counters, {}
+        return counters
+
+    def _restore(self, counters: Dict[CounterKey, int], error: Exception):
+        logger.error(f"Не удалось сохранить счетчики воронки: {str(error)}")
+        # Вернем несохраненное, чтобы записать при следующем сбросе
+        for key, count in counters.items():
+            self._counters[key] = self._counters.get(key, 0) + count
+
+    def flush(self) -> int:
+        """Записывает накопленные счетчики. Блокирующий вызов"""
+        counters = self._take()
+        if counters:
+            try:
+                self.store.add_many(counters)
+            except Exception as e:
+                self._restore(counters, e)
+                return 0
+        return len(counters)
+
+    async def flush_async(self) -> int:
+        """То же, что flush, но запись идет в отдельном потоке"""
+        counters = self._take()
+        if counters:
+            try:
+                await asyncio.to_thread(self.store.add_many, counters)
+            except Exception as e:
+                self._restore(counters, e)
+                return 0
+        return len(counters)
+
+    async def run(self):
+        """Фоновый сброс счетчиков; в объединенном процессе запускается один раз"""
+        if self._running:
+            return
+        self._running = True
+        last_prune = 0.0
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush_async()
+                if time.time() - last_prune > 86400:
+                    before = int(time.time()) - self.retention_days * 86400
+                    await asyncio.to_thread(self.store.prune, before)
+                    last_prune = time.time()
+        finally:
+            self._running = False
+            self.flush()
+
+    async def report(self, days: int = None) -> Tuple[List[FunnelStats], List[FunnelStats]]:
+        """Воронка по товарам и по категориям за последние days дней, включая еще не сброшенное"""
+        await self.flush_async()
+        since = int(time.time()) - (days or Config.ANALYTICS_REPORT_DAYS) * 86400
+        by_article = await asyncio.to_thread(self.store.by_article, since)
+        by_category = await asyncio.to_thread(self.store.by_category, since)
+        return by_article, by_category
+
+# Счетчики воронки процесса
+analytics = FunnelAnalytics()
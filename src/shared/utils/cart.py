@@ -0,0 +1,133 @@
+import time
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from shared.config import Config
+from shared.utils.catalog import catalog
+from shared.utils.csv_handler import Product
+
+logger = logging.getLogger(__name__)
+
+# Больше одинаковых товаров в заказе из бота не берут, остальное - опечатки нажатий
+MAX_ITEM_COUNT = 10
+
+@dataclass
+class Cart:
+    """Корзина покупателя: артикул -> количество в порядке добавления"""
+    items: 'OrderedDict[str, int]' = field(default_factory=OrderedDict)
+    updated_at: float = field(default_factory=time.monotonic)
+
+    def __len__(self) -> int:
+        return sum(self.items.values())
+
+    def lines(self) -> List[Tuple[Product, int]]:
+        """Товары корзины, которые еще есть в каталоге"""
+        result = []
+        for article, count in self.items.items():
+            product = catalog.get(article)
+            if product is not None:
+                result.append((product, count))
+        return result
+
+    def total(self) -> int:
+        return sum(int(product.get_calculated_price()) * count for product, count in self.lines())
+
+class CartStore:
+    """Корзины в памяти процесса: ограничены по числу покупателей и товаров, забываются через ttl"""
+
+    def __init__(self, ttl: int = None, max_items: int = None, max_users: int = None):
+        self.ttl = ttl or Config.CART_TTL
+        self.max_items = max_items or Config.CART_MAX_ITEMS
+        self.max_users = max_users or Config.CART_MAX_USERS
+        # Порядок = давность изменения, первыми вытесняются самые старые корзины
+        self._carts: 'OrderedDict[int, Cart]' = OrderedDict()
+
+    def _expired(self, cart: Cart, now: float) -> bool:
+        return now - cart.updated_at > self.ttl
+
+    def _prune(self, now: float):
+        while self._carts:
+            user_id, cart = next(iter(self._carts.items()))
+            if len(self._carts) <= self.max_users and not self._expired(cart, now):
+                break
+            del self._carts[user_id]
+
+    def get(self, user_id: int) -> Optional[Cart]:
+        cart = self._carts.get(user_id)
+        if cart is None:
+            return None
+        if self._expired(cart, time.monotonic()):
+            del self._carts[user_id]
+            return None
+        return cart if cart.items else None
+
+    def _touch(self, user_id: int, cart: Cart):
+        cart.updated_at = time.monotonic()
+        self._carts[user_id] = cart
+        self._carts.move_to_end(user_id)
+
+    def add(self, user_id: int, article: str) -> Optional[Cart]:
+        """Добавляет товар. None, если корзина заполнена"""
+        cart = self.get(user_id) or Cart()
+        count = cart.items.get(article, 0)
+        if count >= MAX_ITEM_COUNT or (not count and len(cart.items) >= self.max_items):
+            return None
+        cart.items[article] = count + 1
+        self._touch(user_id, cart)
+        self._prune(cart.updated_at)
+        return cart
+
+    def remove(self, user_id: int, article: str) -> Optional[Cart]:
+        """Убирает одну единицу товара. Возвращает оставшуюся корзину или None, если она пуста"""
+        cart = self.get(user_id)
+        if cart is None:
+            return None
+        count = cart.items.get(article, 0)
+        if count > 1:
+            cart.items[article] = count - 1
+        else:
+            cart.items.pop(article, None)
+        if not cart.items:
+            self.clear(user_id)
+            return None
+        self._touch(user_id, cart)
+        return cart
+
+    def clear(self, user_id: int):
+        self._carts.pop(user_id, None)
+
+    def remove_ordered(self, user_id: int, items: List[Dict]):
+        """Убирает заказанные позиции; пропущенные при оформлении и добавленные после него остаются"""
+        cart = self.get(user_id)
+        if cart is None:
+            return
+        for item in items:
+            count = cart.items.get(item['article'], 0) - item['count']
+            if count > 0:
+                cart.items[item['article']] = count
+            else:
+                cart.items.pop(item['article'], None)
+        if not cart.items:
+            self.clear(user_id)
+
+    def checkout_items(self, user_id: int) -> Tuple[List[Dict], List[Product]]:
+        """Позиции заказа по товарам в наличии и список товаров, которых больше нет в наличии"""
+        cart = self.get(user_id)
+        if cart is None:
+            return [], []
+        items, unavailable = [], []
+        for product, count in cart.lines():
+            if product.stock != 'instock':
+                unavailable.append(product)
+                continue
+            items.append({
+                'article': product.article,
+                'name': product.name,
+                'price': int(product.get_calculated_price()),
+                'count': count
+            })
+        return items, unavailable
+
+# Корзины процесса клиент-бота
+carts = CartStore()
@@ -0,0 +1,282 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from shared.config import Config
+from shared.utils.csv_handler import read_products, Product
+from shared.utils.pricing import pricing_engine, parse_rules, assign_prices
+from shared.utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Сколько выпавших из выгрузки товаров помнить, чтобы узнать их при возвращении
+MAX_REMOVED = 100000
+
+@dataclass
+class CatalogChange:
+    """Изменения каталога между двумя версиями"""
+    version: int
+    products: List[Product]
+    added: Set[str] = field(default_factory=set)
+    changed: Set[str] = field(default_factory=set)
+    removed: Set[str] = field(default_factory=set)
+    # Предыдущие версии измененных и удаленных товаров, а также добавленных,
+    # которые уже были в каталоге раньше и выпадали из выгрузки
+    previous: Dict[str, Product] = field(default_factory=dict)
+
+@dataclass
+class _Update:
+    """Подготовленная вне цикла событий версия каталога вместе с собранными индексами"""
+    change: CatalogChange
+    by_article: Dict[str, Product]
+    fingerprints: Dict[str, int]
+    # Пары (swap, новый объект) для подписчиков subscribe_rebuild
+    built: List[Tuple[Callable[[Any], None], Any]]
+
+def product_fingerprint(product: Product) -> int:
+    """Отпечаток товара для определения изменений"""
+    return hash((
+        product.name,
+        product.description,
+        product.drop_price,
+        product.retail_price,
+        product.stock,
+        tuple(product.images),
+        product.category,
+        product.subcategory
+    ))
+
+class Catalog:
+    """Снимок каталога с версиями и подпиской на изменения"""
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.products: List[Product] = []
+        self.by_article: Dict[str, Product] = {}
+        self.version = 0
+        self._file_stamp: Optional[Tuple[int, int]] = None
+        self._fingerprints: Dict[str, int] = {}
+        # Последние версии товаров, выпавших из выгрузки
+        self._removed: 'OrderedDict[str, Product]' = OrderedDict()
+        self._listeners: List[Callable[[CatalogChange], None]] = []
+        self._builders: List[Tuple[Callable[[CatalogChange], Any], Callable[[Any], None]]] = []
+        self._loading = False
+        # Правила цен сменились, пока шло обновление: пересчитать после него
+        self._reprice_pending = False
+        self._reprice_task: Optional[asyncio.Task] = None
+        self._watching = False
+        # Устанавливается после первой загрузки снимка
+        self._loaded = asyncio.Event()
+
+    def _snapshot(self) -> CatalogChange:
+        return CatalogChange(version=self.version, products=self.products, added=set(self.by_article))
+
+    def subscribe(self, listener: Callable[[CatalogChange], None]):
+        """Подписка на изменения каталога; обработчик вызывается в цикле событий и должен быть легким"""
+        self._listeners.append(listener)
+        # Новый подписчик сразу получает текущий снимок целиком
+        if self.version:
+            listener(self._snapshot())
+
+    def subscribe_rebuild(self, build: Callable[[CatalogChange], Any], swap: Callable[[Any], None]):
+        """Подписка для тяжелых индексов: build собирает новый объект в отдельном потоке,
+        swap подменяет его в цикле событий вместе с самим снимком
+
+        build не должен менять объект, которым пользуются хендлеры, только строить новый.
+        """
+        self._builders.append((build, swap))
+        if self.version:
+            swap(build(self._snapshot()))
+
+    def _stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path or Config.CSV_PATH)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def refresh(self, force: bool = False) -> bool:
+        """Перечитывает каталог, если файл изменился. Возвращает True при новой версии"""
+        stamp = self._stamp()
+        if self._loading or (not force and self.version and stamp == self._file_stamp):
+            return False
+        update = self._prepare(self._read())
+        self._file_stamp = stamp
+        return self._publish(update)
+
+    async def refresh_async(self, force: bool = False) -> bool:
+        """То же, что refresh, но разбор файла, сравнение версий и сборка индексов
+        идут в отдельном потоке, а в цикле событий только подменяются ссылки"""
+        stamp = self._stamp()
+        if self._loading or (not force and self.version and stamp == self._file_stamp):
+            return False
+        # Пока идет подготовка, второй refresh не запускается и снимок не меняется
+        self._loading = True
+        try:
+            update = await asyncio.to_thread(lambda: self._prepare(self._read()))
+        finally:
+            self._loading = False
+        self._file_stamp = stamp
+        published = self._publish(update)
+        if self._reprice_pending:
+            await self.reprice()
+        return published
+
+    async def watch(self, interval: float = None):
+        """Перечитывает каталог в фоне после перезаписи файла; в объединенном процессе запускается один раз
+
+        Хендлеры только читают текущий снимок и не разбирают файл в цикле событий.
+        """
+        if self._watching:
+            return
+        self._watching = True
+        try:
+            while True:
+                await asyncio.sleep(interval or Config.CATALOG_WATCH_INTERVAL)
+                try:
+                    await self.refresh_async()
+                except Exception as e:
+                    logger.error(f"Ошибка обновления каталога: {str(e)}")
+        finally:
+            self._watching = False
+
+    async def wait_loaded(self, timeout: float = None) -> bool:
+        """Ждет первую загрузку снимка не дольше timeout. True, если каталог загружен"""
+        if self.version:
+            return True
+        try:
+            await asyncio.wait_for(self._loaded.wait(), timeout or Config.CATALOG_LOAD_WAIT)
+        except asyncio.TimeoutError:
+            pass
+        return bool(self.version)
+
+    def _read(self) -> List[Product]:
+        read_products.cache_clear()
+        products = read_products(self.path) if self.path else read_products()
+        # Цены всего каталога считаются одним проходом здесь же, вне цикла событий
+        pricing_engine.price_products(products)
+        return products
+
+    def _prepare(self, products: List[Product]) -> Optional[_Update]:
+        """Сравнивает новую выгрузку с текущим снимком и собирает индексы; снимок не меняет"""
+        if not products and self.products:
+            logger.warning("Каталог пуст после обновления, оставляем предыдущую версию")
+            return None
+
+        by_article = {p.article: p for p in products}
+        fingerprints = {article: product_fingerprint(p) for article, p in by_article.items()}
+
+        change = CatalogChange(version=self.version + 1, products=products)
+        for article, fingerprint in fingerprints.items():
+            old_fingerprint = self._fingerprints.get(article)
+            if old_fingerprint is None:
+                change.added.add(article)
+                returned = self._removed.get(article)
+                if returned is not None:
+                    change.previous[article] = returned
+            elif old_fingerprint != fingerprint:
+                change.changed.add(article)
+                change.previous[article] = self.by_article[article]
+        for article in self._fingerprints.keys() - fingerprints.keys():
+            change.removed.add(article)
+            change.previous[article] = self.by_article[article]
+
+        return _Update(change, by_article, fingerprints, self._build(change))
+
+    def _build(self, change: CatalogChange) -> List[Tuple[Callable[[Any], None], Any]]:
+        built = []
+        for build, swap in self._builders:
+            try:
+                built.append((swap, build(change)))
+            except Exception as e:
+                logger.error(f"Ошибка сборки индекса каталога: {str(e)}")
+        return built
+
+    def _publish(self, update: Optional[_Update]) -> bool:
+        """Подменяет снимок и индексы в цикле событий и оповещает легких подписчиков"""
+        if update is None:
+            return False
+        change = update.change
+        for article in change.added:
+            self._removed.pop(article, None)
+        for article in change.removed:
+            self._removed[article] = change.previous[article]
+        while len(self._removed) > MAX_REMOVED:
+            self._removed.popitem(last=False)
+
+        self.products = change.products
+        self.by_article = update.by_article
+        self._fingerprints = update.fingerprints
+        self.version = change.version
+        for swap, built in update.built:
+            try:
+                swap(built)
+            except Exception as e:
+                logger.error(f"Ошибка подмены индекса каталога: {str(e)}")
+        self._loaded.set()
+        logger.info(
+            f"Каталог обновлен до версии {self.version}: "
+            f"+{len(change.added)} ~{len(change.changed)} -{len(change.removed)}"
+        )
+
+        self._notify(change)
+        return True
+
+    def _notify(self, change: CatalogChange):
+        for listener in self._listeners:
+            try:
+                listener(change)
+            except Exception as e:
+                logger.error(f"Ошибка обработчика изменений каталога: {str(e)}")
+
+    async def reprice(self):
+        """Пересчитывает цены текущего снимка после смены правил
+
+        Проход numpy и сборка индексов идут в отдельном потоке, в цикле событий только
+        записываются цены и публикуется версия, как в refresh_async.
+        Товары не меняются, поэтому подписчики получают новую версию без added/changed:
+        индексы пересобираются, а очередь горячих постов не считает это скидками.
+        """
+        if self._loading:
+            # Идущее обновление могло посчитать цены по старым правилам
+            self._reprice_pending = True
+            return
+        self._loading = True
+        try:
+            while self.products:
+                self._reprice_pending = False
+                products = self.products
+                prices = await asyncio.to_thread(pricing_engine.compute_products, products)
+                assign_prices(products, prices)
+                change = CatalogChange(version=self.version + 1, products=products)
+                built = await asyncio.to_thread(self._build, change)
+                self._publish(_Update(change, self.by_article, self._fingerprints, built))
+                # Правила успели смениться еще раз во время пересчета
+                if not self._reprice_pending:
+                    break
+        finally:
+            self._loading = False
+
+    def schedule_reprice(self):
+        """Запускает reprice в фоне из синхронного обработчика настроек"""
+        if self._reprice_task is not None and not self._reprice_task.done():
+            self._reprice_pending = True
+            return
+        self._reprice_task = asyncio.ensure_future(self.reprice())
+
+    def get(self, article: str) -> Optional[Product]:
+        """Товар по артикулу без полного прохода по каталогу"""
+        return self.by_article.get(article)
+
+# Общий снимок каталога процесса
+catalog = Catalog()
+
+def _on_settings(changes: dict):
+    if 'PRICING_RULES' in changes:
+        pricing_engine.set_rules(parse_rules(changes['PRICING_RULES']))
+        if catalog.products:
+            catalog.schedule_reprice()
+
+settings.subscribe(_on_settings)
@@ -0,0 +1,130 @@
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from shared.utils.catalog import CatalogChange
+
+# Ключ сортировки: (цена, числовой id товара)
+SortKey = Tuple[int, int]
+
+# Предустановленные диапазоны цен, индекс 0 - без фильтра
+PRICE_RANGES: List[Tuple[int, Optional[int]]] = [
+    (0, None),
+    (0, 500),
+    (500, 1000),
+    (1000, 2000),
+    (2000, 5000),
+    (5000, None)
+]
+
+@dataclass
+class Bucket:
+    """Отсортированные по цене товары одной категории или подкатегории"""
+    all: List[SortKey] = field(default_factory=list)
+    instock: List[SortKey] = field(default_factory=list)
+
+@dataclass
+class Page:
+    articles: List[str]
+    next_key: Optional[SortKey]
+    total: int
+
+class CatalogIndex:
+    """Предрасчитанные индексы для постраничного просмотра каталога"""
+
+    def __init__(self):
+        # Короткие числовые id держат callback_data в пределах 64 байт.
+        # Они не переиспользуются, поэтому курсоры переживают обновление каталога
+        self._category_ids: Dict[str, int] = {}
+        self._subcategory_ids: Dict[Tuple[int, str], int] = {}
+        self._item_ids: Dict[str, int] = {}
+        self._articles: Dict[int, str] = {}
+        self.categories: Dict[int, str] = {}
+        self.subcategories: Dict[int, str] = {}
+        self.tree: Dict[int, List[int]] = {}
+        self.buckets: Dict[Tuple[int, int], Bucket] = {}
+
+    @staticmethod
+    def _assign(ids: Dict, key) -> int:
+        if key not in ids:
+            ids[key] = len(ids) + 1
+        return ids[key]
+
+    def apply_change(self, change: CatalogChange):
+        """Пересобирает отсортированные массивы при загрузке новой версии каталога"""
+        for article in change.removed:
+            item_id = self._item_ids.pop(article, None)
+            self._articles.pop(item_id, None)
+
+        buckets: Dict[Tuple[int, int], Bucket] = {}
+        tree: Dict[int, set] = {}
+        for product in change.products:
+            if not product.category:
+                continue
+            category_id = self._assign(self._category_ids, product.category)
+            self.categories[category_id] = product.category
+            subcategory_id = 0
+            if product.subcategory:
+                subcategory_id = self._assign(self._subcategory_ids, (category_id, product.subcategory))
+                self.subcategories[subcategory_id] = product.subcategory
+            tree.setdefault(category_id, set()).add(subcategory_id)
+
+            item_id = self._assign(self._item_ids, product.article)
+            self._articles[item_id] = product.article
+            key = (int(product.get_calculated_price()), item_id)
+            for bucket_key in {(category_id, 0), (category_id, subcategory_id)}:
+                bucket = buckets.setdefault(bucket_key, Bucket())
+                bucket.all.append(key)
+                if product.stock == 'instock':
+                    bucket.instock.append(key)
+
+        for bucket in buckets.values():
+            bucket.all.sort()
+            bucket.instock.sort()
+        self.buckets = buckets
+        self.tree = {
+            category_id: sorted((s for s in subs if s), key=self.subcategories.__getitem__)
+            for category_id, subs in tree.items()
+        }
+
+    def updated(self, change: CatalogChange) -> 'CatalogIndex':
+        """Копия индекса с новой версией каталога; id категорий и товаров сохраняются,
+        а текущий индекс не меняется, поэтому копию можно собирать в отдельном потоке"""
+        index = CatalogIndex()
+        index._category_ids = dict(self._category_ids)
+        index._subcategory_ids = dict(self._subcategory_ids)
+        index._item_ids = dict(self._item_ids)
+        index._articles = dict(self._articles)
+        index.categories = dict(self.categories)
+        index.subcategories = dict(self.subcategories)
+        index.apply_change(change)
+        return index
+
+    def sorted_categories(self) -> List[int]:
+        return sorted(self.tree, key=self.categories.__getitem__)
+
+    def page(self, category_id: int, subcategory_id: int = 0, instock: bool = False,
+             price_range: int = 0, descending: bool = False,
+             after: Optional[SortKey] = None, size: int = 10) -> Page:
+        """Страница товаров по курсору: O(log n) на поиск и O(size) на выборку"""
+        bucket = self.buckets.get((category_id, subcategory_id))
+        if bucket is None:
+            return Page([], None, 0)
+        keys = bucket.instock if instock else bucket.all
+
+        low, high = PRICE_RANGES[price_range] if 0 <= price_range < len(PRICE_RANGES) else PRICE_RANGES[0]
+        lo = bisect_left(keys, (low, -1))
+        hi = bisect_left(keys, (high, -1)) if high is not None else len(keys)
+
+        if descending:
+            end = min(bisect_left(keys, after), hi) if after else hi
+            start = max(end - size, lo)
+            selected = keys[start:end][::-1]
+            has_more = start > lo
+        else:
+            start = max(bisect_right(keys, after), lo) if after else lo
+            end = min(start + size, hi)
+            selected = keys[start:end]
+            has_more = end < hi
+
+        articles = [self._articles[item_id] for _, item_id in selected]
+        return Page(articles, selected[-1] if has_more and selected else None, hi - lo)
@@ -1,8 +1,12 @@
-import aiohttp
 import logging
 import os
-from typing import Dict, Optional
+import time
+from typing import Dict, List, Optional
 from shared.config import Config
+from shared.utils.metrics import CRM_LATENCY, CRM_ERRORS
+from shared.utils.http import get_session
+
+logger = logging.getLogger(__name__)
 
 class LpCrmAPI:
     def __init__(self):
@@ -10,10 +14,33 @@ class LpCrmAPI:
         self.domain = Config.CRM_DOMAIN
         self.base_url = f'http://{self.domain}/api/addNewOrder.html'
         
+    @staticmethod
+    def items_params(items: List[Dict]) -> Dict[str, object]:
+        """Позиции заказа из корзины полями products[i][...] - все товары уходят одним запросом"""
+        params = {}
+        for i, item in enumerate(items):
+            params[f'products[{i}][article]'] = item['article']
+            params[f'products[{i}][product_name]'] = item['name']
+            params[f'products[{i}][price]'] = item['price']
+            params[f'products[{i}][count]'] = item['count']
+        return params
+
+    @staticmethod
+    def cart_order(items: List[Dict]) -> Dict:
+        """Сводные product_name/product_price для заказа из нескольких товаров"""
+        return {
+            'product_name': '; '.join(
+                item['name'] if item['count'] == 1 else f"{item['name']} ×{item['count']}" for item in items
+            ),
+            'product_price': sum(item['price'] * item['count'] for item in items),
+            'items': items
+        }
+
     async def create_order(self, product_data: Dict) -> Optional[Dict]:
         """Создание заказа в CRM"""
         if not self.api_key:
-            logging.error("API ключ LP-CRM не настроен")
+            logger.error("API ключ LP-CRM не настроен")
+            CRM_ERRORS.inc(reason='no_api_key')
             return None
             
         try:
@@ -26,16 +53,22 @@ class LpCrmAPI:
                 'nova_poshta_office': product_data.get('nova_poshta_office'),
                 'source': 'TG'
             }
+            params.update(self.items_params(product_data.get('items') or []))
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.base_url, data=params) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        logging.info(f"Заказ успешно создан в CRM: {result}")
-                        return result
-                    logging.error(f"Ошибка API LP-CRM: {response.status}")
-                    return None
+            started = time.perf_counter()
+            session = get_session()
+            async with session.post(self.base_url, data=params) as response:
+                if response.status == 200:
+                    result = await response.json()
+                    CRM_LATENCY.observe(time.perf_counter() - started)
+                    logger.info(f"Заказ успешно создан в CRM: {result}")
+                    return result
+                CRM_LATENCY.observe(time.perf_counter() - started)
+                CRM_ERRORS.inc(reason=f'http_{response.status}')
+                logger.error(f"Ошибка API LP-CRM: {response.status}")
+                return None
                     
         except Exception as e:
-            logging.error(f"Ошибка при создании заказа в CRM: {str(e)}")
+            CRM_ERRORS.inc(reason=type(e).__name__)
+            logger.error(f"Ошибка при создании заказа в CRM: {str(e)}")
             return None 
\ No newline at end of file
@@ -1,12 +1,17 @@
 import csv
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from typing import List, Optional
 import html
 import re
 import os
 import logging
+import time
 from functools import lru_cache
 from shared.config import Config
+from shared.utils.metrics import CSV_PARSE_DURATION, CATALOG_SIZE
+from shared.utils.pricing import pricing_engine
+
+logger = logging.getLogger(__name__)
 
 @dataclass
 class Product:
@@ -19,10 +24,14 @@ class Product:
     images: List[str]
     category: str
     subcategory: str
+    # Цена по правилам, посчитанная для всего каталога сразу (PricingEngine.price_products)
+    calculated_price: Optional[int] = field(default=None, compare=False, repr=False)
 
     def get_calculated_price(self) -> float:
         """Возвращает расчетную розничную цену"""
-        return calculate_retail_price(self.drop_price, self.retail_price)
+        if self.calculated_price is not None:
+            return self.calculated_price
+        return pricing_engine.price_one(self.drop_price, self.retail_price, self.category, self.subcategory)
 
 def clean_html(raw_html: str) -> str:
     """Очищает HTML-теги и форматирует текст"""
@@ -39,7 +48,7 @@ def clean_html(raw_html: str) -> str:
         return text
         
     except Exception as e:
-        logging.error(f"Ошибка при обработке описания: {str(e)}")
+        logger.error(f"Ошибка при обработке описания: {str(e)}")
         return raw_html
 
 def parse_price(price_str: str) -> float:
@@ -87,16 +96,11 @@ def parse_images(images_raw: str) -> List[str]:
     return [images_raw] if images_raw else []
 
 def calculate_retail_price(drop_price: float, retail_price: float) -> float:
-    """Рассчитывает розничную цену на основе правил"""
-    price_difference = retail_price - drop_price
-    
-    if price_difference < 500:
-        return round(drop_price + 500)  # Округляем до целого числа
-    else:
-        return round(retail_price + 200)  # Округляем до целого числа
+    """Рассчитывает розничную цену по общему правилу ценообразования"""
+    return pricing_engine.price_one(drop_price, retail_price)
 
-@lru_cache(maxsize=1)
-def read_products(filename: str = None) -> List[Product]:
+def parse_products(filename: str = None) -> List[Product]:
+    """Разбирает выгрузку в товары без метрик текущего каталога: подходит и для архивных версий"""
     stats = {
         'total_rows': 0,
         'empty_names': 0,
@@ -104,16 +108,17 @@ def read_products(filename: str = None) -> List[Product]:
         'parse_errors': 0,
         'successful': 0
     }
+    started = time.perf_counter()
     
     try:
         filename = filename or Config.CSV_PATH
         if not os.path.exists(filename):
-            logging.error(f"Файл {filename} не найден")
+            logger.error(f"Файл {filename} не найден")
             return []
 
         # Сначала прочитаем весь файл и посмотрим его размер
         file_size = os.path.getsize(filename)
-        logging.info(f"Размер файла: {file_size} байт")
+        logger.debug(f"Размер файла: {file_size} байт")
 
         all_products = []
         encodings = ['utf-8', 'windows-1251']
@@ -125,7 +130,7 @@ def read_products(filename: str = None) -> List[Product]:
                     # Читаем весь файл в память
                     content = file.read()
                     lines_count = len(content.splitlines())
-                    logging.info(f"Всего строк в файле с кодировкой {encoding}: {lines_count}")
+                    logger.debug(f"Всего строк в файле с кодировкой {encoding}: {lines_count}")
                     
                     # Читаем CSV из строк
                     reader = csv.DictReader(content.splitlines(), delimiter=',')
@@ -166,37 +171,50 @@ def read_products(filename: str = None) -> List[Product]:
                             stats['successful'] += 1
                         except Exception as row_error:
                             stats['parse_errors'] += 1
-                            logging.error(f"Ошибка при обработке строки: {str(row_error)}")
+                            logger.error(f"Ошибка при обработке строки: {str(row_error)}")
                             continue
                             
                     if products_count > 0:
-                        logging.info(f"Прочитано {products_count} товаров с кодировкой {encoding}")
+                        logger.info(f"Прочитано {products_count} товаров с кодировкой {encoding}")
                     
             except UnicodeDecodeError:
-                logging.error(f"Не удалось прочитать файл с кодировкой {encoding}")
+                logger.error(f"Не удалось прочитать файл с кодировкой {encoding}")
                 continue
             except Exception as e:
-                logging.error(f"Ошибка при чтении файла с кодировкой {encoding}: {str(e)}")
+                logger.error(f"Ошибка при чтении файла с кодировкой {encoding}: {str(e)}")
                 continue
 
         if all_products:
             available_count = len([p for p in all_products if p.stock == 'instock'])
             total_count = len(all_products)
-            logging.info(f"Всего товаров в файле: {total_count}")
-            logging.info(f"Товаров в наличии: {available_count}")
-            logging.info(f"""
-            Статистика импорта:
-            Всего строк: {stats['total_rows']}
-            Пропущено пустых названий: {stats['empty_names']}
-            Пропущено электроники: {stats['electronics']}
-            Ошибок парсинга: {stats['parse_errors']}
-            Успешно импортировано: {stats['successful']}
-            """)
+            duration = time.perf_counter() - started
+            logger.info(
+                f"Импорт каталога: {stats['successful']} товаров, в наличии {available_count}",
+                extra={'import_stats': {
+                    **stats,
+                    'total_products': total_count,
+                    'available_products': available_count,
+                    'file_size': file_size,
+                    'duration': round(duration, 3)
+                }}
+            )
             return all_products
         else:
-            logging.error("Не удалось прочитать товары ни с одной из кодировок")
+            logger.error("Не удалось прочитать товары ни с одной из кодировок")
             return []
 
     except Exception as e:
-        logging.error(f"Критическая ошибка при чтении файла: {str(e)}")
-        return [] 
\ No newline at end of file
+        logger.error(f"Критическая ошибка при чтении файла: {str(e)}")
+        return []
+
+@lru_cache(maxsize=1)
+def read_products(filename: str = None) -> List[Product]:
+    """Текущий каталог: разбор выгрузки и метрики размера каталога и времени разбора"""
+    started = time.perf_counter()
+    products = parse_products(filename)
+    if products:
+        available_count = sum(1 for p in products if p.stock == 'instock')
+        CSV_PARSE_DURATION.observe(time.perf_counter() - started)
+        CATALOG_SIZE.set(available_count, stock='instock')
+        CATALOG_SIZE.set(len(products) - available_count, stock='outstock')
+    return products 
\ No newline at end of file
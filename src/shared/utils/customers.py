@@ -0,0 +1,102 @@
+import os
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Optional
+from shared.config import Config
+
+logger = logging.getLogger(__name__)
+
+@dataclass(slots=True)
+class CustomerProfile:
+    """Данные доставки из последнего успешного заказа покупателя"""
+    user_id: int
+    name: str
+    phone: str
+    np_office: str
+    updated_at: int
+
+    def describe(self) -> str:
+        return f"👤 {self.name}\n📞 {self.phone}\n📮 {self.np_office}"
+
+class CustomerStore:
+    """Профили постоянных покупателей в SQLite по Telegram id"""
+
+    def __init__(self, path: str = None, retention_days: int = None):
+        self.path = path or Config.CUSTOMERS_PATH
+        self.retention_days = retention_days or Config.CUSTOMERS_RETENTION_DAYS
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._running = False
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # Файл открывается при первом обращении, а не при импорте модуля
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS customers ("
+                "user_id INTEGER PRIMARY KEY, name TEXT NOT NULL, phone TEXT NOT NULL, "
+                "np_office TEXT NOT NULL, updated_at INTEGER NOT NULL)"
+            )
+            self._db.commit()
+        return self._db
+
+    def get(self, user_id: int) -> Optional[CustomerProfile]:
+        """Профиль покупателя; устаревший по сроку хранения не возвращается"""
+        since = int(time.time()) - self.retention_days * 86400
+        with self._lock:
+            row = self.db.execute(
+                "SELECT user_id, name, phone, np_office, updated_at FROM customers "
+                "WHERE user_id = ? AND updated_at >= ?",
+                (user_id, since)
+            ).fetchone()
+        return CustomerProfile(*row) if row else None
+
+    def save(self, user_id: int, name: str, phone: str, np_office: str):
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO customers (user_id, name, phone, np_office, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (user_id, name, phone, np_office, int(time.time()))
+            )
+            self.db.commit()
+
+    def delete(self, user_id: int) -> bool:
+        with self._lock:
+            deleted = self.db.execute("DELETE FROM customers WHERE user_id = ?", (user_id,)).rowcount
+            self.db.commit()
+        return bool(deleted)
+
+    def prune(self) -> int:
+        """Удаляет профили старше срока хранения. Возвращает число удаленных"""
+        before = int(time.time()) - self.retention_days * 86400
+        with self._lock:
+            deleted = self.db.execute("DELETE FROM customers WHERE updated_at < ?", (before,)).rowcount
+            self.db.commit()
+        return deleted
+
+    async def run(self, interval: int = 86400):
+        """Фоновое удаление устаревших профилей; в объединенном процессе запускается один раз"""
+        if self._running:
+            return
+        self._running = True
+        try:
+            while True:
+                try:
+                    deleted = await asyncio.to_thread(self.prune)
+                    if deleted:
+                        logger.info(f"Удалено устаревших профилей покупателей: {deleted}")
+                except Exception as e:
+                    logger.error(f"Ошибка удаления устаревших профилей: {str(e)}")
+                await asyncio.sleep(interval)
+        finally:
+            self._running = False
+
+# Профили покупателей процесса клиент-бота
+customers = CustomerStore()
@@ -0,0 +1,239 @@
+import os
+import time
+import zlib
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import tempfile
+import threading
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Iterator, List, Optional, Tuple
+from shared.config import Config
+from shared.utils.csv_handler import parse_products, Product
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class ArchivedVersion:
+    """Версия выгрузки в архиве"""
+    id: int
+    created_at: int
+    digest: str
+    keyframe: bool
+    # Размер исходного файла и сжатой записи в архиве
+    size: int
+    stored: int
+
+def split_lines(content: bytes) -> List[bytes]:
+    # keepends: склейка строк дает исходные байты без потерь
+    return content.splitlines(keepends=True)
+
+def make_delta(old: List[bytes], new: List[bytes]) -> bytes:
+    """Разница двух версий: команды '=' (взять строки старой), '-' (пропустить), '+' (вставить байты)"""
+    parts = []
+    matcher = SequenceMatcher(None, old, new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            parts.append(b'= %d\n' % (i2 - i1))
+            continue
+        if i2 > i1:
+            parts.append(b'- %d\n' % (i2 - i1))
+        if j2 > j1:
+            inserted = b''.join(new[j1:j2])
+            parts.append(b'+ %d\n' % len(inserted))
+            parts.append(inserted)
+    return b''.join(parts)
+
+def apply_delta(old: List[bytes], delta: bytes) -> List[bytes]:
+    lines = []
+    position = offset = 0
+    while offset < len(delta):
+        end = delta.index(b'\n', offset)
+        op, count = delta[offset:end].split(b' ')
+        count = int(count)
+        offset = end + 1
+        if op == b'=':
+            lines.extend(old[position:position + count])
+            position += count
+        elif op == b'-':
+            position += count
+        elif op == b'+':
+            lines.extend(split_lines(delta[offset:offset + count]))
+            offset += count
+        else:
+            raise ValueError(f"Неизвестная команда разницы: {op!r}")
+    return lines
+
+class FeedArchive:
+    """Архив принятых версий выгрузки каталога
+
+    Каждая версия хранится сжатой разницей с предыдущей, каждая
+    keyframe_every-я - целиком. Восстановление читает ближайший полный снимок
+    и накатывает не больше keyframe_every - 1 разниц.
+    """
+
+    def __init__(self, path: str = None, keyframe_every: int = None, retention_days: int = None):
+        self.path = path or Config.FEED_ARCHIVE_PATH
+        self.keyframe_every = keyframe_every or Config.FEED_ARCHIVE_KEYFRAME_EVERY
+        self.retention_days = retention_days or Config.FEED_ARCHIVE_RETENTION_DAYS
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # Последняя восстановленная версия: соседние запросы и следующая запись не собирают ее заново
+        self._cached: Optional[Tuple[int, List[bytes]]] = None
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        # Файл открывается при первом обращении, а не при импорте модуля
+        if self._db is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS versions ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, created_at INTEGER NOT NULL, "
+                "digest TEXT NOT NULL, keyframe INTEGER NOT NULL, size INTEGER NOT NULL, data BLOB NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS versions_created ON versions (created_at)")
+            self._db.commit()
+        return self._db
+
+    def _version(self, row) -> ArchivedVersion:
+        id, created_at, digest, keyframe, size, stored = row
+        return ArchivedVersion(id, created_at, digest, bool(keyframe), size, stored)
+
+    def _select(self, where: str = '', params: tuple = (), order: str = 'id') -> List[ArchivedVersion]:
+        rows = self.db.execute(
+            f"SELECT id, created_at, digest, keyframe, size, length(data) FROM versions {where} ORDER BY {order}",
+            params
+        ).fetchall()
+        return [self._version(row) for row in rows]
+
+    def latest(self) -> Optional[ArchivedVersion]:
+        with self._lock:
+            versions = self._select(order='id DESC LIMIT 1')
+        return versions[0] if versions else None
+
+    def versions(self, since: int = 0) -> List[ArchivedVersion]:
+        """Версии, принятые начиная с момента since (unix time)"""
+        with self._lock:
+            return self._select("WHERE created_at >= ?", (since,))
+
+    def at(self, timestamp: int) -> Optional[ArchivedVersion]:
+        """Версия, действовавшая в момент timestamp"""
+        with self._lock:
+            versions = self._select("WHERE created_at <= ?", (timestamp,), order='id DESC LIMIT 1')
+        return versions[0] if versions else None
+
+    def _lines(self, version_id: int) -> List[bytes]:
+        """Восстанавливает строки версии; вызывается под блокировкой"""
+        if self._cached and self._cached[0] == version_id:
+            return self._cached[1]
+        keyframe = self.db.execute(
+            "SELECT MAX(id) FROM versions WHERE id <= ? AND keyframe = 1", (version_id,)
+        ).fetchone()[0]
+        if keyframe is None:
+            raise KeyError(version_id)
+        # Кэш ближе к цели, чем полный снимок, - начинаем с него
+        start = keyframe
+        lines: List[bytes] = []
+        if self._cached and keyframe <= self._cached[0] < version_id:
+            start, lines = self._cached[0] + 1, self._cached[1]
+        rows = self.db.execute(
+            "SELECT id, keyframe, data FROM versions WHERE id >= ? AND id <= ? ORDER BY id",
+            (start, version_id)
+        ).fetchall()
+        if not rows or rows[-1][0] != version_id:
+            raise KeyError(version_id)
+        for _, is_keyframe, data in rows:
+            data = zlib.decompress(data)
+            lines = split_lines(data) if is_keyframe else apply_delta(lines, data)
+        self._cached = (version_id, lines)
+        return lines
+
+    def get(self, version_id: int) -> bytes:
+        """Содержимое файла выгрузки версии version_id. KeyError, если версии нет"""
+        with self._lock:
+            return b''.join(self._lines(version_id))
+
+    def add(self, content: bytes, created_at: int = None) -> Optional[int]:
+        """Сохраняет новую версию. None, если она совпадает с последней. Блокирующий вызов"""
+        digest = hashlib.sha256(content).hexdigest()
+        created_at = int(created_at or time.time())
+        with self._lock:
+            last = self._select(order='id DESC LIMIT 1')
+            if last and last[0].digest == digest:
+                return None
+            since_keyframe = self.db.execute(
+                "SELECT COUNT(*) FROM versions WHERE id > COALESCE((SELECT MAX(id) FROM versions WHERE keyframe = 1), 0)"
+            ).fetchone()[0]
+            keyframe = not last or since_keyframe + 1 >= self.keyframe_every
+            lines = split_lines(content)
+            data = content if keyframe else make_delta(self._lines(last[0].id), lines)
+            cursor = self.db.execute(
+                "INSERT INTO versions (created_at, digest, keyframe, size, data) VALUES (?, ?, ?, ?, ?)",
+                (created_at, digest, int(keyframe), len(content), zlib.compress(data, 6))
+            )
+            self.db.commit()
+            version_id = cursor.lastrowid
+            self._cached = (version_id, lines)
+        logger.info(
+            f"Архив выгрузки: версия {version_id} ({'полная' if keyframe else 'разница'}), "
+            f"{len(content)} байт -> {len(data)} до сжатия"
+        )
+        return version_id
+
+    def add_file(self, path: str) -> Optional[int]:
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            return self.add(f.read())
+
+    def prune(self, before: int = None) -> int:
+        """Удаляет версии старше срока хранения, сохраняя полный снимок, от которого восстанавливаются оставшиеся"""
+        before = before or int(time.time()) - self.retention_days * 86400
+        with self._lock:
+            # Первый полный снимок, начиная с которого все версии еще нужны
+            keep_from = self.db.execute(
+                "SELECT MAX(id) FROM versions WHERE keyframe = 1 AND created_at <= ?", (before,)
+            ).fetchone()[0]
+            if keep_from is None:
+                return 0
+            deleted = self.db.execute("DELETE FROM versions WHERE id < ?", (keep_from,)).rowcount
+            self.db.commit()
+            if self._cached and self._cached[0] < keep_from:
+                self._cached = None
+        if deleted:
+            logger.info(f"Архив выгрузки: удалено {deleted} старых версий")
+        return deleted
+
+    def products(self, version_id: int) -> List[Product]:
+        """Товары версии тем же разбором, что и текущий каталог"""
+        content = self.get(version_id)
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            # Не read_products: его кэш и метрики относятся только к текущему каталогу
+            return parse_products(path)
+        finally:
+            os.remove(path)
+
+    def iter_products(self, since: int = 0) -> Iterator[Tuple[ArchivedVersion, List[Product]]]:
+        """Товары всех версий по порядку - для аудита и восстановления истории цен"""
+        for version in self.versions(since):
+            yield version, self.products(version.id)
+
+    async def archive(self, path: str) -> Optional[int]:
+        """Архивирует принятую выгрузку в отдельном потоке; ошибки архива не мешают обновлению каталога"""
+        try:
+            version_id = await asyncio.to_thread(self.add_file, path)
+            await asyncio.to_thread(self.prune)
+            return version_id
+        except Exception as e:
+            logger.error(f"Не удалось сохранить выгрузку в архив: {str(e)}")
+            return None
+
+# Архив выгрузок процесса админ-бота
+feed_archive = FeedArchive()
@@ -1,23 +1,28 @@
 import os
 import logging
-import aiohttp
 import asyncio
 from datetime import datetime, timedelta
 import hashlib
 from shared.utils.csv_handler import read_products
-import importlib
-import sys
+from shared.utils.catalog import catalog
+from shared.utils.metrics import CSV_DOWNLOAD_DURATION
+from shared.utils.http import get_session
+from shared.utils.settings import settings
+from shared.utils.feed_archive import feed_archive
+from shared.config import Config
+
+logger = logging.getLogger(__name__)
 
 class FileUpdater:
-    def __init__(self, url: str, local_path: str, update_interval: int = 3600):
+    def __init__(self, url: str, local_path: str, update_interval: int = None):
         """
         url: URL файла на сайте поставщика
         local_path: путь к локальному файлу
-        update_interval: интервал обновления в секундах (по умолчанию 1 час)
+        update_interval: интервал обновления в секундах (по умолчанию Config.UPDATE_INTERVAL из настроек)
         """ 
         self.url = url
         self.local_path = local_path
-        self.update_interval = update_interval
+        self._update_interval = update_interval
         self.last_modified = None
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
@@ -28,41 +33,51 @@ class FileUpdater:
             'Connection': 'keep-alive'
         }
         
+    @property
+    def update_interval(self) -> int:
+        # Без явного значения берем текущую настройку, которую админ может поменять на ходу
+        return self._update_interval or Config.UPDATE_INTERVAL
+
+    async def wait(self):
+        """Пауза до следующей проверки; смена интервала в настройках прерывает ее"""
+        await settings.sleep(self.update_interval, 'UPDATE_INTERVAL')
+
     async def download_file(self) -> bool:
         """Скачивает файл и возвращает True если файл был обновлен"""
         try:
             # Создаем директорию если её нет
             os.makedirs(os.path.dirname(self.local_path), exist_ok=True)
             
-            async with aiohttp.ClientSession(headers=self.headers) as session:
-                async with session.get(self.url) as response:
-                    if response.status == 200:
+            session = get_session()
+            async with session.get(self.url, headers=self.headers) as response:
+                if response.status == 200:
+                    with CSV_DOWNLOAD_DURATION.time():
                         content = await response.read()
                         
-                        # Если файла нет - сразу сохраняем
-                        if not os.path.exists(self.local_path):
-                            with open(self.local_path, 'wb') as f:
-                                f.write(content)
-                            logging.info(f"Файл успешно создан: {self.local_path}")
-                            return True
-                        
-                        # Если файл есть - проверяем изменения
-                        with open(self.local_path, 'rb') as f:
-                            old_content = f.read()
-                            if old_content == content:
-                                return False
-                        
-                        # Сохраняем обновленный файл
+                    # Если файла нет - сразу сохраняем
+                    if not os.path.exists(self.local_path):
                         with open(self.local_path, 'wb') as f:
                             f.write(content)
-                        logging.info(f"Файл успешно обновлен: {self.local_path}")
+                        logger.info(f"Файл успешно создан: {self.local_path}")
                         return True
-                    else:
-                        logging.error(f"Ошибка при скачивании файла: {response.status}")
-                        return False
+                        
+                    # Если файл есть - проверяем изменения
+                    with open(self.local_path, 'rb') as f:
+                        old_content = f.read()
+                        if old_content == content:
+                            return False
+                        
+                    # Сохраняем обновленный файл
+                    with open(self.local_path, 'wb') as f:
+                        f.write(content)
+                    logger.info(f"Файл успешно обновлен: {self.local_path}")
+                    return True
+                else:
+                    logger.error(f"Ошибка при скачивании файла: {response.status}")
+                    return False
                         
         except Exception as e:
-            logging.error(f"Ошибка при обновлении файла: {str(e)}")
+            logger.error(f"Ошибка при обновлении файла: {str(e)}")
             return False
             
     async def should_update(self) -> bool:
@@ -88,33 +103,33 @@ class FileUpdater:
                 if not os.path.exists(self.local_path):
                     is_updated = await self.download_file()
                     if not is_updated:
-                        logging.error("Не удалось загрузить файл")
-                        await asyncio.sleep(self.update_interval)
+                        logger.error("Не удалось загрузить файл")
+                        await self.wait()
                         continue
                         
-                    await asyncio.sleep(5)
-                    products = read_products()
+                    products = await asyncio.to_thread(read_products)
                     if not products:
-                        logging.error("Файл загружен, но не удалось прочитать товары")
-                        await asyncio.sleep(self.update_interval)
+                        logger.error("Файл загружен, но не удалось прочитать товары")
+                        await self.wait()
                         continue
                         
-                    logging.info(f"Файл успешно загружен. Товаров: {len(products)}")
+                    logger.info(f"Файл успешно загружен. Товаров: {len(products)}")
                     
                 # Если файл есть - проверяем обновления
                 if await self.should_update():
                     is_updated = await self.download_file()
                     if is_updated:
-                        await asyncio.sleep(5)  # Ждем полной загрузки
-                        read_products.cache_clear()
-                        importlib.reload(sys.modules['shared.utils.csv_handler'])
-                        logging.info("Кэш очищен, модуль перезагружен")
+                        # Обновляем общий снимок, чтобы все части процесса видели одну версию каталога
+                        await catalog.refresh_async(force=True)
+                        logger.info(f"Каталог перечитан, версия {catalog.version}")
+                        if catalog.products:
+                            await feed_archive.archive(self.local_path)
                 
-                await asyncio.sleep(self.update_interval)
+                await self.wait()
                 
             except Exception as e:
-                logging.error(f"Ошибка при проверке обновлений: {str(e)}")
-                await asyncio.sleep(self.update_interval)
+                logger.error(f"Ошибка при проверке обновлений: {str(e)}")
+                await self.wait()
 
     async def initial_check(self):
         """Первичная проверка и загрузка файла"""
@@ -122,19 +137,20 @@ class FileUpdater:
             if not os.path.exists(self.local_path):
                 is_updated = await self.download_file()
                 if not is_updated:
-                    logging.error("Не удалось загрузить файл")
+                    logger.error("Не удалось загрузить файл")
                     return False
                     
-                await asyncio.sleep(5)
-                products = read_products()
+                # download_file пишет файл целиком до возврата, ждать дополнительно не нужно
+                products = await asyncio.to_thread(read_products)
                 if not products:
-                    logging.error("Файл загружен, но не удалось прочитать товары")
+                    logger.error("Файл загружен, но не удалось прочитать товары")
                     return False
                     
-                logging.info(f"Файл успешно загружен. Товаров: {len(products)}")
-                return True
+                logger.info(f"Файл успешно загружен. Товаров: {len(products)}")
+            # Первая версия архива - файл, с которым стартуем; повтор того же файла не сохраняется
+            await feed_archive.archive(self.local_path)
             return True
             
         except Exception as e:
-            logging.error(f"Ошибка при начальной проверке: {str(e)}")
+            logger.error(f"Ошибка при начальной проверке: {str(e)}")
             return False 
\ No newline at end of file
@@ -0,0 +1,25 @@
+import aiohttp
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Общий пул соединений процесса для CRM, выгрузки поставщика и API Новой Почты
+_session: Optional[aiohttp.ClientSession] = None
+
+def get_session() -> aiohttp.ClientSession:
+    """HTTP-сессия процесса, создается при первом обращении"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300),
+            timeout=aiohttp.ClientTimeout(total=300)
+        )
+    return _session
+
+async def close_session():
+    """Закрывает общую HTTP-сессию при завершении процесса"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
@@ -0,0 +1,205 @@
+import time
+import asyncio
+import logging
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+from aiohttp import web
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Sequence[str], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        registry.register(self)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in self._values.items()
+        ]
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # Счетчики по корзинам (не накопительные), сумма и количество
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+class Registry:
+    """Реестр метрик процесса"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Текстовый формат Prometheus"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+registry = Registry()
+
+# Метрики ботов
+HANDLER_LATENCY = Histogram('bot_handler_duration_seconds', 'Время обработки апдейта хендлером', ['bot', 'event', 'handler'])
+HANDLER_ERRORS = Counter('bot_handler_errors_total', 'Исключения в хендлерах', ['bot', 'event', 'handler'])
+THROTTLED_UPDATES = Counter('bot_throttled_updates_total', 'Апдейты, отброшенные ограничением частоты', ['scope'])
+TELEGRAM_LATENCY = Histogram('telegram_api_duration_seconds', 'Время запросов к Telegram Bot API', ['method'])
+TELEGRAM_SEND_WAIT = Histogram('telegram_send_wait_seconds', 'Ожидание лимита исходящих сообщений', ['scope'])
+TELEGRAM_ERRORS = Counter('telegram_api_errors_total', 'Ошибки запросов к Telegram Bot API', ['method'])
+CSV_DOWNLOAD_DURATION = Histogram('csv_download_duration_seconds', 'Время скачивания CSV поставщика')
+CSV_PARSE_DURATION = Histogram('csv_parse_duration_seconds', 'Время разбора CSV каталога')
+CATALOG_SIZE = Gauge('catalog_products', 'Количество товаров в каталоге', ['stock'])
+SUPPLIER_FETCH_DURATION = Histogram('supplier_fetch_duration_seconds', 'Время загрузки выгрузки поставщика', ['supplier'])
+SUPPLIER_ERRORS = Counter('supplier_errors_total', 'Ошибки загрузки и разбора выгрузок поставщиков', ['supplier', 'stage'])
+SUPPLIER_PRODUCTS = Gauge('supplier_products', 'Товаров в последней выгрузке поставщика', ['supplier'])
+CRM_LATENCY = Histogram('crm_request_duration_seconds', 'Время запросов к LP-CRM')
+CRM_ERRORS = Counter('crm_errors_total', 'Ошибки запросов к LP-CRM', ['reason'])
+POSTS_PUBLISHED = Counter('posts_published_total', 'Опубликованные посты по причине', ['reason'])
+POST_QUEUE_SIZE = Gauge('post_queue_size', 'Горячие события в очереди постов')
+IMAGE_STORE_REQUESTS = Counter('image_store_requests_total', 'Запросы к локальному хранилищу фото', ['result'])
+IMAGE_STORE_BYTES = Gauge('image_store_bytes', 'Место, занятое локальными копиями фото')
+POSTING_LAG = Gauge('posting_lag_seconds', 'Задержка публикации относительно расписания')
+EVENT_LOOP_STALLS = Counter('event_loop_stalls_total', 'Блокировки цикла событий дольше порога')
+TRANSLATED_TEXTS = Counter('translation_texts_total', 'Описания, прошедшие этап перевода', ['result'])
+STARTUP_PHASE_DURATION = Gauge('bot_startup_phase_seconds', 'Длительность фаз запуска бота', ['bot', 'phase'])
+EVENT_LOOP_LAG = Histogram('event_loop_lag_seconds', 'Задержка цикла событий', buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5))
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Гистограмма времени работы хендлеров"""
+
+    def __init__(self, bot_name: str, event: str):
+        self.bot_name = bot_name
+        self.event = event
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get('handler')
+        name = getattr(getattr(handler_object, 'callback', None), '__name__', 'unknown')
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(bot=self.bot_name, event=self.event, handler=name)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - started, bot=self.bot_name, event=self.event, handler=name)
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    """Время запросов к Bot API по методам"""
+
+    async def __call__(self, make_request, bot, method):
+        method_name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception:
+            TELEGRAM_ERRORS.inc(method=method_name)
+            raise
+        finally:
+            TELEGRAM_LATENCY.observe(time.perf_counter() - started, method=method_name)
+
+def setup_metrics(dp: Dispatcher, bot, bot_name: str):
+    """Подключает сбор метрик к диспетчеру и сессии бота"""
+    for event in ('message', 'callback_query', 'inline_query'):
+        getattr(dp, event).middleware(HandlerMetricsMiddleware(bot_name, event))
+    # Сессию могут делить несколько ботов одного процесса, второй раз не подключаем
+    if not any(isinstance(m, TelegramMetricsMiddleware) for m in bot.session.middleware):
+        bot.session.middleware(TelegramMetricsMiddleware())
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """Измеряет, насколько позже запланированного просыпается цикл событий"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(loop.time() - started - interval, 0))
+
+async def start_metrics_server(port: int, host: str = '127.0.0.1') -> web.AppRunner:
+    """Запускает HTTP-сервер с /metrics"""
+    async def handle_metrics(request: web.Request) -> web.Response:
+        return web.Response(text=registry.render(), content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info(f"Метрики доступны на http://{host}:{port}/metrics")
+    return runner
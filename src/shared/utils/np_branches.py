@@ -0,0 +1,229 @@
+import os
+import re
+import json
+import logging
+import asyncio
+from difflib import SequenceMatcher
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+from shared.config import Config
+from shared.utils.http import get_session
+
+logger = logging.getLogger(__name__)
+
+NP_API_URL = 'https://api.novaposhta.ua/v2.0/json/'
+
+_WORD_RE = re.compile(r'[^\W\d_]+', re.UNICODE)
+# Сводим близкие украинские и русские буквы, чтобы "Киев" и "Кіїв" находили "Київ"
+_FOLD = str.maketrans({
+    'і': 'и', 'ї': 'и', 'ы': 'и', 'й': 'и', 'є': 'е', 'э': 'е', 'ё': 'е',
+    'ь': None, 'ъ': None, "'": None, '’': None, 'ʼ': None, '-': ' '
+})
+_NUMBER_RE = re.compile(r'\d+')
+
+@dataclass(slots=True)
+class Branch:
+    ref: str
+    city: str
+    number: int
+    description: str
+
+    def label(self) -> str:
+        return f"{self.city}, {self.description}"
+
+def normalize_city(city: str) -> str:
+    """Приводит название города к виду для сравнения"""
+    city = city.split('(')[0].lower().translate(_FOLD)
+    return ' '.join(_WORD_RE.findall(city))
+
+# Слова, которые пользователи добавляют к адресу, но не относятся к городу
+_NOISE_WORDS = {
+    normalize_city(word) for word in (
+        'нп', 'нова', 'пошта', 'відділення', 'відд', 'віділення', 'поштомат', 'пункт',
+        'м', 'місто', 'смт', 'с', 'село', 'отделение', 'почтомат', 'город', 'no', 'n'
+    )
+}
+
+def _trigrams(text: str) -> Set[str]:
+    text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class BranchIndex:
+    """Локальный справочник отделений Новой Почты: город -> номер -> отделение"""
+
+    def __init__(self, path: str = None):
+        self.path = path or Config.NP_BRANCHES_PATH
+        self.branches: Dict[str, Branch] = {}
+        self._by_city: Dict[str, Dict[int, Branch]] = {}
+        self._city_names: Dict[str, str] = {}
+        self._city_trigrams: Dict[str, Set[str]] = {}
+        self._file_stamp = None
+
+    def __len__(self) -> int:
+        return len(self.branches)
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _parse(self) -> Optional[tuple]:
+        """Читает файл и строит таблицы справочника, не трогая текущие"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                raw = json.load(f)
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке справочника отделений: {str(e)}")
+            return None
+
+        branches = {}
+        by_city: Dict[str, Dict[int, Branch]] = {}
+        city_names = {}
+        for item in raw:
+            try:
+                branch = Branch(
+                    ref=item['Ref'],
+                    city=item['CityDescription'],
+                    number=int(item['Number']),
+                    description=item['Description']
+                )
+            except (KeyError, TypeError, ValueError):
+                continue
+            city = normalize_city(branch.city)
+            branches[branch.ref] = branch
+            by_city.setdefault(city, {})[branch.number] = branch
+            city_names[city] = branch.city
+
+        city_trigrams: Dict[str, Set[str]] = {}
+        for city in by_city:
+            for trigram in _trigrams(city):
+                city_trigrams.setdefault(trigram, set()).add(city)
+        return branches, by_city, city_names, city_trigrams
+
+    def _install(self, tables: tuple, stamp: Tuple[int, int]):
+        self.branches, self._by_city, self._city_names, self._city_trigrams = tables
+        self._file_stamp = stamp
+        logger.info(f"Справочник отделений загружен: {len(self.branches)} отделений, {len(self._by_city)} городов")
+
+    @property
+    def loaded(self) -> bool:
+        return self._file_stamp is not None
+
+    def load(self) -> bool:
+        """Загружает справочник, если файл изменился"""
+        stamp = self._stat()
+        if stamp is None:
+            return False
+        if stamp == self._file_stamp:
+            return True
+        tables = self._parse()
+        if tables is None:
+            return False
+        self._install(tables, stamp)
+        return True
+
+    async def load_async(self) -> bool:
+        """То же, что load, но файл разбирается в отдельном потоке, а таблицы подменяются в цикле событий"""
+        stamp = self._stat()
+        if stamp is None:
+            return False
+        if stamp == self._file_stamp:
+            return True
+        tables = await asyncio.to_thread(self._parse)
+        if tables is None:
+            return False
+        self._install(tables, stamp)
+        return True
+
+    def get(self, ref: str) -> Optional[Branch]:
+        return self.branches.get(ref)
+
+    def similar_cities(self, city: str, limit: int = 3, cutoff: float = 0.6) -> List[str]:
+        """Нечеткий поиск города: отбор по триграммам, ранжирование по сходству строк"""
+        if city in self._by_city:
+            return [city]
+        scores: Dict[str, int] = {}
+        for trigram in _trigrams(city):
+            for candidate in self._city_trigrams.get(trigram, ()):
+                scores[candidate] = scores.get(candidate, 0) + 1
+        shortlist = sorted(scores, key=scores.__getitem__, reverse=True)[:20]
+        ranked = []
+        for candidate in shortlist:
+            ratio = SequenceMatcher(None, city, candidate).ratio()
+            if ratio >= cutoff:
+                # При равном сходстве выше города с большим числом отделений
+                ranked.append((-ratio, -len(self._by_city[candidate]), candidate))
+        return [candidate for _, _, candidate in sorted(ranked)[:limit]]
+
+    def match(self, text: str, limit: int = 5) -> Tuple[Optional[Branch], List[Branch]]:
+        """Разбирает ввод пользователя: точное отделение или список подсказок"""
+        numbers = [int(n) for n in _NUMBER_RE.findall(text)]
+        words = [w for w in _WORD_RE.findall(normalize_city(text)) if w not in _NOISE_WORDS]
+        if not words:
+            return None, []
+        city = ' '.join(words)
+        number = numbers[0] if numbers else None
+
+        cities = self.similar_cities(city)
+        if cities and cities[0] == city and number in self._by_city[city]:
+            return self._by_city[city][number], []
+
+        suggestions = []
+        for candidate in cities:
+            branches = self._by_city[candidate]
+            if number is not None and number in branches:
+                suggestions.append(branches[number])
+            elif number is None:
+                suggestions.extend(branches[n] for n in sorted(branches)[:limit])
+        return None, suggestions[:limit]
+
+async def download_branches(path: str = None) -> bool:
+    """Скачивает справочник отделений из API Новой Почты в локальный файл"""
+    if not Config.NP_API_KEY:
+        return False
+    path = path or Config.NP_BRANCHES_PATH
+    branches = []
+    page = 1
+    try:
+        session = get_session()
+        while True:
+            payload = {
+                'apiKey': Config.NP_API_KEY,
+                'modelName': 'Address',
+                'calledMethod': 'getWarehouses',
+                'methodProperties': {'Page': str(page), 'Limit': '500', 'Language': 'UA'}
+            }
+            async with session.post(NP_API_URL, json=payload) as response:
+                result = await response.json(content_type=None)
+            data = result.get('data') or []
+            if not result.get('success') or not data:
+                break
+            branches.extend(
+                {k: item.get(k) for k in ('Ref', 'CityDescription', 'Number', 'Description')}
+                for item in data
+            )
+            page += 1
+
+        if not branches:
+            logger.error("API Новой Почты не вернуло отделений")
+            return False
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(branches, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        logger.info(f"Справочник отделений обновлен: {len(branches)} отделений")
+        return True
+    except Exception as e:
+        logger.error(f"Ошибка при обновлении справочника отделений: {str(e)}")
+        return False
+
+async def refresh_branches(index: BranchIndex):
+    """Загрузка справочника при старте и его периодическое обновление из API, если задан ключ"""
+    await index.load_async()
+    while Config.NP_API_KEY:
+        if await download_branches(index.path):
+            await index.load_async()
+        await asyncio.sleep(Config.NP_REFRESH_INTERVAL)
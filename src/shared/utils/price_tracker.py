@@ -5,8 +5,10 @@ from datetime import datetime
 from typing import Dict, Optional
 from shared.utils.csv_handler import read_products
 
+logger = logging.getLogger(__name__)
+
 class PriceTracker:
-    def __init__(self, history_file: str = None):
+    def __init__(self, history_file: str = None, lazy: bool = False):
         if history_file is None:
             history_file = os.path.join(
                 os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))),
@@ -16,7 +18,9 @@ class PriceTracker:
             )
         self.history_file = history_file
         self.price_history: Dict[str, float] = {}
-        self.load_history()
+        self.loaded = False
+        if not lazy:
+            self.load_history()
     
     def load_history(self):
         """Загружает историю цен из файла"""
@@ -25,8 +29,14 @@ class PriceTracker:
                 with open(self.history_file, 'r') as f:
                     self.price_history = json.load(f)
             except Exception as e:
-                logging.error(f"Ошибка при загрузке истории цен: {str(e)}")
+                logger.error(f"Ошибка при загрузке истории цен: {str(e)}")
                 self.price_history = {}
+        self.loaded = True
+
+    def ensure_loaded(self):
+        """Загружает историю при первом обращении, если ее не прогрели заранее"""
+        if not self.loaded:
+            self.load_history()
     
     def save_history(self):
         """Сохраняет историю цен в файл"""
@@ -34,10 +44,11 @@ class PriceTracker:
             with open(self.history_file, 'w') as f:
                 json.dump(self.price_history, f)
         except Exception as e:
-            logging.error(f"Ошибка при сохранении истории цен: {str(e)}")
+            logger.error(f"Ошибка при сохранении истории цен: {str(e)}")
     
     def check_price_change(self, article: str, current_price: float) -> Optional[float]:
         """Проверяет изменение цены и возвращает разницу"""
+        self.ensure_loaded()
         if article in self.price_history:
             old_price = self.price_history[article]
             if current_price < old_price:
@@ -48,6 +59,7 @@ class PriceTracker:
     
     def get_price_statistics(self) -> Dict:
         """Возвращает статистику изменения цен"""
+        self.ensure_loaded()
         stats = {
             'increased': 0,  # количество повышений цен
             'decreased': 0,  # количество снижений цен
@@ -72,6 +84,9 @@ class PriceTracker:
                 stats['avg_discount'] = stats['total_discount'] / stats['decreased']
                 
         except Exception as e:
-            logging.error(f"Ошибка при расчете статистики цен: {str(e)}")
+            logger.error(f"Ошибка при расчете статистики цен: {str(e)}")
             
-        return stats 
\ No newline at end of file
+        return stats
+
+# Общая история цен процесса; загружается в фоне при запуске или при первом обращении
+price_tracker = PriceTracker(lazy=True)
@@ -0,0 +1,192 @@
+import logging
+import numpy as np
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from shared.config import Config
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class MarkupTier:
+    """Наценка на дроп-цену от порога from_price: процент плюс фиксированная сумма"""
+    from_price: float = 0
+    percent: float = 0
+    fixed: float = 0
+
+@dataclass
+class PricingRule:
+    """Правило цены для категории и подкатегории; None - любая"""
+    category: Optional[str] = None
+    subcategory: Optional[str] = None
+    tiers: List[MarkupTier] = field(default_factory=lambda: [MarkupTier(fixed=500)])
+    # Надбавка к рекомендованной цене поставщика, если его наценка не меньше min_margin; None - не использовать
+    retail_markup: Optional[float] = 200
+    # Минимальная наценка над дроп-ценой
+    min_margin: float = 500
+    # 'int' - до целого, '99' - вверх до ...99
+    rounding: str = 'int'
+
+    @property
+    def key(self) -> Tuple[Optional[str], Optional[str]]:
+        return self.category, self.subcategory
+
+    def describe(self) -> str:
+        scope = ' / '.join(filter(None, self.key)) or 'Все категории'
+        tiers = ', '.join(
+            f"від {tier.from_price:g}: +{tier.percent:g}% +{tier.fixed:g}" for tier in self.tiers
+        )
+        retail = f", РРЦ +{self.retail_markup:g}" if self.retail_markup is not None else ''
+        rounding = ', до …99' if self.rounding == '99' else ''
+        return f"{scope}: {tiers}{retail}, мін. націнка {self.min_margin:g}{rounding}"
+
+# Прежнее фиксированное правило: дроп +500, либо РРЦ +200, если наценка поставщика от 500
+DEFAULT_RULE = PricingRule()
+
+def parse_rules(items: List[Dict[str, Any]]) -> List[PricingRule]:
+    """Правила из JSON-списка. ValueError при ошибке формата"""
+    rules = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError("Правило должно быть объектом")
+        item = dict(item)
+        tiers = sorted(
+            (MarkupTier(float(t.get('from', 0)), float(t.get('percent', 0)), float(t.get('fixed', 0)))
+             for t in item.pop('tiers', [{'fixed': 500}])),
+            key=lambda tier: tier.from_price
+        )
+        if not tiers:
+            raise ValueError("У правила нет ступеней наценки")
+        retail_markup = item.pop('retail_markup', 200)
+        rule = PricingRule(
+            category=item.pop('category', None) or None,
+            subcategory=item.pop('subcategory', None) or None,
+            tiers=tiers,
+            retail_markup=None if retail_markup is None else float(retail_markup),
+            min_margin=float(item.pop('min_margin', 500)),
+            rounding=str(item.pop('round', 'int'))
+        )
+        if item:
+            raise ValueError(f"Неизвестные поля правила: {', '.join(item)}")
+        if rule.rounding not in ('int', '99'):
+            raise ValueError(f"Неизвестное округление: {rule.rounding}")
+        if rule.subcategory and not rule.category:
+            raise ValueError("Подкатегория задается вместе с категорией")
+        rules.append(rule)
+    return rules
+
+def rules_to_json(rules: List[PricingRule]) -> List[Dict[str, Any]]:
+    return [{
+        'category': rule.category,
+        'subcategory': rule.subcategory,
+        'tiers': [{'from': t.from_price, 'percent': t.percent, 'fixed': t.fixed} for t in rule.tiers],
+        'retail_markup': rule.retail_markup,
+        'min_margin': rule.min_margin,
+        'round': rule.rounding
+    } for rule in rules]
+
+def apply_rule(rule: PricingRule, drop: np.ndarray, retail: np.ndarray) -> np.ndarray:
+    """Цены по одному правилу для массивов дроп- и рекомендованных цен"""
+    thresholds = np.array([tier.from_price for tier in rule.tiers])
+    percents = np.array([tier.percent for tier in rule.tiers])
+    fixed = np.array([tier.fixed for tier in rule.tiers])
+    tier = np.clip(np.searchsorted(thresholds, drop, side='right') - 1, 0, None)
+    prices = drop * (1 + percents[tier] / 100) + fixed[tier]
+
+    if rule.retail_markup is not None:
+        use_retail = retail - drop >= rule.min_margin
+        prices = np.where(use_retail, retail + rule.retail_markup, prices)
+    prices = np.maximum(prices, drop + rule.min_margin)
+
+    if rule.rounding == '99':
+        return np.ceil((prices + 1) / 100) * 100 - 1
+    # np.round, как и round, округляет половины к четному
+    return np.round(prices)
+
+def assign_prices(products: list, prices: np.ndarray):
+    """Записывает посчитанные цены в calculated_price товаров"""
+    for product, price in zip(products, prices.astype(np.int64).tolist()):
+        product.calculated_price = price
+
+class PricingEngine:
+    """Расчет розничных цен всего каталога за один векторный проход по колонкам цен"""
+
+    def __init__(self, rules: List[PricingRule] = None):
+        self.set_rules(rules or [])
+
+    def set_rules(self, rules: List[PricingRule]):
+        self.rules = rules
+        self._by_key = {rule.key: i + 1 for i, rule in enumerate(rules)}
+        # Индекс 0 - правило для всех категорий: заданное без категории или прежнее по умолчанию
+        general = self._by_key.get((None, None))
+        self._table = [rules[general - 1] if general else DEFAULT_RULE] + rules
+
+    def _rule_index(self, category: str, subcategory: str) -> int:
+        """Самое точное правило: категория с подкатегорией, затем категория, затем общее"""
+        return self._by_key.get((category, subcategory)) or self._by_key.get((category, None)) or 0
+
+    def compute(self, drop: Sequence[float], retail: Sequence[float],
+                keys: Sequence[Tuple[str, str]]) -> np.ndarray:
+        drop = np.asarray(drop, dtype=np.float64)
+        retail = np.asarray(retail, dtype=np.float64)
+        # Правило выбирается один раз на пару (категория, подкатегория), а не на товар
+        indexes = {key: self._rule_index(*key) for key in set(keys)}
+        rule_of = np.fromiter((indexes[key] for key in keys), dtype=np.int32, count=len(keys))
+        prices = np.empty_like(drop)
+        for index in np.unique(rule_of):
+            mask = rule_of == index
+            prices[mask] = apply_rule(self._table[index], drop[mask], retail[mask])
+        return prices
+
+    def compute_products(self, products: list) -> np.ndarray:
+        """Новые цены товаров без записи в товары"""
+        if not products:
+            return np.empty(0)
+        return self.compute(
+            [p.drop_price for p in products],
+            [p.retail_price for p in products],
+            [(p.category, p.subcategory) for p in products]
+        )
+
+    def price_products(self, products: list) -> np.ndarray:
+        """Считает и сохраняет calculated_price у товаров. Возвращает новые цены"""
+        prices = self.compute_products(products)
+        assign_prices(products, prices)
+        return prices
+
+    def price_one(self, drop_price: float, retail_price: float, category: str = '', subcategory: str = '') -> int:
+        rule = self._table[self._rule_index(category, subcategory)]
+        return int(apply_rule(rule, np.array([drop_price], dtype=np.float64), np.array([retail_price], dtype=np.float64))[0])
+
+def preview(products: list, rules: List[PricingRule], top: int = 5) -> Dict[str, Any]:
+    """Как новые правила сдвинут цены каталога относительно текущих"""
+    if not products:
+        return {'total': 0, 'changed': 0}
+    current = np.array([p.get_calculated_price() for p in products], dtype=np.float64)
+    keys = [(p.category, p.subcategory) for p in products]
+    new = PricingEngine(rules).compute(
+        [p.drop_price for p in products], [p.retail_price for p in products], keys
+    )
+    diff = new - current
+    changed = diff != 0
+    relative = np.divide(diff, current, out=np.zeros_like(diff), where=current > 0)
+
+    # Средний сдвиг по категориям через группировку индексов, без цикла по товарам
+    categories, inverse = np.unique(np.array([key[0] for key in keys], dtype=object), return_inverse=True)
+    sums = np.bincount(inverse, weights=diff)
+    counts = np.bincount(inverse)
+    means = sums / counts
+    order = np.argsort(-np.abs(means))[:top]
+    return {
+        'total': len(products),
+        'changed': int(changed.sum()),
+        'increased': int((diff > 0).sum()),
+        'decreased': int((diff < 0).sum()),
+        'mean_diff': float(diff.mean()),
+        'mean_percent': float(relative.mean() * 100),
+        'min_diff': float(diff.min()),
+        'max_diff': float(diff.max()),
+        'categories': [(str(categories[i]), float(means[i]), int(counts[i])) for i in order if means[i]]
+    }
+
+# Движок цен процесса; правила приходят из настроек (Config.PRICING_RULES)
+pricing_engine = PricingEngine(parse_rules(Config.PRICING_RULES))
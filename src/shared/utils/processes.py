@@ -0,0 +1,12 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+def process_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Пул процессов-обработчиков без fork
+
+    При fork дочерний процесс наследует блокировки, занятые потоками логирования,
+    сторожа цикла и to_thread, и копию очереди логов, которую никто не читает.
+    forkserver и spawn запускают обработчики с чистого интерпретатора.
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context(method))
@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import Counter
+from typing import Optional
+from shared.config import Config
+from shared.utils.metrics import EVENT_LOOP_STALLS
+
+logger = logging.getLogger(__name__)
+
+def _frame_key(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}"
+
+class LoopWatchdog:
+    """Фоновый поток, который замечает блокировку цикла событий и логирует стек"""
+
+    def __init__(self, threshold: float = None, interval: float = 0.1):
+        self.threshold = threshold or Config.LOOP_STALL_THRESHOLD
+        self.interval = interval
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Запуск из потока цикла событий"""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._heartbeat_task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self._thread.start()
+
+    async def _heartbeat(self):
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self):
+        reported_beat = None
+        while True:
+            time.sleep(self.interval)
+            last_beat = self._last_beat
+            lag = time.monotonic() - last_beat - self.interval
+            # Один стек на одну блокировку, а не на каждую проверку
+            if lag < self.threshold or reported_beat == last_beat:
+                continue
+            reported_beat = last_beat
+            EVENT_LOOP_STALLS.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = ''.join(traceback.format_stack(frame)) if frame else 'стек недоступен'
+            logger.warning(f"Цикл событий заблокирован {lag:.2f} с, стек:\n{stack}")
+
+def sample_profile(duration: float, interval: float = 0.005) -> str:
+    """Сэмплирующий профиль всех потоков процесса. Блокирует вызывающий поток"""
+    own_thread = threading.get_ident()
+    thread_names = {t.ident: t.name for t in threading.enumerate()}
+    stacks: Counter = Counter()
+    own_time: Counter = Counter()
+    total_time: Counter = Counter()
+    samples = 0
+
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread:
+                continue
+            keys = []
+            while frame is not None:
+                keys.append(_frame_key(frame))
+                frame = frame.f_back
+            if not keys:
+                continue
+            keys.reverse()
+            stacks[(thread_names.get(thread_id, str(thread_id)),) + tuple(keys)] += 1
+            own_time[keys[-1]] += 1
+            for key in set(keys):
+                total_time[key] += 1
+        samples += 1
+        time.sleep(interval)
+
+    lines = [
+        f"Профиль за {duration:.0f} с, интервал {interval * 1000:.0f} мс, сэмплов: {samples}",
+        "",
+        "Собственное время (топ 30):"
+    ]
+    for key, count in own_time.most_common(30):
+        lines.append(f"{count:8d}  {key}")
+    lines += ["", "Включая вызовы (топ 30):"]
+    for key, count in total_time.most_common(30):
+        lines.append(f"{count:8d}  {key}")
+    # Формат collapsed stacks для flamegraph.pl / speedscope
+    lines += ["", "Стеки:"]
+    for stack, count in stacks.most_common():
+        lines.append(f"{';'.join(stack)} {count}")
+    return '\n'.join(lines) + '\n'
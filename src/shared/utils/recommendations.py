@@ -0,0 +1,269 @@
+import asyncio
+import logging
+import numpy as np
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from shared.config import Config
+from shared.utils.catalog import catalog, CatalogChange
+from shared.utils.csv_handler import Product
+from shared.utils.search_index import normalize
+
+logger = logging.getLogger(__name__)
+
+# Сколько слов описания учитывать: дальше обычно идут размеры и условия доставки
+DESCRIPTION_TOKENS = 100
+# Доля измененных товаров, после которой дешевле пересчитать категорию целиком
+FULL_REBUILD_SHARE = 0.3
+# Слова, которые есть у большей доли товаров категории, почти не различают их, а списки товаров по ним самые длинные
+COMMON_TERM_SHARE = 0.5
+
+@dataclass
+class Document:
+    """Мешок слов товара: номера слов словаря и их частоты"""
+    category: str
+    text_hash: int
+    terms: np.ndarray
+    tf: np.ndarray
+
+@dataclass
+class Postings:
+    """Нормированные TF-IDF векторы товаров категории в разреженном виде"""
+    size: int
+    rows: np.ndarray
+    terms: np.ndarray
+    weights: np.ndarray
+    # Списки товаров по словам: начало и длина в post_rows/post_weights
+    starts: np.ndarray
+    lengths: np.ndarray
+    post_rows: np.ndarray
+    post_weights: np.ndarray
+
+def product_text(product: Product) -> Tuple[str, Counter]:
+    """Токены товара: название с двойным весом, категория и подкатегория целиком, начало описания"""
+    name = normalize(product.name).split()
+    tokens = Counter(name + name)
+    tokens.update(normalize(product.description).split()[:DESCRIPTION_TOKENS])
+    for value in (product.category, product.subcategory):
+        if value:
+            tokens[f"#{value.lower()}"] += 2
+    return ' '.join(sorted(tokens.elements())), tokens
+
+class RecommendationIndex:
+    """Похожие товары по TF-IDF внутри категории
+
+    Соседи считаются заранее в фоне после обновления каталога, запрос к индексу -
+    чтение готового списка. Сходство считается по спискам товаров для каждого слова,
+    поэтому работа пропорциональна числу общих слов, а не размеру словаря.
+    """
+
+    def __init__(self, top_k: int = None):
+        self.top_k = top_k or Config.RECOMMEND_TOP_K
+        self._docs: Dict[str, Document] = {}
+        self._members: Dict[str, Set[str]] = {}
+        self._vocabulary: Dict[str, int] = {}
+        # Документная частота слов по всему каталогу
+        self._df: Dict[int, int] = {}
+        self._neighbors: Dict[str, List[Tuple[str, float]]] = {}
+        self._pending: Dict[str, Optional[Product]] = {}
+        self._wakeup = asyncio.Event()
+        self._running = False
+
+    def on_change(self, change: CatalogChange):
+        """Подписчик каталога: ставит в очередь добавленные, измененные и удаленные товары"""
+        articles = change.added | change.changed
+        for product in change.products:
+            if product.article in articles:
+                self._pending[product.article] = product
+        for article in change.removed:
+            self._pending[article] = None
+        if self._pending:
+            self._wakeup.set()
+
+    def _document(self, product: Product, text_hash: int, tokens: Counter) -> Document:
+        terms = np.fromiter(
+            (self._vocabulary.setdefault(token, len(self._vocabulary)) for token in tokens),
+            dtype=np.int64, count=len(tokens)
+        )
+        tf = 1 + np.log(np.fromiter(tokens.values(), dtype=np.float64, count=len(tokens)))
+        for term in terms.tolist():
+            self._df[term] = self._df.get(term, 0) + 1
+        return Document(product.category, text_hash, terms, tf)
+
+    def _remove(self, article: str) -> Optional[Document]:
+        doc = self._docs.pop(article, None)
+        if doc is not None:
+            for term in doc.terms.tolist():
+                self._df[term] -= 1
+            self._members[doc.category].discard(article)
+        return doc
+
+    def _postings(self, articles: List[str]) -> Postings:
+        docs = [self._docs[article] for article in articles]
+        sizes = np.fromiter((len(doc.terms) for doc in docs), dtype=np.int64, count=len(docs))
+        rows = np.repeat(np.arange(len(docs)), sizes)
+        terms = np.concatenate([doc.terms for doc in docs])
+        tf = np.concatenate([doc.tf for doc in docs])
+
+        unique, local = np.unique(terms, return_inverse=True)
+        df = np.fromiter((self._df[term] for term in unique.tolist()), dtype=np.float64, count=len(unique))
+        weights = tf * (np.log((1 + len(self._docs)) / (1 + df)) + 1)[local]
+        norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=len(docs)))
+        weights = weights / np.maximum(norms[rows], 1e-9)
+
+        order = np.argsort(local, kind='stable')
+        lengths = np.bincount(local, minlength=len(unique))
+        starts = np.cumsum(lengths) - lengths
+        if len(docs) > 20:
+            lengths = np.where(lengths > COMMON_TERM_SHARE * len(docs), 0, lengths)
+        return Postings(len(docs), rows, local, weights, starts, lengths, rows[order], weights[order])
+
+    def _scores(self, postings: Postings, query: np.ndarray) -> np.ndarray:
+        """Косинусное сходство строк query со всеми товарами категории: len(query) × size"""
+        position = np.full(postings.size, -1)
+        position[query] = np.arange(len(query))
+        mask = position[postings.rows] >= 0
+        terms = postings.terms[mask]
+        weights = postings.weights[mask]
+        owners = position[postings.rows[mask]]
+
+        lengths = postings.lengths[terms]
+        total = int(lengths.sum())
+        source = np.repeat(np.arange(len(terms)), lengths)
+        offsets = np.arange(total) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        entries = postings.starts[terms][source] + offsets
+        cells = owners[source] * postings.size + postings.post_rows[entries]
+        values = weights[source] * postings.post_weights[entries]
+        scores = np.bincount(cells, weights=values, minlength=len(query) * postings.size)
+        return scores.reshape(len(query), postings.size)
+
+    def _top(self, scores: np.ndarray, articles: List[str], exclude: int) -> List[Tuple[str, float]]:
+        scores[exclude] = -1
+        k = min(self.top_k, len(articles) - 1)
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(articles[i], float(scores[i])) for i in best if scores[i] > 0]
+
+    def _rank(self, articles: List[str], postings: Postings, rows: Iterable[int],
+              chunk: int = 256) -> Dict[str, List[Tuple[str, float]]]:
+        """Соседи для строк rows; пачками, чтобы не держать матрицу n×n"""
+        rows = sorted(rows)
+        result = {}
+        for start in range(0, len(rows), chunk):
+            part = np.array(rows[start:start + chunk])
+            scores = self._scores(postings, part)
+            for offset, row in enumerate(part.tolist()):
+                result[articles[row]] = self._top(scores[offset], articles, exclude=row)
+        return result
+
+    def _update_category(self, category: str, dirty: Set[str], gone: Set[str]) -> Dict[str, List[Tuple[str, float]]]:
+        articles = sorted(self._members.get(category, ()))
+        if not articles:
+            return {}
+        postings = self._postings(articles)
+        position = {article: row for row, article in enumerate(articles)}
+        if len(dirty) > FULL_REBUILD_SHARE * len(articles):
+            return self._rank(articles, postings, range(len(articles)))
+
+        # Заново считаем новые товары и те, у кого пропал сосед
+        recompute = {position[a] for a in dirty}
+        recompute |= {
+            position[a] for a in articles
+            if any(neighbor in gone for neighbor, _ in self._neighbors.get(a, ()))
+        }
+        result = self._rank(articles, postings, recompute)
+
+        # Остальным достаточно сравнения с новыми товарами: сходство симметрично,
+        # поэтому это столбцы уже посчитанных для новых товаров строк
+        dirty_rows = sorted(position[a] for a in dirty)
+        if dirty_rows:
+            scores = self._scores(postings, np.array(dirty_rows)).T
+            for row in range(len(articles)):
+                if row in recompute:
+                    continue
+                article = articles[row]
+                neighbors = self._neighbors.get(article, [])
+                threshold = neighbors[-1][1] if len(neighbors) >= self.top_k else 0.0
+                if not (scores[row] > threshold).any():
+                    continue
+                candidates = dict(neighbors)
+                candidates.update((articles[r], float(score)) for r, score in zip(dirty_rows, scores[row]) if score > 0)
+                result[article] = sorted(candidates.items(), key=lambda item: -item[1])[:self.top_k]
+        return result
+
+    def update(self, pending: Dict[str, Optional[Product]]) -> Dict[str, List[Tuple[str, float]]]:
+        """Обновляет векторы и пересчитывает соседей затронутых категорий. Блокирующий вызов
+
+        Возвращает новые списки соседей; применяет их run() в цикле событий.
+        """
+        dirty: Dict[str, Set[str]] = {}
+        gone: Dict[str, Set[str]] = {}
+        for article, product in pending.items():
+            text_hash = tokens = None
+            if product is not None:
+                text, tokens = product_text(product)
+                text_hash = hash(text)
+                old = self._docs.get(article)
+                # Смена цены или наличия не меняет текст - соседи остаются прежними
+                if old is not None and old.text_hash == text_hash and old.category == product.category:
+                    continue
+            old = self._remove(article)
+            if old is not None:
+                gone.setdefault(old.category, set()).add(article)
+            if product is None:
+                continue
+            doc = self._document(product, text_hash, tokens)
+            self._docs[article] = doc
+            self._members.setdefault(doc.category, set()).add(article)
+            dirty.setdefault(doc.category, set()).add(article)
+
+        updates = {}
+        for category in dirty.keys() | gone.keys():
+            updates.update(self._update_category(category, dirty.get(category, set()), gone.get(category, set())))
+        removed = [article for article, product in pending.items() if product is None]
+        for article in removed:
+            updates[article] = []
+        return updates
+
+    def _apply(self, updates: Dict[str, List[Tuple[str, float]]]):
+        for article, neighbors in updates.items():
+            if neighbors:
+                self._neighbors[article] = neighbors
+            else:
+                self._neighbors.pop(article, None)
+
+    async def run(self):
+        """Фоновый пересчет соседей; в объединенном процессе запускается один раз"""
+        if self._running:
+            return
+        self._running = True
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                pending, self._pending = self._pending, {}
+                try:
+                    updates = await asyncio.to_thread(self.update, pending)
+                    self._apply(updates)
+                    logger.info(f"Рекомендации обновлены: товаров {len(pending)}, списков {len(updates)}")
+                except Exception as e:
+                    logger.error(f"Ошибка расчета рекомендаций: {str(e)}")
+        finally:
+            self._running = False
+
+    def similar(self, article: str, limit: int = 3, instock: bool = True) -> List[Product]:
+        """Готовые похожие товары; без проверки наличия - все из списка"""
+        result = []
+        for neighbor, _ in self._neighbors.get(article, ()):
+            product = catalog.get(neighbor)
+            if product is None or (instock and product.stock != 'instock'):
+                continue
+            result.append(product)
+            if len(result) >= limit:
+                break
+        return result
+
+# Индекс похожих товаров процесса
+recommendations = RecommendationIndex()
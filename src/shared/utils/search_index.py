@@ -0,0 +1,141 @@
+import re
+from collections import OrderedDict
+from typing import Dict, List, Set, Tuple
+from shared.utils.catalog import CatalogChange
+from shared.utils.csv_handler import Product
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+def normalize(text: str) -> str:
+    """Приводит текст к виду для поиска"""
+    return ' '.join(_TOKEN_RE.findall(text.lower().replace('ё', 'е')))
+
+def trigrams(token: str) -> Set[str]:
+    """Триграммы токена"""
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+class SearchIndex:
+    """Триграммный и префиксный индекс по названию, артикулу и категории"""
+
+    MIN_QUERY_LENGTH = 2
+
+    def __init__(self, cache_size: int = 1024):
+        self.cache_size = cache_size
+        self._docs: Dict[str, str] = {}
+        self._names: Dict[str, str] = {}
+        self._articles: Dict[str, str] = {}
+        self._rank: Dict[str, int] = {}
+        self._keys: Dict[str, Set[str]] = {}
+        self._trigrams: Dict[str, Set[str]] = {}
+        self._prefixes: Dict[str, Set[str]] = {}
+        self._cache: 'OrderedDict[str, List[str]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def apply_change(self, change: CatalogChange):
+        """Инкрементально обновляет индекс по изменениям каталога"""
+        for article in change.removed | change.changed:
+            self._remove(article)
+        by_article = {p.article: p for p in change.products if p.article in change.added or p.article in change.changed}
+        for product in by_article.values():
+            self._add(product)
+        # Алфавитный ранг пересчитывается только при смене каталога, а не на каждый запрос
+        ordered = sorted(self._names, key=self._names.__getitem__)
+        self._rank = {article: i for i, article in enumerate(ordered)}
+        self._cache.clear()
+
+    def updated(self, change: CatalogChange) -> 'SearchIndex':
+        """Копия индекса с примененными изменениями; текущий индекс не меняется,
+        поэтому копию можно собирать в отдельном потоке, пока по нему идет поиск"""
+        index = SearchIndex(self.cache_size)
+        index._docs = dict(self._docs)
+        index._names = dict(self._names)
+        index._articles = dict(self._articles)
+        index._keys = dict(self._keys)
+        index._trigrams = {key: set(articles) for key, articles in self._trigrams.items()}
+        index._prefixes = {key: set(articles) for key, articles in self._prefixes.items()}
+        index.apply_change(change)
+        return index
+
+    def _add(self, product: Product):
+        doc = normalize(' '.join((product.name, product.article, product.category, product.subcategory)))
+        self._docs[product.article] = doc
+        self._names[product.article] = normalize(product.name)
+        self._articles[product.article] = normalize(product.article)
+
+        trigram_keys = set()
+        prefix_keys = set()
+        for token in doc.split():
+            trigram_keys |= trigrams(token)
+            if len(token) >= self.MIN_QUERY_LENGTH:
+                prefix_keys.add(token[:self.MIN_QUERY_LENGTH])
+        for key in trigram_keys:
+            self._trigrams.setdefault(key, set()).add(product.article)
+        for key in prefix_keys:
+            self._prefixes.setdefault(key, set()).add(product.article)
+        self._keys[product.article] = {'t' + k for k in trigram_keys} | {'p' + k for k in prefix_keys}
+
+    def _remove(self, article: str):
+        self._docs.pop(article, None)
+        self._names.pop(article, None)
+        self._articles.pop(article, None)
+        for key in self._keys.pop(article, ()):
+            postings = self._trigrams if key[0] == 't' else self._prefixes
+            articles = postings.get(key[1:])
+            if articles is not None:
+                articles.discard(article)
+                if not articles:
+                    del postings[key[1:]]
+
+    def _candidates(self, token: str) -> Set[str]:
+        if len(token) < 3:
+            return self._prefixes.get(token, set())
+        postings = sorted((self._trigrams.get(t, set()) for t in trigrams(token)), key=len)
+        if not postings[0]:
+            return set()
+        return postings[0].intersection(*postings[1:])
+
+    def _lookup(self, query: str) -> List[str]:
+        tokens = [t for t in query.split() if len(t) >= self.MIN_QUERY_LENGTH]
+        if not tokens:
+            return []
+
+        # Начинаем с самого короткого списка, чтобы пересечения были дешевле
+        candidate_sets = sorted((self._candidates(t) for t in tokens), key=len)
+        candidates = candidate_sets[0].intersection(*candidate_sets[1:])
+
+        # Префиксы и одиночные триграммы точны, а токены длиннее 3 символов
+        # могут давать ложные совпадения, поэтому проверяем подстроки
+        docs = self._docs
+        matches = list(candidates)
+        for pattern in (t for t in tokens if len(t) > 3):
+            matches = [a for a in matches if pattern in docs[a]]
+
+        # Порядок: точный артикул, название с начала запроса, остальные по алфавиту
+        matches.sort(key=self._rank.__getitem__)
+        exact = []
+        prefixed = []
+        rest = []
+        first = tokens[0]
+        for article in matches:
+            if self._articles[article] == query:
+                exact.append(article)
+            elif self._names[article].startswith(first):
+                prefixed.append(article)
+            else:
+                rest.append(article)
+        return exact + prefixed + rest
+
+    def search(self, query: str, offset: int = 0, limit: int = 20) -> Tuple[List[str], int]:
+        """Возвращает страницу артикулов и общее число найденных товаров"""
+        query = normalize(query)
+        matches = self._cache.get(query)
+        if matches is None:
+            matches = self._lookup(query)
+            self._cache[query] = matches
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(query)
+        return matches[offset:offset + limit], len(matches)
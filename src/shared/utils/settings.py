@@ -0,0 +1,148 @@
+import os
+import json
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from shared.config import Config
+
+logger = logging.getLogger(__name__)
+
+# Настройки, которые можно менять без перезапуска: имя атрибута Config -> тип
+RUNTIME_KEYS: Dict[str, type] = {
+    'POST_INTERVAL': int,
+    'HOT_POST_INTERVAL': int,
+    'HOT_POST_BATCH': int,
+    'POST_COOLDOWN': int,
+    'UPDATE_INTERVAL': int,
+    'SEARCH_CACHE_TIME': int,
+    'THROTTLE_USER_RATE': float,
+    'THROTTLE_USER_BURST': int,
+    'THROTTLE_CHAT_RATE': float,
+    'THROTTLE_CHAT_BURST': int,
+    'PRICING_RULES': list
+}
+
+class RuntimeSettings:
+    """Постоянные настройки времени выполнения поверх Config
+
+    Значения хранятся в JSON и применяются к атрибутам Config, поэтому код, читающий
+    Config при каждом использовании, видит их сразу. Файл общий для обоих ботов:
+    процесс, который его не менял, подхватывает изменения по mtime.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path or Config.SETTINGS_PATH
+        # Значения из .env и кода: к ним возвращаемся, если ключ убрали из файла
+        self._defaults = {key: getattr(Config, key) for key in RUNTIME_KEYS}
+        self._values: Dict[str, Any] = {}
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._listeners: List[Callable[[Dict[str, Any]], None]] = []
+        self._waiters: List[Tuple[Set[str], asyncio.Event]] = []
+        self._watching = False
+
+    def subscribe(self, listener: Callable[[Dict[str, Any]], None]):
+        """Подписка на изменения: listener получает словарь измененных ключей с новыми значениями"""
+        self._listeners.append(listener)
+
+    def _file_stamp(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _read(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            raw = json.load(f)
+        if not isinstance(raw, dict):
+            raise ValueError(f"ожидается объект JSON, получен {type(raw).__name__}")
+        values = {}
+        for key, value in raw.items():
+            if key not in RUNTIME_KEYS:
+                logger.warning(f"Неизвестная настройка в {self.path}: {key}")
+                continue
+            values[key] = RUNTIME_KEYS[key](value)
+        return values
+
+    def _apply(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        self._values = values
+        changes = {}
+        for key in RUNTIME_KEYS:
+            value = values.get(key, self._defaults[key])
+            if getattr(Config, key) != value:
+                setattr(Config, key, value)
+                changes[key] = value
+        if not changes:
+            return changes
+
+        logger.info(f"Настройки изменены: {', '.join(f'{k}={v}' for k, v in changes.items())}")
+        for listener in self._listeners:
+            try:
+                listener(changes)
+            except Exception as e:
+                logger.error(f"Ошибка обработчика изменения настроек: {str(e)}")
+        for keys, event in self._waiters:
+            if not keys or keys & changes.keys():
+                event.set()
+        return changes
+
+    def load(self) -> Dict[str, Any]:
+        """Перечитывает файл, если он изменился. Возвращает измененные значения"""
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return {}
+        try:
+            values = self._read()
+        except (OSError, ValueError, TypeError) as e:
+            # Ошибка в файле не должна ронять запуск и наблюдатель: остаются прежние значения
+            logger.error(f"Не удалось прочитать настройки {self.path}: {str(e)}")
+            return {}
+        self._stamp = stamp
+        return self._apply(values)
+
+    def set(self, key: str, value: Any) -> Dict[str, Any]:
+        """Сохраняет значение и сразу применяет его в этом процессе"""
+        if key not in RUNTIME_KEYS:
+            raise KeyError(key)
+        values = {**self._values, key: RUNTIME_KEYS[key](value)}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(values, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        # Свою запись наблюдатель повторно не применяет
+        self._stamp = self._file_stamp()
+        return self._apply(values)
+
+    async def watch(self, interval: float = None):
+        """Следит за файлом настроек; в объединенном процессе запускается один раз"""
+        if self._watching:
+            return
+        self._watching = True
+        try:
+            while True:
+                await asyncio.sleep(interval or Config.SETTINGS_WATCH_INTERVAL)
+                try:
+                    self.load()
+                except Exception as e:
+                    logger.error(f"Ошибка наблюдателя настроек: {str(e)}")
+        finally:
+            self._watching = False
+
+    async def sleep(self, seconds: float, *keys: str) -> bool:
+        """Пауза, которая прерывается изменением любого из keys. True, если прервана"""
+        event = asyncio.Event()
+        waiter = (set(keys), event)
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(event.wait(), max(seconds, 0))
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiters.remove(waiter)
+
+# Настройки процесса
+settings = RuntimeSettings()
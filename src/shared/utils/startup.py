@@ -0,0 +1,53 @@
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+from typing import Awaitable, List, Tuple, TypeVar
+from shared.utils.catalog import catalog
+from shared.utils.price_tracker import price_tracker
+from shared.utils.metrics import STARTUP_PHASE_DURATION
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+class StartupTimer:
+    """Длительность фаз запуска; фазы могут идти параллельно"""
+
+    def __init__(self, bot_name: str, started: float = None):
+        self.bot_name = bot_name
+        # started - perf_counter() в начале модуля main, до тяжелых импортов
+        self.started = started or time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+
+    def record(self, phase: str, seconds: float):
+        self.phases.append((phase, seconds))
+        STARTUP_PHASE_DURATION.set(seconds, bot=self.bot_name, phase=phase)
+
+    def since_start(self, phase: str):
+        """Фаза от начала процесса до текущего момента"""
+        self.record(phase, time.perf_counter() - self.started)
+
+    @contextmanager
+    def phase(self, phase: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - started)
+
+    async def run(self, phase: str, awaitable: Awaitable[T]) -> T:
+        with self.phase(phase):
+            return await awaitable
+
+    def report(self):
+        self.record('total', time.perf_counter() - self.started)
+        breakdown = ', '.join(f"{phase} {seconds:.3f} с" for phase, seconds in self.phases)
+        logger.info(f"Запуск {self.bot_name}: {breakdown}")
+
+async def warm_up(timer: StartupTimer, prices: bool = True):
+    """Прогрев каталога и истории цен после старта опроса"""
+    tasks = [timer.run('catalog', catalog.refresh_async())]
+    if prices:
+        tasks.append(timer.run('price_tracker', asyncio.to_thread(price_tracker.ensure_loaded)))
+    await asyncio.gather(*tasks)
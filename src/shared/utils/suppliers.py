@@ -0,0 +1,305 @@
+import os
+import io
+import csv
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import aiohttp
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, fields
+from typing import Dict, List, Optional, Tuple
+from shared.config import Config
+from shared.utils.catalog import catalog
+from shared.utils.feed_archive import feed_archive
+from shared.utils.csv_handler import parse_price, parse_stock, parse_images
+from shared.utils.http import get_session
+from shared.utils.processes import process_pool
+from shared.utils.metrics import SUPPLIER_FETCH_DURATION, SUPPLIER_ERRORS, SUPPLIER_PRODUCTS
+
+logger = logging.getLogger(__name__)
+
+# Колонки выгрузки websklad; общий каталог пишется в этом же формате, чтобы read_products не менялся
+WEBSKLAD_COLUMNS = {
+    'name': 'Название товара',
+    'article': 'Артикул',
+    'description': 'Описание товара',
+    'drop_price': 'Дроп цена для партнера',
+    'retail_price': 'Рекомендовання розничная цена',
+    'stock': 'Наличие',
+    'images': 'Изображения',
+    'category': 'Категории товара',
+    'subcategory': 'Подкатегории'
+}
+SUPPLIER_COLUMN = 'Поставщик'
+MERGED_COLUMNS = list(WEBSKLAD_COLUMNS.values()) + [SUPPLIER_COLUMN]
+
+# Строка общего каталога, наличие и дроп-цена для разрешения конфликтов
+ParsedRow = Tuple[Dict[str, str], bool, float]
+
+@dataclass
+class SupplierFeed:
+    """Выгрузка одного поставщика"""
+    name: str
+    url: str
+    # Префикс артикулов; пустой - артикулы общие с другими поставщиками и могут конфликтовать
+    prefix: str = ''
+    # Кодировка; None - utf-8 с откатом на windows-1251
+    encoding: Optional[str] = None
+    delimiter: str = ','
+    update_interval: int = 3600
+    timeout: int = 300
+    # Наше поле -> название колонки у поставщика
+    columns: Dict[str, str] = field(default_factory=lambda: dict(WEBSKLAD_COLUMNS))
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def local_path(self) -> str:
+        return os.path.join(Config.FEEDS_DIR, f"{self.name}.csv")
+
+def load_feeds(path: str = None) -> List[SupplierFeed]:
+    """Список поставщиков из JSON; пустой, если файла нет"""
+    path = path or Config.SUPPLIERS_PATH
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        items = json.load(f)
+    known = {f.name for f in fields(SupplierFeed)}
+    feeds = []
+    for number, item in enumerate(items, 1):
+        if not isinstance(item, dict):
+            logger.error(f"Поставщик #{number} в {path}: ожидается объект, пропущен")
+            continue
+        name = item.get('name') or f"#{number}"
+        unknown = sorted(item.keys() - known)
+        if unknown:
+            logger.error(f"Поставщик {name} в {path}: неизвестные ключи {', '.join(unknown)}, пропущен")
+            continue
+        missing = sorted(key for key in ('name', 'url') if not item.get(key))
+        if missing:
+            logger.error(f"Поставщик {name} в {path}: не заданы {', '.join(missing)}, пропущен")
+            continue
+        columns = {**WEBSKLAD_COLUMNS, **item.pop('columns', {})}
+        feeds.append(SupplierFeed(columns=columns, **item))
+    return feeds
+
+def _decode(content: bytes, encoding: Optional[str]) -> str:
+    if encoding:
+        return content.decode(encoding, errors='replace')
+    try:
+        return content.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return content.decode('windows-1251', errors='replace')
+
+def parse_feed(path: str, feed: SupplierFeed) -> List[ParsedRow]:
+    """Приводит выгрузку поставщика к колонкам общего каталога. Выполняется в процессе-обработчике"""
+    with open(path, 'rb') as f:
+        text = _decode(f.read(), feed.encoding)
+
+    columns = feed.columns
+    rows = []
+    for raw in csv.DictReader(io.StringIO(text), delimiter=feed.delimiter):
+        value = lambda key: (raw.get(columns.get(key, '')) or '').strip()
+        article, name = value('article'), value('name')
+        if not article or not name:
+            continue
+        stock = value('stock')
+        drop_price = value('drop_price')
+        rows.append(({
+            WEBSKLAD_COLUMNS['name']: name,
+            WEBSKLAD_COLUMNS['article']: f"{feed.prefix}{article}",
+            WEBSKLAD_COLUMNS['description']: value('description'),
+            WEBSKLAD_COLUMNS['drop_price']: drop_price,
+            WEBSKLAD_COLUMNS['retail_price']: value('retail_price'),
+            WEBSKLAD_COLUMNS['stock']: stock,
+            WEBSKLAD_COLUMNS['images']: ','.join(parse_images(value('images'))),
+            WEBSKLAD_COLUMNS['category']: value('category'),
+            WEBSKLAD_COLUMNS['subcategory']: value('subcategory'),
+            SUPPLIER_COLUMN: feed.name
+        }, parse_stock(stock) == 'instock', parse_price(drop_price)))
+    return rows
+
+def _better(candidate: ParsedRow, current: ParsedRow, policy: str) -> bool:
+    """Лучше ли предложение candidate текущего по политике 'price' или 'stock'"""
+    _, candidate_instock, candidate_price = candidate
+    _, current_instock, current_price = current
+    if policy == 'price':
+        return (candidate_price, not candidate_instock) < (current_price, not current_instock)
+    return (not candidate_instock, candidate_price) < (not current_instock, current_price)
+
+def merge_feeds(results: Dict[str, List[ParsedRow]], policy: str = 'stock') -> Tuple[List[Dict[str, str]], int]:
+    """Объединяет выгрузки; при совпадении артикула оставляет лучшее предложение. Возвращает строки и число конфликтов"""
+    best: Dict[str, ParsedRow] = {}
+    conflicts = 0
+    # Порядок поставщиков фиксирован, чтобы при равенстве результат не зависел от порядка загрузки
+    for name in sorted(results):
+        for parsed in results[name]:
+            article = parsed[0][WEBSKLAD_COLUMNS['article']]
+            current = best.get(article)
+            if current is None:
+                best[article] = parsed
+                continue
+            conflicts += 1
+            if _better(parsed, current, policy):
+                best[article] = parsed
+    return [parsed[0] for parsed in best.values()], conflicts
+
+def write_catalog(rows: List[Dict[str, str]], path: str) -> bool:
+    """Пишет общий каталог атомарно. Возвращает True, если содержимое изменилось"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=MERGED_COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+    content = buffer.getvalue().encode('utf-8')
+
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if hashlib.sha256(f.read()).digest() == hashlib.sha256(content).digest():
+                return False
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return True
+
+class FeedAggregator:
+    """Загрузка нескольких выгрузок: каждая по своему расписанию, разбор в отдельных процессах, слияние в CSV_PATH
+
+    Интерфейс совпадает с FileUpdater (initial_check/check_updates), чтобы админ-бот мог использовать любой из них.
+    """
+
+    def __init__(self, feeds: List[SupplierFeed], output_path: str = None, policy: str = None):
+        self.feeds = feeds
+        self.output_path = output_path or Config.CSV_PATH
+        self.policy = policy or Config.SUPPLIER_CONFLICT_POLICY
+        self._results: Dict[str, List[ParsedRow]] = {}
+        self._validators: Dict[str, Dict[str, str]] = {}
+        self._dirty = asyncio.Event()
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = process_pool(min(Config.SUPPLIER_PARSE_WORKERS, len(self.feeds)) or 1)
+        return self._pool
+
+    async def download(self, feed: SupplierFeed) -> bool:
+        """Скачивает выгрузку поставщика. True, если файл изменился"""
+        os.makedirs(os.path.dirname(feed.local_path), exist_ok=True)
+        headers = dict(feed.headers)
+        if os.path.exists(feed.local_path):
+            headers.update(self._validators.get(feed.name, {}))
+
+        started = time.perf_counter()
+        try:
+            async with get_session().get(
+                feed.url, headers=headers, timeout=aiohttp.ClientTimeout(total=feed.timeout)
+            ) as response:
+                if response.status == 304:
+                    return False
+                if response.status != 200:
+                    SUPPLIER_ERRORS.inc(supplier=feed.name, stage=f'http_{response.status}')
+                    logger.error(f"Поставщик {feed.name}: ошибка загрузки {response.status}")
+                    return False
+                content = await response.read()
+                self._validators[feed.name] = {
+                    header: response.headers[source]
+                    for source, header in (('ETag', 'If-None-Match'), ('Last-Modified', 'If-Modified-Since'))
+                    if source in response.headers
+                }
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            SUPPLIER_ERRORS.inc(supplier=feed.name, stage='download')
+            logger.error(f"Поставщик {feed.name}: не удалось скачать выгрузку: {type(e).__name__} {str(e)}")
+            return False
+        finally:
+            SUPPLIER_FETCH_DURATION.observe(time.perf_counter() - started, supplier=feed.name)
+
+        if os.path.exists(feed.local_path):
+            with open(feed.local_path, 'rb') as f:
+                if f.read() == content:
+                    return False
+        tmp_path = f"{feed.local_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, feed.local_path)
+        logger.info(f"Поставщик {feed.name}: выгрузка обновлена ({len(content)} байт)")
+        return True
+
+    async def parse(self, feed: SupplierFeed) -> bool:
+        """Разбирает локальную копию выгрузки в процессе-обработчике"""
+        if not os.path.exists(feed.local_path):
+            return False
+        try:
+            rows = await asyncio.get_running_loop().run_in_executor(
+                self._executor(), parse_feed, feed.local_path, feed
+            )
+        except Exception as e:
+            SUPPLIER_ERRORS.inc(supplier=feed.name, stage='parse')
+            logger.error(f"Поставщик {feed.name}: ошибка разбора: {str(e)}")
+            return False
+        if not rows and self._results.get(feed.name):
+            logger.warning(f"Поставщик {feed.name}: выгрузка пуста, оставляем предыдущую")
+            return False
+        self._results[feed.name] = rows
+        SUPPLIER_PRODUCTS.set(len(rows), supplier=feed.name)
+        return True
+
+    async def _load(self, feed: SupplierFeed, initial: bool = False) -> bool:
+        updated = await self.download(feed)
+        # При первом запуске разбираем и сохраненную ранее копию
+        if updated or (initial and feed.name not in self._results):
+            return await self.parse(feed)
+        return False
+
+    async def merge(self) -> bool:
+        """Сливает последние результаты всех поставщиков в общий каталог"""
+        rows, conflicts = merge_feeds(self._results, self.policy)
+        if not rows:
+            return False
+        changed = await asyncio.to_thread(write_catalog, rows, self.output_path)
+        logger.info(
+            f"Общий каталог: {len(rows)} товаров от {len(self._results)} поставщиков, "
+            f"конфликтов артикулов {conflicts}, изменен: {changed}"
+        )
+        if changed:
+            await catalog.refresh_async(force=True)
+            await feed_archive.archive(self.output_path)
+        return changed
+
+    async def initial_check(self) -> bool:
+        """Первичная загрузка: медленный поставщик не задерживает остальных дольше своего таймаута"""
+        await asyncio.gather(*(self._load(feed, initial=True) for feed in self.feeds))
+        if not self._results:
+            # Сеть недоступна, но общий каталог с прошлого запуска есть
+            return os.path.exists(self.output_path)
+        await self.merge()
+        return True
+
+    async def _feed_loop(self, feed: SupplierFeed):
+        while True:
+            await asyncio.sleep(feed.update_interval)
+            try:
+                if await self._load(feed):
+                    self._dirty.set()
+            except Exception as e:
+                SUPPLIER_ERRORS.inc(supplier=feed.name, stage='update')
+                logger.error(f"Поставщик {feed.name}: ошибка обновления: {str(e)}")
+
+    async def _merge_loop(self):
+        while True:
+            await self._dirty.wait()
+            # Короткая пауза собирает в одно слияние поставщиков, обновившихся одновременно
+            await asyncio.sleep(5)
+            self._dirty.clear()
+            try:
+                await self.merge()
+            except Exception as e:
+                logger.error(f"Ошибка слияния выгрузок поставщиков: {str(e)}")
+
+    async def check_updates(self):
+        """Каждый поставщик обновляется по своему интервалу независимо от остальных"""
+        try:
+            await asyncio.gather(self._merge_loop(), *(self._feed_loop(feed) for feed in self.feeds))
+        finally:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
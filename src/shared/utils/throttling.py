@@ -0,0 +1,193 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.types import TelegramObject, Update
+from shared.config import Config
+from shared.utils.metrics import THROTTLED_UPDATES, TELEGRAM_SEND_WAIT
+from shared.utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+class TokenBucketStore:
+    """Token bucket на ключ с ограничением памяти и вытеснением по времени простоя"""
+
+    def __init__(self, rate: float, capacity: float, max_size: int = 10000, ttl: float = 600):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_size = max_size
+        self.ttl = ttl
+        # key -> (токены, время последнего обращения); порядок = давность обращения
+        self._buckets: 'OrderedDict[Hashable, Tuple[float, float]]' = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def consume(self, key: Hashable, now: float = None) -> bool:
+        """Списывает токен. False, если лимит исчерпан"""
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            tokens = self.capacity
+        else:
+            tokens, updated = bucket
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        self._evict(now)
+        return allowed
+
+    def reserve(self, key: Hashable, cost: float = 1, now: float = None) -> float:
+        """Списывает cost токенов в долг. Возвращает, сколько секунд ждать до их появления"""
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            tokens = self.capacity
+        else:
+            tokens, updated = bucket
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+
+        tokens -= cost
+        self._buckets[key] = (tokens, now)
+        self._evict(now)
+        return max(-tokens / self.rate, 0)
+
+    def _evict(self, now: float):
+        # В начале словаря самые давние ключи, поэтому хватает проверки первого
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+            if len(self._buckets) <= self.max_size and now - updated < self.ttl:
+                break
+            del self._buckets[key]
+
+class SendRateLimiter:
+    """Исходящие сообщения бота: общий лимит Bot API и лимит на один чат или канал"""
+
+    def __init__(self, rate: float = None, chat_rate: float = None, chat_burst: int = None):
+        rate = rate or Config.SEND_RATE
+        self.total = TokenBucketStore(rate, rate)
+        self.chats = TokenBucketStore(
+            chat_rate or Config.SEND_CHAT_RATE,
+            chat_burst or Config.SEND_CHAT_BURST
+        )
+
+    async def acquire(self, chat_id: Hashable, cost: int = 1):
+        """Ждет, пока cost сообщений в chat_id уложатся в оба лимита"""
+        # Сначала лимит чата: пока ждем его, общий лимит достается другим каналам
+        delay = self.chats.reserve(chat_id, cost)
+        if delay:
+            TELEGRAM_SEND_WAIT.observe(delay, scope='chat')
+            await asyncio.sleep(delay)
+        delay = self.total.reserve(None, cost)
+        if delay:
+            TELEGRAM_SEND_WAIT.observe(delay, scope='total')
+            await asyncio.sleep(delay)
+
+    async def call(self, chat_id: Hashable, request: Callable[[], Awaitable[T]], cost: int = 1) -> T:
+        """Выполняет запрос в пределах лимитов; при 429 ждет retry_after и повторяет один раз"""
+        await self.acquire(chat_id, cost)
+        try:
+            return await request()
+        except TelegramRetryAfter as e:
+            logger.warning(f"Лимит Telegram для чата {chat_id}, повтор через {e.retry_after} с")
+            TELEGRAM_SEND_WAIT.observe(e.retry_after, scope='retry_after')
+            await asyncio.sleep(e.retry_after)
+            await self.acquire(chat_id, cost)
+            return await request()
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Ограничение частоты апдейтов на пользователя и на чат
+
+    Inline-запросы приходят на каждую набранную букву, поэтому в лимит пользователя не входят:
+    из серии запросов обрабатывается только последний, после паузы в наборе.
+    """
+
+    def __init__(self, user_rate: float = None, user_burst: int = None,
+                 chat_rate: float = None, chat_burst: int = None, inline_debounce: float = None):
+        self.users = TokenBucketStore(
+            user_rate or Config.THROTTLE_USER_RATE,
+            user_burst or Config.THROTTLE_USER_BURST
+        )
+        self.chats = TokenBucketStore(
+            chat_rate or Config.THROTTLE_CHAT_RATE,
+            chat_burst or Config.THROTTLE_CHAT_BURST
+        )
+        self.inline_debounce = Config.INLINE_DEBOUNCE if inline_debounce is None else inline_debounce
+        # Пользователь -> id последнего inline-запроса
+        self._inline: Dict[int, str] = {}
+        # Лимиты из настроек меняются на ходу, если не заданы явно
+        if not any((user_rate, user_burst, chat_rate, chat_burst)):
+            settings.subscribe(self.on_settings)
+        self.stats = {
+            'passed': 0,
+            'throttled_user': 0,
+            'throttled_chat': 0,
+            'superseded_inline': 0
+        }
+
+    def on_settings(self, changes: Dict[str, Any]):
+        if changes.keys() & {'THROTTLE_USER_RATE', 'THROTTLE_USER_BURST', 'THROTTLE_CHAT_RATE', 'THROTTLE_CHAT_BURST'}:
+            self.users.rate, self.users.capacity = Config.THROTTLE_USER_RATE, Config.THROTTLE_USER_BURST
+            self.chats.rate, self.chats.capacity = Config.THROTTLE_CHAT_RATE, Config.THROTTLE_CHAT_BURST
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get('event_from_user')
+        chat = data.get('event_chat')
+        if user and isinstance(event, Update) and event.inline_query:
+            return await self._debounce_inline(handler, event, data, user.id)
+        now = time.monotonic()
+
+        if user and not self.users.consume(user.id, now):
+            self.stats['throttled_user'] += 1
+            THROTTLED_UPDATES.inc(scope='user')
+            return await self._drop(event)
+        # В личном чате id чата совпадает с пользователем, отдельный лимит не нужен
+        if chat and (not user or chat.id != user.id) and not self.chats.consume(chat.id, now):
+            self.stats['throttled_chat'] += 1
+            THROTTLED_UPDATES.inc(scope='chat')
+            return await self._drop(event)
+
+        self.stats['passed'] += 1
+        return await handler(event, data)
+
+    async def _debounce_inline(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+        user_id: int
+    ) -> Any:
+        """Ждет паузу в наборе и обрабатывает запрос, только если за это время не пришел новый"""
+        query_id = event.inline_query.id
+        self._inline[user_id] = query_id
+        if self.inline_debounce:
+            await asyncio.sleep(self.inline_debounce)
+        if self._inline.get(user_id) != query_id:
+            # Клиент уже показывает результаты нового запроса, ответ на старый не нужен
+            self.stats['superseded_inline'] += 1
+            return None
+        del self._inline[user_id]
+        self.stats['passed'] += 1
+        return await handler(event, data)
+
+    async def _drop(self, event: TelegramObject):
+        """Лишние нажатия кнопок гасим пустым ответом, остальное молча отбрасываем"""
+        if isinstance(event, Update) and event.callback_query:
+            try:
+                await event.callback_query.answer()
+            except Exception as e:
+                logger.debug(f"Не удалось ответить на отброшенный callback: {str(e)}")
+        return None
@@ -0,0 +1,245 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Tuple
+from shared.config import Config
+from shared.utils.metrics import TRANSLATED_TEXTS
+
+logger = logging.getLogger(__name__)
+
+class TranslationBackend(ABC):
+    """Интерфейс бэкенда перевода: список текстов на входе, переводы в том же порядке на выходе"""
+    name = 'base'
+    # Лимит символов одного запроса к сервису
+    max_request_chars = 4500
+
+    @abstractmethod
+    def translate_batch(self, texts: List[str]) -> List[str]:
+        ...
+
+class StubBackend(TranslationBackend):
+    """Локальный бэкенд без сети: возвращает текст с префиксом и запоминает запросы"""
+    name = 'stub'
+
+    def __init__(self, prefix: str = '[uk] '):
+        self.prefix = prefix
+        self.requests: List[List[str]] = []
+
+    def translate_batch(self, texts: List[str]) -> List[str]:
+        self.requests.append(list(texts))
+        return [f"{self.prefix}{text}" for text in texts]
+
+class GoogleBackend(TranslationBackend):
+    """Google Translate через deep-translator"""
+    name = 'google'
+    # Разделитель текстов внутри одного запроса; переводчик оставляет его как есть
+    SEPARATOR = '\n⁂\n'
+
+    def __init__(self, source: str, target: str):
+        from deep_translator import GoogleTranslator
+        self._translator = GoogleTranslator(source=source, target=target)
+
+    def translate_batch(self, texts: List[str]) -> List[str]:
+        # Несколько коротких описаний уходят одним запросом
+        translated = self._translator.translate(self.SEPARATOR.join(texts))
+        parts = [part.strip() for part in (translated or '').split('⁂')]
+        if len(parts) == len(texts):
+            return parts
+        logger.warning("Разделитель пакета потерялся при переводе, переводим по одному")
+        return [self._translator.translate(text) for text in texts]
+
+def create_backend(name: str) -> Optional[TranslationBackend]:
+    if name == 'google':
+        return GoogleBackend(Config.TRANSLATION_SOURCE, Config.TRANSLATION_TARGET)
+    if name == 'stub':
+        return StubBackend()
+    return None
+
+class TranslationCache:
+    """Постоянный кэш переводов в SQLite по хэшу исходного текста"""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "key TEXT PRIMARY KEY, text TEXT NOT NULL, created_at INTEGER NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT text FROM translations WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def missing(self, keys: Iterable[str]) -> set:
+        """Ключи, которых еще нет в кэше"""
+        keys = list(keys)
+        found = set()
+        with self._lock:
+            # SQLite ограничивает число параметров запроса
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                found.update(row[0] for row in self._db.execute(
+                    f"SELECT key FROM translations WHERE key IN ({placeholders})", chunk
+                ))
+        return set(keys) - found
+
+    def put_many(self, items: Dict[str, str]):
+        now = int(time.time())
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO translations (key, text, created_at) VALUES (?, ?, ?)",
+                [(key, text, now) for key, text in items.items()]
+            )
+            self._db.commit()
+
+class Translator:
+    """Переводит только тексты, которых нет в кэше, пакетами по лимиту бэкенда"""
+
+    def __init__(self, backend: TranslationBackend, cache: TranslationCache,
+                 source: str = 'ru', target: str = 'uk', batch_size: int = 50):
+        self.backend = backend
+        self.cache = cache
+        self.source = source
+        self.target = target
+        self.batch_size = batch_size
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.source}:{self.target}:{text}".encode()).hexdigest()
+
+    def lookup(self, text: str) -> Optional[str]:
+        return self.cache.get(self.key(text))
+
+    def _chunks(self, text: str) -> List[Tuple[str, str]]:
+        """Части текста не длиннее лимита сервиса и разделитель после каждой
+
+        Режем по строкам, а если строка длиннее лимита - по словам; перевод частей
+        склеивается обратно, поэтому длинное описание переводится целиком.
+        """
+        limit = self.backend.max_request_chars
+        chunks = []
+        while len(text) > limit:
+            cut = text.rfind('\n', 0, limit)
+            if cut < limit // 2:
+                cut = text.rfind(' ', 0, limit)
+            if cut <= 0:
+                chunks.append((text[:limit], ''))
+                text = text[limit:]
+                continue
+            chunks.append((text[:cut], text[cut]))
+            text = text[cut + 1:]
+        chunks.append((text, ''))
+        return chunks
+
+    def _batches(self, items: List[Tuple[str, int, str]]) -> Iterable[List[Tuple[str, int, str]]]:
+        batch, size = [], 0
+        for item in items:
+            text = item[2]
+            if batch and (len(batch) >= self.batch_size or size + len(text) > self.backend.max_request_chars):
+                yield batch
+                batch, size = [], 0
+            batch.append(item)
+            size += len(text)
+        if batch:
+            yield batch
+
+    def translate_missing(self, texts: Iterable[str]) -> int:
+        """Переводит новые и измененные тексты, сохраняя каждый готовый текст сразу. Блокирующий вызов"""
+        by_key = {self.key(text): text for text in texts if text and text.strip()}
+        missing = self.cache.missing(by_key)
+        TRANSLATED_TEXTS.inc(len(by_key) - len(missing), result='cached')
+        if not missing:
+            return 0
+
+        # Длинный текст - несколько частей; в кэш он попадает, когда переведены все части
+        chunks = {key: self._chunks(by_key[key]) for key in missing}
+        parts: Dict[str, List[Optional[str]]] = {key: [None] * len(value) for key, value in chunks.items()}
+        # Короткие тексты рядом, чтобы в один запрос попадало больше описаний
+        items = sorted(
+            ((key, index, text) for key, value in chunks.items() for index, (text, _) in enumerate(value)),
+            key=lambda item: len(item[2])
+        )
+        translated = 0
+        for batch in self._batches(items):
+            results = self.backend.translate_batch([text for _, _, text in batch])
+            done = {}
+            for (key, index, _), result in zip(batch, results):
+                parts[key][index] = result
+                if all(part is not None for part in parts[key]):
+                    done[key] = ''.join(part + sep for part, (_, sep) in zip(parts.pop(key), chunks[key]))
+            self.cache.put_many({key: text for key, text in done.items() if text.strip()})
+            translated += len(done)
+            TRANSLATED_TEXTS.inc(len(done), result='translated')
+        logger.info(f"Переведено описаний: {translated}, из кэша: {len(by_key) - len(missing)}")
+        return translated
+
+class TranslationStage:
+    """Этап конвейера каталога: собирает новые и измененные описания и переводит их в фоне"""
+
+    def __init__(self, translator: Translator, retry_interval: int = 300):
+        self.translator = translator
+        self.retry_interval = retry_interval
+        self._pending: Dict[str, str] = {}
+        self._wakeup = asyncio.Event()
+
+    def on_change(self, change):
+        """Подписчик каталога: ставит в очередь описания добавленных и измененных товаров"""
+        articles = change.added | change.changed
+        for product in change.products:
+            if product.article in articles and product.description:
+                self._pending[product.article] = product.description
+        if self._pending:
+            self._wakeup.set()
+
+    async def run(self):
+        """Фоновый перевод очереди"""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            pending, self._pending = self._pending, {}
+            try:
+                await asyncio.to_thread(self.translator.translate_missing, pending.values())
+            except Exception as e:
+                logger.error(f"Ошибка перевода описаний: {str(e)}")
+                # Уже переведенные пакеты сохранены, остальное повторим позже
+                self._pending = {**pending, **self._pending}
+                await asyncio.sleep(self.retry_interval)
+                self._wakeup.set()
+
+    def translated(self, text: str) -> str:
+        return self.translator.lookup(text) or text
+
+# Этап перевода процесса, создается setup_translation при включенном бэкенде
+stage: Optional[TranslationStage] = None
+
+def setup_translation(catalog) -> Optional[TranslationStage]:
+    """Подключает перевод к каталогу по настройкам; None, если перевод выключен"""
+    global stage
+    backend = create_backend(Config.TRANSLATION_BACKEND)
+    if backend is None:
+        return None
+    translator = Translator(
+        backend,
+        TranslationCache(Config.TRANSLATION_CACHE_PATH),
+        Config.TRANSLATION_SOURCE,
+        Config.TRANSLATION_TARGET,
+        Config.TRANSLATION_BATCH_SIZE
+    )
+    stage = TranslationStage(translator)
+    catalog.subscribe(stage.on_change)
+    logger.info(f"Перевод описаний включен: {backend.name}, {Config.TRANSLATION_SOURCE} -> {Config.TRANSLATION_TARGET}")
+    return stage
+
+def translated(text: str) -> str:
+    """Перевод из кэша или исходный текст, если перевода еще нет"""
+    if stage is None or not text:
+        return text
+    return stage.translated(text)